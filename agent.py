@@ -1,6 +1,6 @@
 # agent_ai_foundry_final.py
 import tkinter as tk
-from tkinter import scrolledtext, messagebox
+from tkinter import messagebox
 import threading
 import os
 import time
@@ -11,6 +11,24 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from chat_view import ChatView
+from support_agent import SupportAgent
+
+GUI_SESSION_ID = "gui"
+# Mensagens aguardando ou em processamento antes de bloquear a entrada
+GUI_QUEUE_MAX_DEPTH = max(1, int(os.getenv("GUI_QUEUE_MAX_DEPTH", "5")))
+# Tempo máximo (s) esperando a limpeza dos recursos ao fechar a janela
+GUI_SHUTDOWN_TIMEOUT = float(os.getenv("GUI_SHUTDOWN_TIMEOUT", "10"))
+# Rótulos das etapas de SupportAgent.connect_timings
+CONNECT_STEP_LABELS = {
+    "client": "client",
+    "instructions": "instruções",
+    "vector_store": "Vector Store",
+    "agent": "agent",
+    "threads": "threads",
+    "ingestion": "ingestão da base",
+}
+
 class AIFoundryVectorAgent:
     def __init__(self, root):
         self.root = root
@@ -18,35 +36,61 @@ class AIFoundryVectorAgent:
         self.root.geometry("800x600")
         
         self.is_connected = False
-        self.client = None
-        self.agent = None
-        self.thread = None
-        self.vector_store = None
-        self.uploaded_files = []
-        self.credential = None
+        self.core = SupportAgent()
+        self._agent_stream_open = False
+        self._agent_stream_text = []
+        self._perf_visible = False
+        self._pending_turns = {}  # id do turno -> instante de envio
+        self._queue_depth = 0  # mensagens na fila ou em processamento
+        self._connect_future = None
+        self._disconnect_future = None
+        self._closed = False  # janela destruída: callbacks do worker são descartados
         
-        # Gerenciamento de event loops
-        self.main_loop = asyncio.new_event_loop()
+        # Worker loop com a fila de mensagens
         self.worker_loop = None
         self.worker_thread = None
+        self.request_queue = None
         
         self.setup_ui()
         self.start_worker_loop()
         
     def start_worker_loop(self):
-        """Inicia um worker thread com event loop dedicado"""
+        """Inicia um worker thread com event loop dedicado e o consumidor da fila"""
+        ready = threading.Event()
+        
         def run_worker_loop():
             self.worker_loop = asyncio.new_event_loop()
             asyncio.set_event_loop(self.worker_loop)
+            self.request_queue = asyncio.Queue(maxsize=GUI_QUEUE_MAX_DEPTH)
+            self.worker_loop.create_task(self._dispatch_messages())
+            ready.set()
             self.worker_loop.run_forever()
         
         self.worker_thread = threading.Thread(target=run_worker_loop, daemon=True)
         self.worker_thread.start()
+        ready.wait()
         
-    def run_async_in_worker(self, coro):
-        """Executa uma corrotina no worker loop de forma thread-safe"""
+    def submit(self, coro, on_done):
+        """Agenda uma corrotina no worker loop sem bloquear o Tk
+
+        `on_done(future)` é chamado na thread do Tk quando a corrotina termina.
+        """
         future = asyncio.run_coroutine_threadsafe(coro, self.worker_loop)
-        return future.result()
+        future.add_done_callback(lambda done: self._post(lambda: on_done(done)))
+        return future
+    
+    def _post(self, callback):
+        """Agenda `callback` na thread do Tk a partir do worker loop
+
+        Depende do mainloop rodando; depois que a janela é destruída os
+        callbacks são descartados.
+        """
+        if self._closed:
+            return
+        try:
+            self.root.after(0, callback)
+        except (RuntimeError, tk.TclError):
+            pass
         
     def setup_ui(self):
         # Frame principal
@@ -69,10 +113,26 @@ class AIFoundryVectorAgent:
         self.vector_info = tk.Label(control_frame, text="Vector: Não criado", fg="orange", font=('Arial', 9))
         self.vector_info.pack(side=tk.LEFT, padx=10)
         
+        self.perf_btn = tk.Button(control_frame, text="📊 Desempenho ▸", font=('Arial', 9),
+                                  command=self.toggle_perf_panel)
+        self.perf_btn.pack(side=tk.RIGHT)
+        
+        # Painel de desempenho (recolhível)
+        self.perf_frame = tk.LabelFrame(main_frame, text="📊 Desempenho", font=('Arial', 9))
+        self.perf_last = tk.Label(self.perf_frame, text="Último turno: -", font=('Courier', 9), anchor='w')
+        self.perf_last.pack(fill=tk.X)
+        self.perf_breakdown = tk.Label(self.perf_frame, text="", font=('Courier', 9), anchor='w')
+        self.perf_breakdown.pack(fill=tk.X)
+        self.perf_rolling = tk.Label(self.perf_frame, text="", font=('Courier', 9), anchor='w')
+        self.perf_rolling.pack(fill=tk.X)
+        self.perf_current = tk.Label(self.perf_frame, text="", font=('Courier', 9), fg="gray", anchor='w')
+        self.perf_current.pack(fill=tk.X)
+        self.perf_connect = tk.Label(self.perf_frame, text="", font=('Courier', 9), anchor='w')
+        self.perf_connect.pack(fill=tk.X)
+        
         # Área de chat
-        self.chat = scrolledtext.ScrolledText(main_frame, height=20, wrap=tk.WORD,
-                                            font=('Arial', 10))
-        self.chat.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.chat_view = ChatView(main_frame, height=20, wrap=tk.WORD, font=('Arial', 10))
+        self.chat_view.pack(fill=tk.BOTH, expand=True, pady=5)
         
         # Frame de entrada
         input_frame = tk.Frame(main_frame)
@@ -86,6 +146,13 @@ class AIFoundryVectorAgent:
                                 command=self.send_message, state=tk.DISABLED)
         self.send_btn.pack(side=tk.RIGHT, padx=5)
         
+        self.cancel_btn = tk.Button(input_frame, text="⏹️ Cancelar",
+                                  command=self.cancel_message, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.RIGHT)
+        
+        self.queue_info = tk.Label(input_frame, text="", fg="gray", font=('Arial', 9))
+        self.queue_info.pack(side=tk.RIGHT, padx=5)
+        
         # Frame de exemplos
         examples_frame = tk.LabelFrame(main_frame, text="📋 Teste a Base de Conhecimento", 
                                      font=('Arial', 9))
@@ -114,9 +181,7 @@ class AIFoundryVectorAgent:
         self.add_message("system", "📚 O agent poderá buscar informações nos documentos")
         
     def add_message(self, msg_type, message):
-        """Adiciona mensagem formatada ao chat"""
-        self.chat.config(state=tk.NORMAL)
-        
+        """Adiciona mensagem formatada ao chat (inserida no próximo lote)"""
         if msg_type == "user":
             prefix = "👤 Você: "
         elif msg_type == "agent":
@@ -126,131 +191,74 @@ class AIFoundryVectorAgent:
         else:  # system
             prefix = "⚡ "
         
-        self.chat.insert(tk.END, prefix, f"{msg_type}_prefix")
-        self.chat.insert(tk.END, f"{message}\n\n")
-        self.chat.see(tk.END)
-        self.chat.config(state=tk.DISABLED)
-        
-        # Configurar tags para cores
-        self.chat.tag_configure("user_prefix", foreground="blue", font=('Arial', 10, 'bold'))
-        self.chat.tag_configure("agent_prefix", foreground="green", font=('Arial', 10, 'bold'))
-        self.chat.tag_configure("error_prefix", foreground="red", font=('Arial', 10, 'bold'))
-        self.chat.tag_configure("system_prefix", foreground="gray", font=('Arial', 10, 'bold'))
+        self.chat_view.write(prefix, f"{msg_type}_prefix")
+        self.chat_view.write(f"{message}\n\n")
     
-    def read_instructions(self):
-        """Lê instruções do arquivo"""
-        try:
-            with open("./instructions/instrucoes.txt", 'r', encoding='utf-8') as file:
-                content = file.read().strip()
-            if not content:
-                raise ValueError("O arquivo está vazio")
-            print("✅ Instruções carregadas do arquivo com sucesso!")
-            return content
-        except Exception as e:
-            print(f"❌ Erro ao ler instruções: {e}")
-            return """
-            VOCÊ É UM AGENTE DE SUPORTE TÉCNICO COM ACESSO A UMA BASE DE CONHECIMENTO
-
-            SUAS FUNÇÕES:
-            1. Usar a base de conhecimento (Vector Store) para buscar informações
-            2. Classificar problemas: Rede, Hardware, Software, Segurança
-            3. Fornecer soluções baseadas em documentação
-            4. Ser preciso e profissional
-
-            IMPORTANTE:
-            - Você tem acesso a documentos de suporte técnico via Vector Store
-            - SEMPRE busque na base de conhecimento antes de responder
-            - Cite procedimentos específicos quando disponíveis
-            - Forneça contatos corretos da documentação
-
-            BASE DE CONHECIMENTO DISPONÍVEL:
-            - Procedimentos de suporte técnico
-            - Contatos e informações de suporte
-            - Políticas da empresa
-
-            Quando o usuário fizer uma pergunta:
-            1. Busque informações relevantes no Vector Store
-            2. Forneça respostas baseadas na documentação
-            3. Seja específico e cite fontes quando possível
-            """
+    def _append_agent_delta(self, text):
+        """Acrescenta um trecho da resposta em streaming ao chat"""
+        if not self._agent_stream_open:
+            self.chat_view.write("🤖 Agent: ", "agent_prefix")
+            self._agent_stream_open = True
+            self._agent_stream_text = []
+        self._agent_stream_text.append(text)
+        self.chat_view.write(text)
     
-    async def upload_files_to_vector_store(self, vector_store_id, file_paths):
-        """Faz upload de arquivos para o Vector Store usando os métodos corretos"""
-        try:
-            uploaded_files = []
-            
-            for file_path in file_paths:
-                print(f"⬆️  Enviando arquivo: {os.path.basename(file_path)}")
-                
-                # Método correto: usar files.upload primeiro
-                with open(file_path, 'rb') as file:
-                    file_object = await self.client.files.upload(
-                        file=file,
-                        purpose="assistants"
-                    )
-                
-                print(f"✅ Arquivo enviado: {file_object.id}")
-                
-                # Depois associar ao Vector Store
-                vector_file = await self.client.vector_store_files.create(
-                    vector_store_id=vector_store_id,
-                    file_id=file_object.id
-                )
-                
-                uploaded_files.append(file_object.id)
-                print(f"✅ Arquivo associado ao Vector Store: {os.path.basename(file_path)}")
-            
-            return uploaded_files
-            
-        except Exception as e:
-            print(f"❌ Erro no upload de arquivos: {e}")
-            return []
+    def _finish_agent_message(self, result):
+        """Fecha a resposta em streaming ou exibe a resposta completa"""
+        ok = result and not result.startswith("Erro")
+        if self._agent_stream_open:
+            self._agent_stream_open = False
+            self.chat_view.write("\n\n")
+            if not ok:
+                self.add_message("error", result or "Sem resposta do agent")
+            elif result != "".join(self._agent_stream_text):
+                # Stream interrompido: exibe a resposta completa obtida por polling
+                self.add_message("agent", result)
+        elif ok:
+            self.add_message("agent", result)
+        else:
+            self.add_message("error", result or "Sem resposta do agent")
     
-    async def create_vector_store_with_files(self, knowledge_base_path: str):
-        """Cria um Vector Store e adiciona arquivos da base de conhecimento"""
-        try:
-            print("📚 Criando Vector Store para base de conhecimento...")
-            
-            # Criar Vector Store
-            vector_store = await self.client.vector_stores.create(
-                name="knowledge-base-support-ti"
+    def toggle_perf_panel(self):
+        """Mostra/oculta o painel de desempenho"""
+        self._perf_visible = not self._perf_visible
+        if self._perf_visible:
+            self.perf_frame.pack(fill=tk.X, pady=5, before=self.chat_view.text)
+            self.perf_btn.config(text="📊 Desempenho ▾")
+            self._tick_perf_panel()
+        else:
+            self.perf_frame.pack_forget()
+            self.perf_btn.config(text="📊 Desempenho ▸")
+    
+    def _update_perf_panel(self, snapshot):
+        """Atualiza o painel com o resumo calculado no worker loop"""
+        last = snapshot.get("last_turn")
+        if last:
+            self.perf_last.config(
+                text=f"Último turno: {last['total_ms']:.0f} ms ({last['source']}, {last['api_calls']} chamadas à API)"
             )
-            print(f"✅ Vector Store criado: {vector_store.id}")
-            
-            # Adicionar arquivos ao Vector Store
-            if os.path.exists(knowledge_base_path):
-                files_to_upload = []
-                
-                for file_name in os.listdir(knowledge_base_path):
-                    if file_name.endswith(('.json', '.txt', '.md', '.pdf')):
-                        file_path = os.path.join(knowledge_base_path, file_name)
-                        files_to_upload.append(file_path)
-                        print(f"📄 Arquivo encontrado: {file_name}")
-                
-                if files_to_upload:
-                    # Fazer upload dos arquivos
-                    uploaded_file_ids = await self.upload_files_to_vector_store(
-                        vector_store.id, 
-                        files_to_upload
-                    )
-                    
-                    if uploaded_file_ids:
-                        print(f"✅ {len(uploaded_file_ids)} arquivos enviados para o Vector Store")
-                        self.uploaded_files = files_to_upload
-                        return vector_store
-                    else:
-                        print("⚠️  Nenhum arquivo foi enviado com sucesso")
-                        return vector_store
-                else:
-                    print("⚠️  Nenhum arquivo encontrado na pasta knowledge_base")
-                    return vector_store
-            else:
-                print("❌ Pasta knowledge_base não encontrada")
-                return vector_store
-                
-        except Exception as e:
-            print(f"❌ Erro ao criar Vector Store: {e}")
-            return None
+            self.perf_breakdown.config(
+                text=(f"  fila local {last['queue_wait_ms']:.0f} ms | run na fila {last['run_queued_ms']:.0f} ms"
+                      f" | processando {last['run_in_progress_ms']:.0f} ms"
+                      f" | busca da resposta {last['message_fetch_ms']:.0f} ms")
+            )
+        hit_rate = snapshot.get("cache_hit_rate")
+        self.perf_rolling.config(
+            text=(f"p50 {snapshot['p50_ms'] or 0:.0f} ms | p95 {snapshot['p95_ms'] or 0:.0f} ms"
+                  f" | {snapshot['turns']} turnos | {snapshot['api_calls']} chamadas à API"
+                  f" | cache {f'{hit_rate:.0%}' if hit_rate is not None else 'desligado'}")
+        )
+    
+    def _tick_perf_panel(self):
+        """Mostra há quanto tempo o turno atual está em andamento"""
+        if not self._perf_visible:
+            return
+        if self._pending_turns:
+            elapsed = time.perf_counter() - min(self._pending_turns.values())
+            self.perf_current.config(text=f"⏳ Aguardando resposta há {elapsed:.1f} s ({len(self._pending_turns)} pendentes)")
+        else:
+            self.perf_current.config(text="")
+        self.root.after(250, self._tick_perf_panel)
     
     def toggle_connection(self):
         if not self.is_connected:
@@ -260,98 +268,56 @@ class AIFoundryVectorAgent:
     
     def connect_agent(self):
         self.btn.config(state=tk.DISABLED, text="Conectando...")
-        threading.Thread(target=self._connect_thread, daemon=True).start()
-    
-    def _connect_thread(self):
-        """Thread para conexão usando worker loop"""
-        try:
-            # Executar no worker loop
-            self.run_async_in_worker(self._connect_async())
-            
-        except Exception as e:
-            error_msg = str(e)
-            print(f"❌ Erro na conexão: {error_msg}")
-            self.root.after(0, lambda: self.add_message("error", f"Conexão: {error_msg}"))
-            self.root.after(0, self._update_disconnected_ui)
+        self._connect_future = self.submit(self.core.connect(), self._on_connect_done)
     
-    async def _connect_async(self):
-        """Conexão assíncrona com Azure AI Foundry"""
-        try:
-            from azure.ai.agents.aio import AgentsClient
-            from azure.identity.aio import DefaultAzureCredential
-            
-            endpoint = os.getenv("AZURE_AI_PROJECT_ENDPOINT")
-            model_name = os.getenv("AZURE_AI_MODEL_DEPLOYMENT_NAME")
-            
-            if not endpoint or not model_name:
-                self.root.after(0, lambda: self.add_message("error", "Variáveis de ambiente não configuradas"))
-                self.root.after(0, self._update_disconnected_ui)
-                return
-            
-            print("🔗 Conectando ao Azure AI Foundry...")
-            
-            # Criar clients assíncronos
-            self.credential = DefaultAzureCredential()
-            self.client = AgentsClient(endpoint=endpoint, credential=self.credential)
-            print("✅ Usando AgentsClient")
-            
-            # Ler instruções
-            instructions = self.read_instructions()
-            
-            # 1. Criar Vector Store com arquivos
-            self.vector_store = await self.create_vector_store_with_files("./knowledge_base")
-            
-            if not self.vector_store:
-                self.root.after(0, lambda: self.add_message("error", "Falha ao criar Vector Store"))
-                self.root.after(0, self._update_disconnected_ui)
-                return
-            
-            # 2. Criar o agent - Vamos tentar diferentes abordagens para o file_search
-            try:
-                # Tentar abordagem com tools
-                self.agent = await self.client.create_agent(
-                    model=model_name,
-                    instructions=instructions,
-                    tools=[{"type": "file_search"}],
-                    name=f"suporte-ti-agent-{int(time.time())}"
-                )
-                print("✅ Agent criado com file_search tool")
-            except Exception as e:
-                print(f"⚠️  Não foi possível criar agent com file_search: {e}")
-                # Criar agent sem tools
-                self.agent = await self.client.create_agent(
-                    model=model_name,
-                    instructions=instructions,
-                    name=f"suporte-ti-agent-{int(time.time())}"
-                )
-                print("✅ Agent criado sem file_search tool")
-            
-            print(f"✅ Agente criado: {self.agent.id}")
-            
-            # 3. Criar thread
-            self.thread = await self.client.threads.create()
-            
+    def _on_connect_done(self, future):
+        """Resultado da conexão, já na thread do Tk"""
+        error = future.exception()
+        if error:
+            print(f"❌ Erro na conexão: {error}")
+            self.add_message("error", f"Conexão: {error}")
+            self._update_disconnected_ui()
+        else:
             self.is_connected = True
-            self.root.after(0, self._update_connected_ui)
-            
-        except Exception as e:
-            error_msg = str(e)
-            print(f"❌ Erro na conexão assíncrona: {error_msg}")
-            import traceback
-            traceback.print_exc()
-            self.root.after(0, lambda: self.add_message("error", f"Conexão: {error_msg}"))
-            self.root.after(0, self._update_disconnected_ui)
+            self._update_connected_ui()
+            # A base continua sendo enviada ao Vector Store em segundo plano
+            self.submit(self.core.wait_for_ingestion(), self._on_ingestion_done)
+    
+    def _format_connect_timings(self):
+        timings = self.core.connect_timings
+        steps = " | ".join(
+            f"{label} {timings[step]:.0f} ms" for step, label in CONNECT_STEP_LABELS.items() if step in timings
+        )
+        return f"Conexão: pronto em {timings.get('ready', 0):.0f} ms ({steps})"
+    
+    def _on_ingestion_done(self, future):
+        """Fim da ingestão da base, já na thread do Tk"""
+        if future.cancelled() or not self.is_connected:
+            return
+        self.perf_connect.config(text=self._format_connect_timings())
+        if future.exception() or future.result() is None:
+            self.vector_info.config(text="Vector: falha na sincronização")
+            self.add_message("error", "Falha ao sincronizar a base de conhecimento (respostas podem ficar incompletas)")
+            return
+        file_count = len(future.result())
+        self.vector_info.config(text=f"Vector: {file_count} arquivos")
+        self.add_message(
+            "system",
+            f"📚 Base de conhecimento: {file_count} arquivos "
+            f"(sincronizada em {self.core.connect_timings.get('ingestion', 0):.0f} ms)"
+        )
     
     def _update_connected_ui(self):
         self.btn.config(text="🔌 Desconectar", state=tk.NORMAL)
         self.status.config(text="Status: Conectado", fg="green")
-        file_count = len(self.uploaded_files) if self.uploaded_files else 0
-        self.vector_info.config(text=f"Vector: {file_count} arquivos")
+        self.vector_info.config(text="Vector: sincronizando base...")
         self.send_btn.config(state=tk.NORMAL)
         self.entry.config(state=tk.NORMAL)
         self.add_message("system", "✅ Conectado com Vector Store ativo!")
-        self.add_message("system", f"📚 Base de conhecimento: {file_count} arquivos")
+        self.add_message("system", f"⏱️ {self._format_connect_timings()}")
+        self.perf_connect.config(text=self._format_connect_timings())
         self.add_message("system", "🤖 Faça perguntas sobre a base de conhecimento")
+        self._set_queue_depth(self._queue_depth)
     
     def _update_disconnected_ui(self):
         self.btn.config(text="🔄 Conectar com Vector Store", state=tk.NORMAL)
@@ -365,45 +331,21 @@ class AIFoundryVectorAgent:
         if not self.is_connected:
             return
             
+        self.is_connected = False
         self.btn.config(state=tk.DISABLED, text="Desconectando...")
-        threading.Thread(target=self._disconnect_thread, daemon=True).start()
-    
-    def _disconnect_thread(self):
-        """Thread para desconexão usando worker loop"""
-        try:
-            self.run_async_in_worker(self._disconnect_async())
-        except Exception as e:
-            print(f"Erro na desconexão: {e}")
-        finally:
-            self.is_connected = False
-            self.root.after(0, self._update_disconnected_ui)
+        self.send_btn.config(state=tk.DISABLED)
+        self.entry.config(state=tk.DISABLED)
+        self._disconnect_future = self.submit(self.core.disconnect(), self._on_disconnect_done)
     
-    async def _disconnect_async(self):
-        """Desconexão assíncrona"""
-        try:
-            if hasattr(self, 'client') and self.client:
-                if hasattr(self, 'agent') and self.agent and hasattr(self.agent, 'id'):
-                    await self.client.delete_agent(self.agent.id)
-                    self.add_message("system", "🔧 Agent removido")
-                
-                if hasattr(self, 'vector_store') and self.vector_store and hasattr(self.vector_store, 'id'):
-                    try:
-                        await self.client.vector_stores.delete(self.vector_store.id)
-                        self.add_message("system", "🗑️ Vector Store removido")
-                    except Exception as e:
-                        print(f"Erro ao remover Vector Store: {e}")
-                
-                if hasattr(self, 'thread') and self.thread and hasattr(self.thread, 'id'):
-                    await self.client.threads.delete(self.thread.id)
-                    self.add_message("system", "📝 Thread removida")
-                
-                # Fechar clients
-                await self.client.close()
-                if hasattr(self, 'credential') and self.credential:
-                    await self.credential.close()
-                    
-        except Exception as e:
-            print(f"Erro na desconexão assíncrona: {e}")
+    def _on_disconnect_done(self, future):
+        """Resultado da desconexão, já na thread do Tk"""
+        error = future.exception()
+        if error:
+            print(f"Erro na desconexão: {error}")
+        else:
+            for message in future.result():
+                self.add_message("system", message)
+        self._update_disconnected_ui()
     
     def use_example(self, example):
         if self.is_connected:
@@ -414,103 +356,114 @@ class AIFoundryVectorAgent:
             messagebox.showwarning("Aviso", "Conecte-se primeiro ao Azure AI Foundry")
     
     def send_message(self, event=None):
-        if not self.is_connected:
+        if not self.is_connected or self._queue_depth >= GUI_QUEUE_MAX_DEPTH:
             return
         
         message = self.entry.get().strip()
         if message:
             self.entry.delete(0, tk.END)
             self.add_message("user", message)
-            threading.Thread(target=lambda: self._process_message(message), daemon=True).start()
+            turn_id = object()
+            queued_at = time.perf_counter()
+            self._pending_turns[turn_id] = queued_at
+            self._set_queue_depth(self._queue_depth + 1)
+            self.worker_loop.call_soon_threadsafe(self.request_queue.put_nowait, (message, turn_id, queued_at))
     
-    def _process_message(self, message):
-        """Processa mensagem usando worker loop"""
-        try:
-            # Executar no worker loop de forma thread-safe
-            result = self.run_async_in_worker(self._process_message_async(message))
-            
-            if result and result != "Erro: Sem resposta":
-                self.root.after(0, lambda: self.add_message("agent", result))
-            else:
-                self.root.after(0, lambda: self.add_message("error", "Sem resposta do agent"))
-                
-        except Exception as e:
-            error_msg = str(e)
-            print(f"❌ Erro no processamento: {error_msg}")
-            self.root.after(0, lambda: self.add_message("error", f"Processamento: {error_msg}"))
+    def _set_queue_depth(self, depth):
+        """Atualiza o indicador da fila e bloqueia a entrada quando ela está cheia"""
+        self._queue_depth = depth
+        self.cancel_btn.config(state=tk.NORMAL if depth else tk.DISABLED)
+        full = depth >= GUI_QUEUE_MAX_DEPTH
+        if full:
+            self.queue_info.config(text=f"⏸️ Fila cheia ({depth}/{GUI_QUEUE_MAX_DEPTH})", fg="red")
+        else:
+            self.queue_info.config(text=f"Fila: {depth}/{GUI_QUEUE_MAX_DEPTH}" if depth else "", fg="gray")
+        if self.is_connected:
+            state = tk.DISABLED if full else tk.NORMAL
+            self.send_btn.config(state=state)
+            self.entry.config(state=state)
     
-    async def _process_message_async(self, message):
-        """Processa mensagem de forma assíncrona"""
-        try:
-            # Adicionar mensagem à thread
-            await self.client.messages.create(
-                thread_id=self.thread.id,
-                content=message,
-                role="user"
-            )
-            
-            # Executar run
-            run = await self.client.runs.create(
-                thread_id=self.thread.id,
-                agent_id=self.agent.id
-            )
-            
-            # Aguardar conclusão
-            while run.status in ['queued', 'in_progress']:
-                await asyncio.sleep(0.5)
-                run = await self.client.runs.get(
-                    thread_id=self.thread.id,
-                    run_id=run.id
-                )
-            
-            if run.status == 'completed':
-                # Buscar mensagens - CORREÇÃO: abordagem simplificada para AsyncList
-                agent_response = ""
-                
-                # Obter todas as mensagens de uma vez
-                all_messages = []
-                messages_pager = self.client.messages.list(thread_id=self.thread.id)
-                
-                # Coletar todas as mensagens
-                async for msg in messages_pager:
-                    all_messages.append(msg)
-                
-                # Procurar pela resposta do assistant
-                for msg in all_messages:
-                    if msg.role == 'assistant':
-                        # Extrair conteúdo da mensagem
-                        for content in msg.content:
-                            if hasattr(content, 'text'):
-                                if hasattr(content.text, 'value'):
-                                    agent_response += content.text.value
-                                elif hasattr(content.text, 'text'):
-                                    agent_response += content.text.text
-                            elif hasattr(content, 'value'):
-                                agent_response += content.value
-                        
-                        if agent_response:
-                            break
-                
-                return agent_response if agent_response else "Sem resposta"
-            else:
-                return f"Erro no run: {run.status}"
-                
-        except Exception as e:
-            return f"Erro: {str(e)}"
+    def cancel_message(self):
+        """Interrompe a resposta em andamento; o agent responde pela base local"""
+        if self._queue_depth:
+            self.worker_loop.call_soon_threadsafe(self.core.cancel, GUI_SESSION_ID)
+    
+    async def _dispatch_messages(self):
+        """Consome a fila de mensagens no worker loop, uma de cada vez"""
+        while True:
+            message, turn_id, queued_at = await self.request_queue.get()
+            try:
+                result, snapshot = await self._process_message_async(message, queued_at)
+            except Exception as e:
+                print(f"❌ Erro no processamento: {e}")
+                result, snapshot = f"Erro: Processamento: {e}", None
+            finally:
+                self.request_queue.task_done()
+            self._post(lambda t=turn_id, r=result, m=snapshot: self._on_message_done(t, r, m))
+    
+    def _on_message_done(self, turn_id, result, snapshot):
+        """Resultado de uma mensagem, já na thread do Tk"""
+        self._finish_agent_message(result)
+        if snapshot:
+            self._update_perf_panel(snapshot)
+        self._pending_turns.pop(turn_id, None)
+        self._set_queue_depth(self._queue_depth - 1)
     
-    def __del__(self):
-        """Cleanup ao destruir o objeto"""
-        if hasattr(self, 'worker_loop') and self.worker_loop:
+    async def _process_message_async(self, message, queued_at=None):
+        """Processa mensagem de forma assíncrona; retorna (resposta, métricas)"""
+        def on_delta(text):
+            self._post(lambda: self._append_agent_delta(text))
+        
+        reply, _ = await self.core.chat(GUI_SESSION_ID, message, on_delta=on_delta, queued_at=queued_at)
+        return reply, self.core.metrics.snapshot(self.core.response_cache)
+    
+    def shutdown(self, on_finished, timeout=None):
+        """Desconecta e para o worker loop sem bloquear o Tk
+
+        Uma conexão ou desconexão em andamento também é aguardada, para que
+        agent e threads criados por ela sejam removidos antes de sair. O
+        mainloop precisa continuar rodando: com Tcl em modo threaded, o
+        `root.after` chamado pelo worker espera o mainloop atendê-lo.
+        `on_finished()` é chamado na thread do Tk ao fim da limpeza ou
+        depois de `timeout` s, o que vier primeiro.
+        """
+        timeout = GUI_SHUTDOWN_TIMEOUT if timeout is None else timeout
+        self.is_connected = False
+        finished = False
+        
+        def finish(future=None):
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            if future is None:
+                print("⚠️  Limpeza interrompida pelo tempo limite; rode cleanup.py para remover os recursos restantes")
+            elif not future.cancelled() and future.exception():
+                print(f"Erro na desconexão: {future.exception()}")
+            self._closed = True
             self.worker_loop.call_soon_threadsafe(self.worker_loop.stop)
+            on_finished()
+        
+        self.submit(self._shutdown_async(), finish)
+        self.root.after(int(timeout * 1000), finish)
+    
+    async def _shutdown_async(self):
+        """Aguarda conexão/desconexão em andamento e remove os recursos restantes"""
+        pending = [asyncio.wrap_future(future) for future in (self._connect_future, self._disconnect_future)
+                   if future and not future.done()]
+        await asyncio.gather(*pending, return_exceptions=True)
+        if self.core.is_connected:
+            await self.core.disconnect()
 
 def main():
     root = tk.Tk()
     app = AIFoundryVectorAgent(root)
     
     def on_closing():
-        if app.is_connected:
-            app.disconnect_agent()
-        root.destroy()
+        # A janela some na hora; o mainloop segue atendendo o worker até a limpeza terminar
+        root.withdraw()
+        root.protocol("WM_DELETE_WINDOW", lambda: None)
+        app.shutdown(root.destroy)
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
     root.mainloop()
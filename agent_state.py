@@ -0,0 +1,122 @@
+# agent_state.py
+"""Estado do agent persistido entre execuções (warm start).
+
+Guarda o id do agent remoto, o modelo, o hash das instruções, o Vector
+Store associado e as capacidades de ferramentas já detectadas por modelo,
+para que uma reconexão reutilize o agent em vez de criar outro.
+"""
+import functools
+import hashlib
+import json
+import os
+import socket
+import time
+import uuid
+from pathlib import Path
+
+from kb_sync import STATE_DIR
+
+AGENT_WARM_START = os.getenv("AGENT_WARM_START", "true").lower() == "true"
+AGENT_STATE_VERSION = 1
+APP_NAME = "suporte-ti-agent"
+
+
+def text_hash(text):
+    """SHA-256 (curto) de um texto"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=None)
+def install_id():
+    """Id desta instalação (pasta de estado), criado na primeira chamada"""
+    path = Path(STATE_DIR) / "install_id"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(path, 'x', encoding='utf-8') as file:
+            file.write(uuid.uuid4().hex)
+    except FileExistsError:
+        pass
+    return path.read_text(encoding='utf-8').strip()
+
+
+def resource_metadata():
+    """metadata dos recursos remotos criados por este processo
+
+    A limpeza de órfãos só considera recursos desta instalação e poupa os
+    de processos ainda vivos nesta máquina (ex.: threads do pool do serviço).
+    """
+    return {"app": APP_NAME, "install_id": install_id(), "host": socket.gethostname(), "pid": str(os.getpid())}
+
+
+class AgentState:
+    """Configuração do último agent criado, gravada em disco"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.endpoint = None
+        self.agent_id = None
+        self.model = None
+        self.instructions_hash = None
+        self.vector_store_id = None
+        self.capabilities = {}  # modelo -> {"file_search": bool}
+        self.updated_at = None
+
+    @classmethod
+    def default_path(cls):
+        return os.path.join(STATE_DIR, "agent_state.json")
+
+    @classmethod
+    def load(cls, path=None):
+        state = cls(path or cls.default_path())
+        try:
+            with open(state.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get("version") == AGENT_STATE_VERSION:
+                state.endpoint = data.get("endpoint")
+                state.agent_id = data.get("agent_id")
+                state.model = data.get("model")
+                state.instructions_hash = data.get("instructions_hash")
+                state.vector_store_id = data.get("vector_store_id")
+                state.capabilities = data.get("capabilities", {})
+                state.updated_at = data.get("updated_at")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Estado do agent ignorado: {e}")
+        return state
+
+    def save(self):
+        """Grava o estado de forma atômica"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.updated_at = time.time()
+        data = {
+            "version": AGENT_STATE_VERSION,
+            "endpoint": self.endpoint,
+            "agent_id": self.agent_id,
+            "model": self.model,
+            "instructions_hash": self.instructions_hash,
+            "vector_store_id": self.vector_store_id,
+            "capabilities": self.capabilities,
+            "updated_at": self.updated_at,
+        }
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def matches(self, model, instructions_hash, vector_store_id):
+        """Indica se o agent salvo já tem a configuração desejada"""
+        return (
+            self.model == model
+            and self.instructions_hash == instructions_hash
+            and self.vector_store_id == vector_store_id
+        )
+
+    def model_capabilities(self, model):
+        return self.capabilities.setdefault(model, {})
+
+    def forget_agent(self):
+        self.agent_id = None
+        self.model = None
+        self.instructions_hash = None
+        self.vector_store_id = None
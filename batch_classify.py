@@ -0,0 +1,189 @@
+# batch_classify.py
+"""Classificação em lote de chamados, sem interface gráfica.
+
+Lê chamados de um arquivo JSONL/CSV (ou stdin) e classifica com N runs
+simultâneos sobre um único AgentsClient. Os resultados são gravados em JSONL
+na ordem de entrada; se o processo cair, basta rodar de novo com --resume
+para continuar de onde parou.
+
+Uso:
+    python batch_classify.py chamados.jsonl -o resultados.jsonl -c 8
+    cat chamados.txt | python batch_classify.py - -o resultados.jsonl
+    python batch_classify.py chamados.csv -o resultados.jsonl --resume
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from support_agent import SupportAgent
+
+TEXT_FIELDS = ("pergunta", "ticket", "text", "texto", "descricao", "message")
+ID_FIELDS = ("id", "ticket_id", "chamado")
+
+
+def _ticket_from_record(record):
+    """Normaliza um registro de entrada em {"id", "text"}"""
+    if isinstance(record, str):
+        return {"id": None, "text": record}
+    text = next((record[field] for field in TEXT_FIELDS if record.get(field)), None)
+    ticket_id = next((record[field] for field in ID_FIELDS if record.get(field) is not None), None)
+    return {"id": ticket_id, "text": text}
+
+
+def read_tickets(source, input_format=None):
+    """Lê chamados de um caminho ou '-' (stdin) em JSONL, CSV ou texto puro"""
+    if input_format is None:
+        input_format = "csv" if str(source).lower().endswith(".csv") else "jsonl"
+
+    handle = sys.stdin if source == "-" else open(source, 'r', encoding='utf-8', newline='')
+    try:
+        if input_format == "csv":
+            return [_ticket_from_record(row) for row in csv.DictReader(handle)]
+
+        tickets = []
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line) if line.startswith("{") else line
+            tickets.append(_ticket_from_record(record))
+        return tickets
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def resume_offset(path):
+    """Próximo índice a classificar, a partir do último resultado gravado
+
+    Uma última linha truncada por uma queda é descartada do arquivo.
+    """
+    try:
+        with open(path, 'rb') as file:
+            content = file.read()
+    except FileNotFoundError:
+        return 0
+
+    if content and not content.endswith(b"\n"):
+        content = content[:content.rfind(b"\n") + 1]
+        with open(path, 'r+b') as file:
+            file.truncate(len(content))
+
+    lines = [line for line in content.splitlines() if line.strip()]
+    if not lines:
+        return 0
+    return json.loads(lines[-1])["index"] + 1
+
+
+class OrderedWriter:
+    """Grava resultados em ordem de entrada, mesmo que terminem fora de ordem"""
+
+    def __init__(self, handle, start_index, durable=True):
+        self.handle = handle
+        self.next_index = start_index
+        self.durable = durable
+        self.pending = {}
+
+    def add(self, index, record):
+        self.pending[index] = record
+        while self.next_index in self.pending:
+            self.handle.write(json.dumps(self.pending.pop(self.next_index), ensure_ascii=False) + "\n")
+            self.next_index += 1
+        self.handle.flush()
+        if self.durable:
+            os.fsync(self.handle.fileno())
+
+
+async def classify_ticket(agent, index, ticket):
+    """Classifica um chamado em uma conversa própria"""
+    record = {"index": index, "id": ticket["id"], "ticket": ticket["text"]}
+    started = time.perf_counter()
+
+    if not ticket["text"]:
+        record.update({"error": "Chamado sem texto", "latency_ms": 0.0})
+        return record
+
+    try:
+        record.update(await agent.classify(ticket["text"]))
+    except Exception as e:
+        record["error"] = f"Erro: {e}"
+
+    record["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
+async def run_batch(tickets, writer, concurrency, offset):
+    """Classifica tickets[offset:] com no máximo `concurrency` runs em andamento"""
+    agent = SupportAgent()
+    # A classificação em lote depende da base completa no Vector Store
+    await agent.connect(wait_for_ingestion=True)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    done = 0
+
+    async def worker(index, ticket):
+        nonlocal done
+        async with semaphore:
+            record = await classify_ticket(agent, index, ticket)
+        writer.add(index, record)
+        done += 1
+        if done % 10 == 0 or done == len(tickets) - offset:
+            elapsed = time.perf_counter() - started
+            print(f"📊 {done}/{len(tickets) - offset} chamados ({done / elapsed:.1f}/s)", file=sys.stderr)
+
+    try:
+        await asyncio.gather(*(worker(index, tickets[index]) for index in range(offset, len(tickets))))
+    finally:
+        await agent.disconnect()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {done} chamados classificados em {elapsed:.1f}s", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classificação em lote de chamados de suporte TI")
+    parser.add_argument("input", help="Arquivo .jsonl/.csv com os chamados ou '-' para stdin")
+    parser.add_argument("-o", "--output", default="-", help="Arquivo JSONL de saída (padrão: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "4")),
+                        help="Runs simultâneos (padrão: 4)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="Formato de entrada (padrão: pela extensão)")
+    parser.add_argument("--offset", type=int, default=0, help="Pular os primeiros N chamados")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continuar após os resultados já gravados no arquivo de saída")
+    args = parser.parse_args()
+
+    tickets = read_tickets(args.input, args.format)
+    offset = args.offset
+    if args.resume:
+        if args.output == "-":
+            parser.error("--resume exige --output com um arquivo")
+        offset = resume_offset(args.output)
+        print(f"♻️  Retomando a partir do chamado {offset}", file=sys.stderr)
+
+    if offset >= len(tickets):
+        print("✅ Nada a fazer: todos os chamados já foram classificados", file=sys.stderr)
+        return
+
+    concurrency = max(1, args.concurrency)
+    if args.output == "-":
+        # Logs vão para stderr para não misturar com o JSONL em stdout
+        writer = OrderedWriter(sys.stdout, offset, durable=False)
+        with contextlib.redirect_stdout(sys.stderr):
+            asyncio.run(run_batch(tickets, writer, concurrency, offset))
+    else:
+        with open(args.output, 'a', encoding='utf-8') as handle:
+            asyncio.run(run_batch(tickets, OrderedWriter(handle, offset), concurrency, offset))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Benchmarks offline do agent com um AgentsClient simulado."""
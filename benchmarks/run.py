@@ -0,0 +1,454 @@
+# benchmarks/run.py
+"""Benchmarks offline de latência e vazão com o AgentsClient simulado.
+
+Mede conexão (fria e com warm start), sincronização da base de conhecimento,
+turnos de conversa em vários níveis de concorrência, uma sessão longa (com e
+sem compactação de contexto) e um pico de perguntas idênticas (com e sem
+coalescência), sem acessar o Azure.
+Reporta p50/p95/p99, chamadas à API por turno e vazão, e grava tudo em JSON
+para comparar entre commits.
+
+Uso:
+    python -m benchmarks.run
+    python -m benchmarks.run --concurrency 1,8,32 --turns 64 --latency-scale 0.2
+    python -m benchmarks.run --error-rate 0.02 --compare benchmarks/results/anterior.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import asdict, replace
+from pathlib import Path
+
+import numpy as np
+
+# Estado local isolado; os módulos do agent leem AGENT_STATE_DIR na importação
+STATE_DIR = tempfile.mkdtemp(prefix="agent-bench-state-")
+os.environ["AGENT_STATE_DIR"] = STATE_DIR
+os.environ.setdefault("AZURE_AI_PROJECT_ENDPOINT", "https://simulado.local")
+os.environ.setdefault("AZURE_AI_MODEL_DEPLOYMENT_NAME", "simulado")
+
+import context_window
+from benchmarks.simulated_client import SIMULATED_REPLY, SimulatedAgentsClient, SimulationConfig
+from support_agent import SupportAgent
+
+RESULTS_DIR = Path(__file__).parent / "results"
+QUESTIONS = [
+    "Qual procedimento para reset de senha?",
+    "Como resolver problema de WiFi?",
+    "Quais são os contatos de suporte?",
+    "Políticas de segurança da empresa",
+    "Procedimento para configurar VPN",
+    "O que fazer se o computador não liga?",
+]
+# Métricas comparadas com --compare: maior é pior, exceto as de vazão
+HIGHER_IS_BETTER = ("throughput_per_s",)
+
+
+def summarize(latencies):
+    """Estatísticas de latência em milissegundos"""
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies) * 1000.0
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 1),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "max_ms": round(float(values.max()), 1),
+    }
+
+
+def reset_state():
+    shutil.rmtree(STATE_DIR, ignore_errors=True)
+    os.makedirs(STATE_DIR, exist_ok=True)
+
+
+@contextlib.contextmanager
+def quiet(enabled):
+    """Silencia os logs do agent durante a medição"""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+async def wait_for_pool(agent, timeout=10.0):
+    """Aguarda o pool de threads ficar cheio (regime estável)"""
+    deadline = time.monotonic() + timeout
+    while len(agent.threads.pool) < agent.threads.pool_size and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+async def bench_connect(config, knowledge_base_path, repeats):
+    """Conexão fria (sem estado local) e com warm start
+
+    A latência é até o agent ficar pronto; `ingested_p50_ms` é até a base
+    terminar de ser sincronizada em segundo plano.
+    """
+    cases = {name: ([], [], Counter()) for name in ("cold", "warm")}
+
+    for _ in range(repeats):
+        reset_state()
+        client = SimulatedAgentsClient(config)
+        for ready, ingested, calls in cases.values():
+            agent = SupportAgent(knowledge_base_path=knowledge_base_path)
+            before = client.calls.copy()
+            started = time.perf_counter()
+            await agent.connect(client=client)
+            ready.append(time.perf_counter() - started)
+            await agent.wait_for_ingestion()
+            ingested.append(time.perf_counter() - started)
+            calls.update(client.calls - before)
+            await agent.disconnect()
+
+    return {
+        name: {
+            **summarize(ready),
+            "ingested_p50_ms": round(float(np.percentile(ingested, 50)) * 1000, 1),
+            "calls": _per_unit(calls, repeats),
+        }
+        for name, (ready, ingested, calls) in cases.items()
+    }
+
+
+def _write_synthetic_kb(path, file_count):
+    os.makedirs(path, exist_ok=True)
+    for index in range(file_count):
+        with open(os.path.join(path, f"documento_{index:03d}.txt"), 'w', encoding='utf-8') as file:
+            file.write(f"Procedimento {index}\n" + "Texto de suporte técnico. " * 150)
+
+
+async def bench_kb_sync(config, file_count, repeats):
+    """Sincronização da base: envio completo, um arquivo alterado e nada alterado"""
+    results = {"full": [], "one_changed": [], "unchanged": []}
+    calls = {name: Counter() for name in results}
+
+    for _ in range(repeats):
+        reset_state()
+        kb_path = tempfile.mkdtemp(prefix="agent-bench-kb-")
+        try:
+            _write_synthetic_kb(kb_path, file_count)
+            client = SimulatedAgentsClient(config)
+            agent = SupportAgent(knowledge_base_path=kb_path)
+            agent.client = client
+
+            for name in results:
+                if name == "one_changed":
+                    with open(os.path.join(kb_path, "documento_000.txt"), 'a', encoding='utf-8') as file:
+                        file.write(f"Revisão {time.time()}\n")
+                before = client.calls.copy()
+                started = time.perf_counter()
+                vector_store = await agent.create_vector_store_with_files(kb_path)
+                results[name].append(time.perf_counter() - started)
+                calls[name].update(client.calls - before)
+                if vector_store is None:
+                    raise RuntimeError("Sincronização simulada falhou")
+        finally:
+            shutil.rmtree(kb_path, ignore_errors=True)
+
+    return {
+        name: {**summarize(latencies), "files": file_count, "calls": _per_unit(calls[name], repeats)}
+        for name, latencies in results.items()
+    }
+
+
+async def bench_turns(config, knowledge_base_path, concurrency, turns, streaming, local_paths):
+    """`turns` perguntas divididas entre `concurrency` sessões simultâneas"""
+    reset_state()
+    client = SimulatedAgentsClient(config)
+    agent = SupportAgent(knowledge_base_path=knowledge_base_path)
+    await agent.connect(client=client, wait_for_ingestion=True)
+    agent.streaming_supported = streaming
+    if not local_paths:
+        agent.response_cache = None
+        agent.classifier = None
+    await wait_for_pool(agent)
+
+    latencies = []
+    sources = Counter()
+    before = client.calls.copy()
+
+    async def session_worker(worker):
+        for turn in range(worker, turns, concurrency):
+            question = f"{QUESTIONS[turn % len(QUESTIONS)]} (chamado {turn})"
+            started = time.perf_counter()
+            _, source = await agent.chat(f"bench-{worker}", question)
+            latencies.append(time.perf_counter() - started)
+            sources[source] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session_worker(worker) for worker in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    calls = client.calls - before
+    await agent.disconnect()
+
+    return {
+        **summarize(latencies),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(turns / elapsed, 2),
+        "errors": sources.get("error", 0),
+        "sources": dict(sources),
+        # Inclui chamadas de fundo (reposição do pool de threads)
+        "calls_per_turn": round(sum(calls.values()) / turns, 2),
+        "calls": _per_unit(calls, turns),
+    }
+
+
+async def bench_long_session(config, knowledge_base_path, turns, streaming):
+    """Uma sessão com muitos turnos, com e sem compactação de contexto
+
+    As respostas simuladas são mais longas (como as da base real) e o tempo de
+    processamento do run cresce com o histórico da thread.
+    """
+    config = replace(config, reply=" ".join([SIMULATED_REPLY] * 8))
+    quarter = max(1, turns // 4)
+    results = {}
+    for case, compaction in (("full_history", False), ("compacted", True)):
+        reset_state()
+        context_window.CONTEXT_COMPACTION_ENABLED = compaction
+        client = SimulatedAgentsClient(config)
+        agent = SupportAgent(knowledge_base_path=knowledge_base_path)
+        await agent.connect(client=client, wait_for_ingestion=True)
+        agent.streaming_supported = streaming
+        agent.response_cache = None
+        agent.classifier = None
+        await wait_for_pool(agent)
+
+        latencies = []
+        before = client.calls.copy()
+        try:
+            for turn in range(turns):
+                question = f"{QUESTIONS[turn % len(QUESTIONS)]} (tentativa {turn})"
+                started = time.perf_counter()
+                await agent.chat("bench-long", question)
+                latencies.append(time.perf_counter() - started)
+        finally:
+            context_window.CONTEXT_COMPACTION_ENABLED = True
+        calls = client.calls - before
+        await agent.disconnect()
+
+        results[case] = {
+            **summarize(latencies),
+            "first_quarter_p50_ms": round(float(np.percentile(latencies[:quarter], 50)) * 1000, 1),
+            "last_quarter_p50_ms": round(float(np.percentile(latencies[-quarter:], 50)) * 1000, 1),
+            "calls": _per_unit(calls, turns),
+        }
+    return results
+
+
+async def bench_spike(config, knowledge_base_path, sessions, streaming):
+    """Pico de incidente: `sessions` sessões novas mandam as mesmas perguntas juntas
+
+    Compara runs criados e latência com e sem coalescência (single-flight).
+    """
+    results = {}
+    for case in ("independent", "coalesced"):
+        reset_state()
+        client = SimulatedAgentsClient(config)
+        agent = SupportAgent(knowledge_base_path=knowledge_base_path)
+        await agent.connect(client=client, wait_for_ingestion=True)
+        agent.streaming_supported = streaming
+        agent.response_cache = None
+        agent.classifier = None
+        if case == "independent":
+            agent.in_flight = None
+        await wait_for_pool(agent)
+
+        latencies = []
+        sources = Counter()
+        before = client.calls.copy()
+
+        async def user(index):
+            # Variações de digitação que a normalização junta
+            question = QUESTIONS[index % 3]
+            question = question.upper() if index % 2 else f"  {question}  "
+            started = time.perf_counter()
+            _, source = await agent.chat(f"spike-{index}", question)
+            latencies.append(time.perf_counter() - started)
+            sources[source] += 1
+
+        await asyncio.gather(*(user(index) for index in range(sessions)))
+        calls = client.calls - before
+        await agent.disconnect()
+
+        results[case] = {
+            **summarize(latencies),
+            "runs": calls["runs.stream"] + calls["runs.create"],
+            "sources": dict(sources),
+            "calls": _per_unit(calls, sessions),
+        }
+    return results
+
+
+def _per_unit(calls, units):
+    return {operation: round(count / units, 2) for operation, count in sorted(calls.items())}
+
+
+def _git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def _flatten(results):
+    """Métricas comparáveis: {"turns.c4.p95_ms": valor, ...}"""
+    metrics = {}
+    for scenario, data in results.get("scenarios", {}).items():
+        for case, values in data.items():
+            for key, value in values.items():
+                if key.endswith("_ms") or key in HIGHER_IS_BETTER or key == "calls_per_turn":
+                    metrics[f"{scenario}.{case}.{key}"] = value
+    return metrics
+
+
+def compare(current, previous, threshold):
+    """Imprime a variação por métrica; retorna as regressões acima de `threshold` (%)"""
+    baseline = _flatten(previous)
+    regressions = []
+    print(f"\n📈 Comparação com {previous.get('commit') or 'resultado anterior'}:")
+    for name, value in _flatten(current).items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change = (value - old) / old * 100
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        marker = "⚠️ " if worse > threshold else "  "
+        print(f"{marker}{name}: {old} -> {value} ({change:+.1f}%)")
+        if worse > threshold:
+            regressions.append(name)
+    return regressions
+
+
+async def run_benchmarks(args, config):
+    scenarios = {}
+    with quiet(not args.verbose):
+        if "connect" in args.scenarios:
+            scenarios["connect"] = await bench_connect(config, args.knowledge_base, args.repeats)
+        if "kb_sync" in args.scenarios:
+            scenarios["kb_sync"] = await bench_kb_sync(config, args.kb_files, args.repeats)
+        if "turns" in args.scenarios:
+            scenarios["turns"] = {}
+            for concurrency in args.concurrency:
+                scenarios["turns"][f"c{concurrency}"] = await bench_turns(
+                    config, args.knowledge_base, concurrency, max(args.turns, concurrency),
+                    not args.no_stream, args.local_paths
+                )
+        if "long_session" in args.scenarios:
+            scenarios["long_session"] = await bench_long_session(
+                config, args.knowledge_base, args.session_turns, not args.no_stream
+            )
+        if "spike" in args.scenarios:
+            scenarios["spike"] = await bench_spike(config, args.knowledge_base, args.spike_sessions, not args.no_stream)
+    return scenarios
+
+
+def _print_summary(scenarios):
+    for scenario, data in scenarios.items():
+        print(f"\n⏱️  {scenario}")
+        for case, values in data.items():
+            line = (f"  {case:>12}: p50 {values.get('p50_ms')} ms | p95 {values.get('p95_ms')} ms"
+                    f" | p99 {values.get('p99_ms')} ms")
+            if "throughput_per_s" in values:
+                line += (f" | {values['throughput_per_s']}/s | {values['calls_per_turn']} chamadas/turno"
+                         f" | {values['errors']} erros")
+            elif "runs" in values:
+                line += f" | {values['runs']} runs para {sum(values['sources'].values())} perguntas"
+            elif "last_quarter_p50_ms" in values:
+                line += (f" | p50 1º quarto {values['first_quarter_p50_ms']} ms"
+                         f" -> último {values['last_quarter_p50_ms']} ms")
+            else:
+                if "ingested_p50_ms" in values:
+                    line += f" | base sincronizada p50 {values['ingested_p50_ms']} ms"
+                line += f" | {sum(values['calls'].values()):.1f} chamadas"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do agent com AgentsClient simulado")
+    parser.add_argument("--scenarios", default="connect,kb_sync,turns,long_session,spike",
+                        type=lambda value: value.split(","), help="Cenários separados por vírgula")
+    parser.add_argument("--concurrency", default="1,4,16",
+                        type=lambda value: [int(item) for item in value.split(",")],
+                        help="Níveis de concorrência dos turnos (padrão: 1,4,16)")
+    parser.add_argument("--turns", type=int, default=48, help="Turnos por nível de concorrência")
+    parser.add_argument("--session-turns", type=int, default=60, help="Turnos da sessão longa")
+    parser.add_argument("--spike-sessions", type=int, default=30, help="Sessões simultâneas no pico")
+    parser.add_argument("--repeats", type=int, default=5, help="Repetições de connect/kb_sync")
+    parser.add_argument("--kb-files", type=int, default=20, help="Arquivos da base sintética")
+    parser.add_argument("--knowledge-base", default="./knowledge_base")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiplica todas as latências simuladas")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Taxa de HTTP 500 por chamada")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Taxa de HTTP 429 por chamada")
+    parser.add_argument("--run-failure-rate", type=float, default=0.0, help="Taxa de runs com status failed")
+    parser.add_argument("--no-stream", action="store_true", help="Usar polling em vez de streaming")
+    parser.add_argument("--local-paths", action="store_true",
+                        help="Manter cache e classificador local ativos nos turnos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo JSON (padrão: benchmarks/results/<data>-<commit>.json)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Variação (%%) considerada regressão no --compare")
+    parser.add_argument("--verbose", action="store_true", help="Exibir os logs do agent")
+    args = parser.parse_args()
+
+    config = SimulationConfig(
+        latency_scale=args.latency_scale,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        run_failure_rate=args.run_failure_rate,
+        seed=args.seed,
+    )
+
+    try:
+        scenarios = asyncio.run(run_benchmarks(args, config))
+    finally:
+        shutil.rmtree(STATE_DIR, ignore_errors=True)
+
+    commit, dirty = _git_revision()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "simulation": asdict(config),
+        "scenarios": scenarios,
+    }
+
+    _print_summary(scenarios)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"\n💾 Resultados salvos em {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} métricas pioraram mais de {args.threshold}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+# benchmarks/simulated_client.py
+"""AgentsClient assíncrono simulado, para medir o agent sem o Azure.
+
+Implementa a parte da API usada pelo projeto (files, vector_stores,
+vector_store_files, vector_store_file_batches, threads, messages, runs e
+operações de agent) com latência sorteada por operação, tempo de fila e
+processamento dos runs e taxas de erro configuráveis. Todas as chamadas são
+contadas por operação.
+"""
+import asyncio
+import itertools
+import math
+import os
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+from azure.core.exceptions import HttpResponseError
+
+SIMULATED_REPLY = (
+    "Seu problema foi classificado como 'software'. SLA: 8 horas. "
+    "Sugestão: reinicie o aplicativo e, se o erro continuar, abra um chamado."
+)
+
+
+@dataclass
+class Latency:
+    """Distribuição log-normal definida pela mediana (ms) e dispersão"""
+    median_ms: float
+    sigma: float = 0.35
+
+    def sample(self, rng, scale=1.0):
+        return self.median_ms * math.exp(self.sigma * rng.gauss(0.0, 1.0)) * scale / 1000.0
+
+
+def default_latencies():
+    return {
+        "files.upload": Latency(300),
+        "files.delete": Latency(80),
+        "vector_stores.get": Latency(120),
+        "vector_stores.create": Latency(250),
+        "vector_stores.delete": Latency(150),
+        "vector_stores.list": Latency(150),
+        "vector_store_files.create": Latency(200),
+        "vector_store_files.delete": Latency(120),
+        "vector_store_file_batches.create": Latency(400),
+        "threads.create": Latency(120),
+        "threads.delete": Latency(80),
+        "messages.create": Latency(100),
+        "messages.list": Latency(120),
+        "runs.create": Latency(150),
+        "runs.get": Latency(60),
+        "runs.cancel": Latency(80),
+        "runs.stream": Latency(150),
+        "create_agent": Latency(300),
+        "update_agent": Latency(200),
+        "get_agent": Latency(100),
+        "list_agents": Latency(150),
+        "delete_agent": Latency(100),
+    }
+
+
+@dataclass
+class SimulationConfig:
+    """Parâmetros do serviço simulado
+
+    `error_rate`/`throttle_rate` valem para todas as operações (HTTP 500 e
+    429); `errors` sobrescreve a taxa de erro de uma operação específica.
+    """
+    latencies: dict = field(default_factory=default_latencies)
+    run_queue: Latency = field(default_factory=lambda: Latency(300, 0.6))
+    run_processing: Latency = field(default_factory=lambda: Latency(1500, 0.4))
+    # Busca remota (file_search) dentro do run; dispensada com tool_choice="none"
+    file_search: Latency = field(default_factory=lambda: Latency(400, 0.5))
+    # Processamento extra por 1k tokens (~4k caracteres) já presentes na thread
+    history_ms_per_1k_tokens: float = 150.0
+    latency_scale: float = 1.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    # Retry-After (ms, antes de latency_scale) devolvido com os 429; 0 omite o header
+    throttle_retry_after_ms: float = 1000.0
+    errors: dict = field(default_factory=dict)
+    run_failure_rate: float = 0.0
+    reply: str = SIMULATED_REPLY
+    stream_chunks: int = 12
+    seed: int = 42
+
+
+class SimulatedServiceError(HttpResponseError):
+    """Erro HTTP devolvido pelo serviço simulado"""
+
+    def __init__(self, operation, status_code, headers=None):
+        super().__init__(message=f"{operation}: HTTP {status_code} (simulado)")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class _Run:
+    def __init__(self, run_id, thread_id, agent_id, queue_time, processing_time, fails):
+        self.id = run_id
+        self.thread_id = thread_id
+        self.agent_id = agent_id
+        self.created = time.monotonic()
+        self.started = self.created + queue_time
+        self.finished = self.started + processing_time
+        self.fails = fails
+        self.cancelled = False
+        self.message_posted = False
+
+    def status_at(self, now):
+        if self.cancelled:
+            return "cancelled"
+        if now < self.started:
+            return "queued"
+        if now < self.finished:
+            return "in_progress"
+        return "failed" if self.fails else "completed"
+
+
+class _Operations:
+    """Agrupa operações sob um prefixo (ex.: client.threads.create)"""
+
+    def __init__(self, client):
+        self._client = client
+
+
+class _Files(_Operations):
+    async def upload(self, file=None, purpose=None, **kwargs):
+        await self._client._call("files.upload")
+        if hasattr(file, 'read'):
+            file.read()
+        file_object = SimpleNamespace(id=self._client._new_id("assistant-file"), purpose=purpose,
+                                      filename=os.path.basename(getattr(file, 'name', '') or ''),
+                                      created_at=int(time.time()))
+        self._client.uploaded_files[file_object.id] = file_object
+        return file_object
+
+    async def delete(self, file_id, **kwargs):
+        await self._client._call("files.delete")
+        self._client.uploaded_files.pop(file_id, None)
+
+    async def list(self, purpose=None, **kwargs):
+        await self._client._call("files.list")
+        return SimpleNamespace(data=[
+            file for file in list(self._client.uploaded_files.values()) if purpose in (None, file.purpose)
+        ])
+
+
+class _VectorStores(_Operations):
+    async def get(self, vector_store_id, **kwargs):
+        await self._client._call("vector_stores.get")
+        files = self._client.vector_stores_files.get(vector_store_id)
+        if files is None:
+            raise SimulatedServiceError("vector_stores.get", 404)
+        return self._client._vector_store_object(vector_store_id)
+
+    async def create(self, name=None, metadata=None, **kwargs):
+        await self._client._call("vector_stores.create")
+        vector_store_id = self._client._new_id("vs")
+        self._client.vector_stores_files[vector_store_id] = set()
+        self._client.vector_stores_info[vector_store_id] = (name, int(time.time()), metadata or {})
+        return self._client._vector_store_object(vector_store_id)
+
+    async def delete(self, vector_store_id, **kwargs):
+        await self._client._call("vector_stores.delete")
+        self._client.vector_stores_files.pop(vector_store_id, None)
+        self._client.vector_stores_info.pop(vector_store_id, None)
+
+    def list(self, limit=None, **kwargs):
+        client = self._client
+        return client._paged("vector_stores.list", list(client.vector_stores_files), client._vector_store_object,
+                             limit)
+
+
+class _VectorStoreFiles(_Operations):
+    async def create(self, vector_store_id, file_id, **kwargs):
+        await self._client._call("vector_store_files.create")
+        self._client.vector_stores_files.setdefault(vector_store_id, set()).add(file_id)
+
+    async def delete(self, vector_store_id, file_id, **kwargs):
+        await self._client._call("vector_store_files.delete")
+        self._client.vector_stores_files.get(vector_store_id, set()).discard(file_id)
+
+    def list(self, vector_store_id, limit=None, **kwargs):
+        client = self._client
+        return client._paged("vector_store_files.list", sorted(client.vector_stores_files.get(vector_store_id, ())),
+                             lambda file_id: SimpleNamespace(id=file_id, vector_store_id=vector_store_id), limit)
+
+
+class _VectorStoreFileBatches(_Operations):
+    async def create(self, vector_store_id, file_ids, **kwargs):
+        await self._client._call("vector_store_file_batches.create")
+        self._client.vector_stores_files.setdefault(vector_store_id, set()).update(file_ids)
+        return SimpleNamespace(id=self._client._new_id("vsfb"), status="completed")
+
+
+class _Threads(_Operations):
+    async def create(self, metadata=None, **kwargs):
+        await self._client._call("threads.create")
+        thread = SimpleNamespace(id=self._client._new_id("thread"), metadata=metadata or {},
+                                 created_at=int(time.time()))
+        self._client.thread_messages[thread.id] = []
+        self._client.threads_info[thread.id] = thread
+        return thread
+
+    async def delete(self, thread_id, **kwargs):
+        await self._client._call("threads.delete")
+        self._client.thread_messages.pop(thread_id, None)
+        self._client.threads_info.pop(thread_id, None)
+
+    def list(self, limit=None, **kwargs):
+        client = self._client
+        return client._paged("threads.list", list(client.threads_info.values()), lambda thread: thread, limit)
+
+
+class _Messages(_Operations):
+    async def create(self, thread_id, content, role="user", **kwargs):
+        await self._client._call("messages.create")
+        return self._client._post_message(thread_id, role, content, None)
+
+    def list(self, thread_id, run_id=None, order="desc", limit=None, **kwargs):
+        client = self._client
+
+        async def pages():
+            messages = [
+                message for message in client.thread_messages.get(thread_id, [])
+                if run_id is None or message.run_id == run_id
+            ]
+            if order == "desc":
+                messages = messages[::-1]
+            page_size = limit or 20
+            # Uma chamada por página, como o pager do SDK
+            for index, message in enumerate(messages or [None]):
+                if index % page_size == 0:
+                    await client._call("messages.list")
+                if message is not None:
+                    yield message
+        return pages()
+
+
+class _Stream:
+    """Imita o AsyncAgentRunStream: context manager assíncrono iterável"""
+
+    def __init__(self, client, run):
+        self._client = client
+        self._run = run
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def __aiter__(self):
+        client, run = self._client, self._run
+        yield "thread.run.created", client._run_object(run), None
+
+        await asyncio.sleep(max(0.0, run.started - time.monotonic()))
+        yield "thread.run.in_progress", client._run_object(run), None
+
+        text = client.config.reply
+        chunks = max(1, client.config.stream_chunks)
+        size = max(1, math.ceil(len(text) / chunks))
+        step = (run.finished - run.started) / chunks
+        for start in range(0, len(text), size):
+            await asyncio.sleep(step)
+            yield "thread.message.delta", SimpleNamespace(text=text[start:start + size]), None
+
+        await asyncio.sleep(max(0.0, run.finished - time.monotonic()))
+        message = client._complete_run(run)
+        if message is not None:
+            yield "thread.message.completed", message, None
+        status = run.status_at(time.monotonic())
+        yield f"thread.run.{status}", client._run_object(run), None
+
+
+class _Runs(_Operations):
+    async def create(self, thread_id, agent_id, additional_messages=None, **kwargs):
+        await self._client._call("runs.create")
+        return self._client._run_object(
+            self._client._start_run(thread_id, agent_id, additional_messages, kwargs.get("tool_choice"))
+        )
+
+    async def get(self, thread_id, run_id, **kwargs):
+        await self._client._call("runs.get")
+        run = self._client.runs_by_id[run_id]
+        self._client._complete_run(run)
+        return self._client._run_object(run)
+
+    async def cancel(self, thread_id, run_id, **kwargs):
+        await self._client._call("runs.cancel")
+        run = self._client.runs_by_id[run_id]
+        if run.status_at(time.monotonic()) in ("queued", "in_progress"):
+            run.cancelled = True
+        return self._client._run_object(run)
+
+    async def stream(self, thread_id, agent_id, additional_messages=None, **kwargs):
+        await self._client._call("runs.stream")
+        return _Stream(
+            self._client, self._client._start_run(thread_id, agent_id, additional_messages, kwargs.get("tool_choice"))
+        )
+
+
+class SimulatedAgentsClient:
+    """Substituto local do azure.ai.agents.aio.AgentsClient"""
+
+    def __init__(self, config=None):
+        self.config = config or SimulationConfig()
+        self.rng = random.Random(self.config.seed)
+        self.calls = Counter()
+        self._ids = itertools.count(1)
+
+        self.agents = {}
+        self.vector_stores_files = {}  # vector_store_id -> {file_id}
+        self.thread_messages = {}  # thread_id -> [mensagens]
+        self.runs_by_id = {}
+        self.vector_stores_info = {}  # vector_store_id -> (nome, created_at, metadata)
+        self.threads_info = {}  # thread_id -> thread
+        self.uploaded_files = {}  # file_id -> arquivo
+
+        self.files = _Files(self)
+        self.vector_stores = _VectorStores(self)
+        self.vector_store_files = _VectorStoreFiles(self)
+        self.vector_store_file_batches = _VectorStoreFileBatches(self)
+        self.threads = _Threads(self)
+        self.messages = _Messages(self)
+        self.runs = _Runs(self)
+
+    def _new_id(self, prefix):
+        return f"{prefix}_{next(self._ids):06d}"
+
+    async def _call(self, operation):
+        """Conta a chamada, aguarda a latência sorteada e injeta erros"""
+        self.calls[operation] += 1
+        latency = self.config.latencies.get(operation, Latency(100))
+        await asyncio.sleep(latency.sample(self.rng, self.config.latency_scale))
+
+        roll = self.rng.random()
+        if roll < self.config.throttle_rate:
+            retry_after_ms = self.config.throttle_retry_after_ms * self.config.latency_scale
+            raise SimulatedServiceError(
+                operation, 429, {"retry-after-ms": f"{retry_after_ms:.0f}"} if retry_after_ms > 0 else None
+            )
+        if roll < self.config.throttle_rate + self.config.errors.get(operation, self.config.error_rate):
+            raise SimulatedServiceError(operation, 500)
+
+    def _paged(self, operation, items, convert, limit=None):
+        """Listagem paginada: uma chamada `operation` por página de `limit` itens"""
+        page_size = limit or 20
+
+        async def pages():
+            for start in range(0, max(len(items), 1), page_size):
+                await self._call(operation)
+                for item in items[start:start + page_size]:
+                    yield convert(item)
+        return pages()
+
+    def _vector_store_object(self, vector_store_id):
+        name, created_at, metadata = self.vector_stores_info.get(vector_store_id, (None, None, {}))
+        return SimpleNamespace(id=vector_store_id, name=name, created_at=created_at, metadata=metadata,
+                               last_active_at=created_at,
+                               file_counts=SimpleNamespace(total=len(self.vector_stores_files[vector_store_id])))
+
+    def _post_message(self, thread_id, role, content, run_id):
+        if thread_id not in self.thread_messages:
+            raise SimulatedServiceError("messages", 404)
+        message = SimpleNamespace(
+            id=self._new_id("msg"),
+            role=role,
+            run_id=run_id,
+            content=[SimpleNamespace(text=SimpleNamespace(value=content))],
+        )
+        self.thread_messages[thread_id].append(message)
+        return message
+
+    def _start_run(self, thread_id, agent_id, additional_messages, tool_choice=None):
+        if thread_id not in self.thread_messages:
+            raise SimulatedServiceError("runs", 404)
+        for message in additional_messages or []:
+            self._post_message(thread_id, message["role"], message["content"], None)
+
+        scale = self.config.latency_scale
+        history_chars = sum(
+            len(content.text.value) for message in self.thread_messages[thread_id] for content in message.content
+        )
+        queue_time = self.config.run_queue.sample(self.rng, scale)
+        processing_time = (self.config.run_processing.sample(self.rng, scale)
+                           + history_chars / 4000 * self.config.history_ms_per_1k_tokens / 1000 * scale)
+        if tool_choice != "none":
+            processing_time += self.config.file_search.sample(self.rng, scale)
+        run = _Run(
+            self._new_id("run"), thread_id, agent_id, queue_time, processing_time,
+            self.rng.random() < self.config.run_failure_rate,
+        )
+        self.runs_by_id[run.id] = run
+        return run
+
+    def _complete_run(self, run):
+        """Publica a resposta do assistant quando o run termina com sucesso"""
+        if run.message_posted or run.status_at(time.monotonic()) != "completed":
+            return None
+        run.message_posted = True
+        return self._post_message(run.thread_id, "assistant", self.config.reply, run.id)
+
+    def _run_object(self, run):
+        return SimpleNamespace(
+            id=run.id,
+            thread_id=run.thread_id,
+            agent_id=run.agent_id,
+            status=run.status_at(time.monotonic()),
+        )
+
+    async def create_agent(self, model, name=None, instructions=None, tools=None, tool_resources=None,
+                           metadata=None, **kwargs):
+        await self._call("create_agent")
+        agent = SimpleNamespace(id=self._new_id("asst"), name=name, model=model, created_at=int(time.time()),
+                                metadata=metadata or {},
+                                instructions=instructions, tools=tools or [], tool_resources=tool_resources)
+        self.agents[agent.id] = agent
+        return agent
+
+    async def update_agent(self, agent_id, **kwargs):
+        await self._call("update_agent")
+        agent = self.agents.get(agent_id)
+        if agent is None:
+            raise SimulatedServiceError("update_agent", 404)
+        for key, value in kwargs.items():
+            setattr(agent, key, value)
+        return agent
+
+    async def get_agent(self, agent_id, **kwargs):
+        await self._call("get_agent")
+        agent = self.agents.get(agent_id)
+        if agent is None:
+            raise SimulatedServiceError("get_agent", 404)
+        return agent
+
+    def list_agents(self, limit=None, **kwargs):
+        return self._paged("list_agents", list(self.agents.values()), lambda agent: agent, limit)
+
+    async def delete_agent(self, agent_id, **kwargs):
+        await self._call("delete_agent")
+        self.agents.pop(agent_id, None)
+
+    async def close(self):
+        pass
@@ -0,0 +1,140 @@
+# chat_view.py
+"""Área de chat com renderização em lote e histórico limitado.
+
+As mensagens são acumuladas e inseridas de uma vez a cada
+CHAT_FLUSH_INTERVAL_MS. O widget guarda no máximo CHAT_MAX_LINES linhas; as
+mais antigas vão para um transcript em disco e voltam sob demanda quando o
+usuário rola até o topo.
+"""
+import os
+import time
+import tkinter as tk
+from tkinter import scrolledtext
+
+from kb_sync import STATE_DIR
+
+CHAT_MAX_LINES = int(os.getenv("CHAT_MAX_LINES", "2000"))
+CHAT_FLUSH_INTERVAL_MS = int(os.getenv("CHAT_FLUSH_INTERVAL_MS", "50"))
+# Linhas trazidas do transcript a cada rolagem até o topo
+HISTORY_CHUNK_LINES = 200
+
+TAG_STYLES = {
+    "user_prefix": "blue",
+    "agent_prefix": "green",
+    "error_prefix": "red",
+    "system_prefix": "gray",
+}
+
+
+class ChatView:
+    """ScrolledText com inserção em lote, limite de linhas e transcript em disco"""
+
+    def __init__(self, parent, max_lines=None, flush_interval_ms=None, transcript_path=None, **text_options):
+        self.text = scrolledtext.ScrolledText(parent, **text_options)
+        self.text.config(state=tk.DISABLED)
+        font = text_options.get('font', ('Arial', 10))
+        for tag, color in TAG_STYLES.items():
+            self.text.tag_configure(tag, foreground=color, font=(font[0], font[1], 'bold'))
+
+        self.max_lines = CHAT_MAX_LINES if max_lines is None else max_lines
+        self.flush_interval_ms = CHAT_FLUSH_INTERVAL_MS if flush_interval_ms is None else flush_interval_ms
+        self.transcript_path = transcript_path or os.path.join(
+            STATE_DIR, "transcripts", f"chat-{time.strftime('%Y%m%d-%H%M%S')}.txt"
+        )
+
+        self._pending = []  # [texto, tag, texto, tag, ...] para um único insert
+        self._flush_scheduled = False
+        # Transcript: offset (bytes) do início de cada linha arquivada
+        self._archive_offsets = []
+        self._archive_size = 0
+        # Linhas do topo do widget que vieram do transcript (já estão em disco)
+        self._loaded_from_archive = 0
+        self._loading_history = False
+
+        self.text.configure(yscrollcommand=self._on_scroll)
+
+    def pack(self, **options):
+        self.text.pack(**options)
+
+    def write(self, text, tag=None):
+        """Enfileira um trecho para a próxima inserção em lote"""
+        self._pending.extend((text, (tag,) if tag else ()))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.text.after(self.flush_interval_ms, self.flush)
+
+    def flush(self):
+        """Insere todos os trechos pendentes de uma vez"""
+        self._flush_scheduled = False
+        if not self._pending:
+            return
+        at_bottom = self.text.yview()[1] >= 0.999
+        pending, self._pending = self._pending, []
+
+        self.text.config(state=tk.NORMAL)
+        self.text.insert(tk.END, *pending)
+        if at_bottom:
+            self._trim()
+        self.text.config(state=tk.DISABLED)
+        if at_bottom:
+            self.text.see(tk.END)
+
+    def _line_count(self):
+        return int(self.text.index('end-1c').split('.')[0])
+
+    def _trim(self):
+        """Move as linhas excedentes do topo para o transcript"""
+        excess = self._line_count() - self.max_lines
+        if excess <= 0:
+            return
+        # Remove um pouco além do limite para não aparar a cada mensagem
+        excess += self.max_lines // 10
+        already_archived = min(excess, self._loaded_from_archive)
+        removed = self.text.get("1.0", f"{excess + 1}.0")
+        self.text.delete("1.0", f"{excess + 1}.0")
+        self._loaded_from_archive -= already_archived
+
+        new_lines = removed.splitlines(keepends=True)[already_archived:]
+        if new_lines:
+            self._archive(new_lines)
+
+    def _archive(self, lines):
+        os.makedirs(os.path.dirname(os.path.abspath(self.transcript_path)), exist_ok=True)
+        with open(self.transcript_path, 'ab') as file:
+            for line in lines:
+                data = line.encode('utf-8')
+                self._archive_offsets.append(self._archive_size)
+                file.write(data)
+                self._archive_size += len(data)
+
+    def _on_scroll(self, first, last):
+        self.text.vbar.set(first, last)
+        if float(first) <= 0.0 and self._has_more_history() and not self._loading_history:
+            self._loading_history = True
+            self.text.after_idle(self._load_history)
+
+    def _has_more_history(self):
+        return self._loaded_from_archive < len(self._archive_offsets)
+
+    def _load_history(self):
+        """Traz do transcript o bloco anterior às linhas exibidas"""
+        try:
+            end = len(self._archive_offsets) - self._loaded_from_archive
+            start = max(0, end - HISTORY_CHUNK_LINES)
+            if end <= 0:
+                return
+            end_offset = self._archive_offsets[end] if end < len(self._archive_offsets) else self._archive_size
+            with open(self.transcript_path, 'rb') as file:
+                file.seek(self._archive_offsets[start])
+                chunk = file.read(end_offset - self._archive_offsets[start]).decode('utf-8')
+
+            self.text.config(state=tk.NORMAL)
+            self.text.insert("1.0", chunk)
+            self.text.config(state=tk.DISABLED)
+            self._loaded_from_archive += end - start
+            # Mantém na tela as mesmas linhas que o usuário estava vendo
+            self.text.yview(f"{end - start + 1}.0")
+        except OSError as e:
+            print(f"⚠️  Não foi possível ler o transcript: {e}")
+        finally:
+            self._loading_history = False
@@ -0,0 +1,276 @@
+# cleanup.py
+"""Limpeza de recursos órfãos no projeto do Azure AI Foundry.
+
+Agents `suporte-ti-agent-*`, Vector Stores `knowledge-base-support-ti`,
+threads marcadas pelo app e arquivos da base enviados e não mais usados se
+acumulam quando o app é fechado no meio da desconexão (ou quando a base é
+reenviada). Isso deixa as listagens mais lentas e consome a cota do projeto.
+
+Só entram recursos criados por esta instalação (`install_id` no metadata,
+veja agent_state.resource_metadata), com mais de --older-than-hours (para
+Vector Stores, contados do último uso). Outras instalações no mesmo projeto
+(outro checkout, CI) ficam intactas, assim como o agent e o Vector Store em
+uso, os arquivos do manifesto ou associados a qualquer Vector Store que não
+será removido e os recursos de processos ainda vivos nesta máquina.
+
+Por padrão só lista; --delete remove, em lotes paralelos.
+
+Uso:
+    python cleanup.py
+    python cleanup.py --delete --older-than-hours 6 -c 16
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from agent_state import APP_NAME, AgentState, install_id
+from kb_compile import COMPILED_DIR
+from kb_sync import STATE_DIR, VECTOR_STORE_NAME, KnowledgeBaseManifest, list_attached_file_ids, scan_knowledge_base
+from resilience import RESILIENCE_ENABLED, ResilientClient
+from support_agent import AGENT_NAME_PREFIX
+from telemetry import set_attributes, setup_telemetry, span
+
+ORPHAN_MIN_AGE_HOURS = float(os.getenv("ORPHAN_MIN_AGE_HOURS", "24"))
+CLEANUP_CONCURRENCY = int(os.getenv("CLEANUP_CONCURRENCY", "8"))
+LIST_PAGE_SIZE = 100
+FILE_PURPOSE = "assistants"
+
+
+@dataclass
+class Orphan:
+    """Recurso remoto candidato à remoção"""
+    kind: str  # agent, vector_store, thread ou file
+    id: str
+    name: str
+    created_at: float
+
+
+def _timestamp(item, attribute='created_at'):
+    """Data do SDK (datetime ou epoch) em segundos; None se ausente"""
+    value = getattr(item, attribute, None)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value) if value is not None else None
+
+
+def _is_old(item, cutoff, attribute='created_at'):
+    timestamp = _timestamp(item, attribute)
+    return timestamp is not None and timestamp < cutoff
+
+
+def _metadata(item):
+    return getattr(item, 'metadata', None) or {}
+
+
+def _process_alive(pid):
+    """Indica se o processo `pid` desta máquina ainda existe (na dúvida, sim)"""
+    if os.name == "nt":
+        import ctypes
+        # os.kill(pid, 0) encerraria o processo no Windows
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _is_own(item):
+    """Recurso criado por esta instalação e por nenhum processo vivo nesta máquina"""
+    metadata = _metadata(item)
+    if metadata.get("app") != APP_NAME or metadata.get("install_id") != install_id():
+        return False
+    if metadata.get("host") == socket.gethostname() and str(metadata.get("pid", "")).isdigit():
+        return not _process_alive(int(metadata["pid"]))
+    return True
+
+
+def _knowledge_base_file_names(knowledge_base_path, manifest):
+    """Nomes de arquivo que o app envia (base original, compilada e manifesto)"""
+    names = set(scan_knowledge_base(knowledge_base_path)) | set(scan_knowledge_base(COMPILED_DIR))
+    return names | set(manifest.files)
+
+
+async def _find_agents(client, cutoff, keep):
+    return [
+        Orphan("agent", agent.id, agent.name, _timestamp(agent))
+        async for agent in client.list_agents(limit=LIST_PAGE_SIZE)
+        if (agent.name or "").startswith(AGENT_NAME_PREFIX) and agent.id not in keep
+        and _is_old(agent, cutoff) and _is_own(agent)
+    ]
+
+
+async def _find_vector_stores(client, cutoff, keep):
+    """Retorna (órfãos, ids dos Vector Stores do app que continuam)"""
+    orphans, remaining = [], []
+    async for vector_store in client.vector_stores.list(limit=LIST_PAGE_SIZE):
+        if vector_store.name != VECTOR_STORE_NAME:
+            continue
+        # Vector Stores são reutilizados por muito tempo: a idade conta do último uso
+        last_used = 'last_active_at' if _timestamp(vector_store, 'last_active_at') else 'created_at'
+        if vector_store.id not in keep and _is_old(vector_store, cutoff, last_used) and _is_own(vector_store):
+            orphans.append(Orphan("vector_store", vector_store.id, vector_store.name, _timestamp(vector_store)))
+        else:
+            remaining.append(vector_store.id)
+    return orphans, remaining
+
+
+async def _find_threads(client, cutoff):
+    return [
+        Orphan("thread", thread.id, "", _timestamp(thread))
+        async for thread in client.threads.list(limit=LIST_PAGE_SIZE)
+        if _is_old(thread, cutoff) and _is_own(thread)
+    ]
+
+
+async def _attached_file_ids(client, vector_store_ids):
+    """Arquivos associados aos Vector Stores informados (de qualquer instalação)"""
+    groups = await asyncio.gather(*(list_attached_file_ids(client, vector_store_id)
+                                    for vector_store_id in vector_store_ids))
+    return set().union(*groups)
+
+
+async def _find_files(client, cutoff, keep, file_names):
+    response = await client.files.list(purpose=FILE_PURPOSE)
+    return [
+        Orphan("file", file.id, file.filename, _timestamp(file))
+        for file in response.data
+        if file.filename in file_names and file.id not in keep and _is_old(file, cutoff)
+    ]
+
+
+async def _find_stores_and_files(client, cutoff, kept_stores, kept_files, file_names):
+    """Arquivos não têm metadata: só são órfãos se nenhum Vector Store restante os usa"""
+    vector_stores, remaining = await _find_vector_stores(client, cutoff, kept_stores)
+    attached = await _attached_file_ids(client, remaining)
+    files = await _find_files(client, cutoff, kept_files | attached, file_names)
+    return vector_stores + files
+
+
+async def find_orphans(client, min_age_hours, knowledge_base_path="./knowledge_base"):
+    """Lista agents, Vector Stores, threads e arquivos órfãos desta instalação (em paralelo)"""
+    cutoff = time.time() - min_age_hours * 3600
+    state = AgentState.load()
+    manifest = KnowledgeBaseManifest.load(os.path.join(STATE_DIR, "kb_manifest.json"))
+    kept_files = {entry["file_id"] for entry in manifest.files.values()}
+
+    with span("cleanup.find", min_age_hours=min_age_hours) as find_span:
+        groups = await asyncio.gather(
+            _find_agents(client, cutoff, {state.agent_id}),
+            _find_stores_and_files(client, cutoff, {manifest.vector_store_id, state.vector_store_id}, kept_files,
+                                   _knowledge_base_file_names(knowledge_base_path, manifest)),
+            _find_threads(client, cutoff),
+        )
+        orphans = [orphan for group in groups for orphan in group]
+        set_attributes(find_span, **{"cleanup.orphans": len(orphans)})
+    return orphans
+
+
+def _delete_call(client, orphan):
+    if orphan.kind == "agent":
+        return client.delete_agent(orphan.id)
+    if orphan.kind == "vector_store":
+        return client.vector_stores.delete(orphan.id)
+    if orphan.kind == "thread":
+        return client.threads.delete(orphan.id)
+    return client.files.delete(orphan.id)
+
+
+async def delete_orphans(client, orphans, concurrency=None):
+    """Remove os órfãos com no máximo `concurrency` chamadas simultâneas
+
+    Retorna (removidos, falhas), onde falhas é uma lista de (órfão, erro).
+    """
+    semaphore = asyncio.Semaphore(CLEANUP_CONCURRENCY if concurrency is None else concurrency)
+    deleted, failed = [], []
+
+    async def delete_one(orphan):
+        async with semaphore:
+            try:
+                await _delete_call(client, orphan)
+                deleted.append(orphan)
+            except Exception as e:
+                failed.append((orphan, e))
+
+    with span("cleanup.delete", count=len(orphans)) as delete_span:
+        await asyncio.gather(*(delete_one(orphan) for orphan in orphans))
+        set_attributes(delete_span, **{"cleanup.deleted": len(deleted), "cleanup.failed": len(failed)})
+    return deleted, failed
+
+
+async def sweep(client, min_age_hours, delete=False, concurrency=None, knowledge_base_path="./knowledge_base"):
+    """Encontra e (com delete) remove os órfãos; retorna (órfãos, falhas)"""
+    started = time.perf_counter()
+    orphans = await find_orphans(client, min_age_hours, knowledge_base_path)
+    counts = {}
+    for orphan in orphans:
+        counts[orphan.kind] = counts.get(orphan.kind, 0) + 1
+    print(f"🔍 {len(orphans)} órfãos com mais de {min_age_hours:g} h: {counts or 'nenhum'}")
+
+    if not delete or not orphans:
+        for orphan in orphans:
+            print(f"  {orphan.kind:>12} {orphan.id} {orphan.name or ''}")
+        if orphans:
+            print("ℹ️  Nada foi removido; use --delete para remover")
+        return orphans, []
+
+    deleted, failed = await delete_orphans(client, orphans, concurrency)
+    for orphan, error in failed:
+        print(f"❌ Falha ao remover {orphan.kind} {orphan.id}: {error}")
+    print(f"🗑️  {len(deleted)} removidos, {len(failed)} falhas em {time.perf_counter() - started:.1f}s")
+    return orphans, failed
+
+
+async def _run(args):
+    from azure.ai.agents.aio import AgentsClient
+    from azure.identity.aio import DefaultAzureCredential
+
+    endpoint = os.getenv("AZURE_AI_PROJECT_ENDPOINT")
+    if not endpoint:
+        raise ValueError("Variáveis de ambiente não configuradas")
+
+    credential = DefaultAzureCredential()
+    if RESILIENCE_ENABLED:
+        # Remoções em massa esbarram no limite do serviço: 429 viram espera, não falha
+        client = ResilientClient(AgentsClient(endpoint=endpoint, credential=credential, retry_total=0))
+    else:
+        client = AgentsClient(endpoint=endpoint, credential=credential)
+    try:
+        _, failed = await sweep(client, args.older_than_hours, args.delete, args.concurrency, args.knowledge_base)
+    finally:
+        await client.close()
+        await credential.close()
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove recursos órfãos do agent de suporte TI")
+    parser.add_argument("--older-than-hours", type=float, default=ORPHAN_MIN_AGE_HOURS,
+                        help=f"Idade mínima dos órfãos (padrão: {ORPHAN_MIN_AGE_HOURS:g})")
+    parser.add_argument("-c", "--concurrency", type=int, default=CLEANUP_CONCURRENCY,
+                        help=f"Remoções simultâneas (padrão: {CLEANUP_CONCURRENCY})")
+    parser.add_argument("--knowledge-base", default="./knowledge_base")
+    parser.add_argument("--delete", action="store_true", help="Remover os órfãos (padrão: só listar)")
+    args = parser.parse_args()
+
+    setup_telemetry()
+    sys.exit(asyncio.run(_run(args)))
+
+
+if __name__ == "__main__":
+    main()
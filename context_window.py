@@ -0,0 +1,97 @@
+# context_window.py
+"""Janela de contexto das conversas e compactação de threads.
+
+Acompanha o tamanho aproximado (em tokens) do que já foi enviado à thread
+remota e o estado do chamado em aberto: categoria, SLA e sugestões já dadas.
+Passado CONTEXT_TOKEN_BUDGET, a conversa troca de thread e a nova começa só
+com um resumo do chamado, mantendo o custo de cada run estável em sessões
+longas.
+"""
+import os
+from collections import deque
+
+CONTEXT_COMPACTION_ENABLED = os.getenv("CONTEXT_COMPACTION_ENABLED", "true").lower() == "true"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+# Aproximação usual para texto em português/inglês
+CHARS_PER_TOKEN = 4
+# Itens mantidos no resumo
+SUMMARY_MAX_STEPS = 5
+SUMMARY_MAX_QUESTIONS = 3
+SUMMARY_ITEM_MAX_CHARS = 200
+
+
+def estimate_tokens(text):
+    """Número aproximado de tokens de um texto"""
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _shorten(text):
+    text = " ".join((text or "").split())
+    if len(text) <= SUMMARY_ITEM_MAX_CHARS:
+        return text
+    return text[:SUMMARY_ITEM_MAX_CHARS - 1].rstrip() + "…"
+
+
+class ContextWindow:
+    """Tokens acumulados na thread e resumo do chamado em aberto"""
+
+    def __init__(self, budget=None):
+        self.budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+        self.tokens = 0
+        self.category = None
+        self.sla = None
+        self.steps = deque(maxlen=SUMMARY_MAX_STEPS)
+        self.questions = deque(maxlen=SUMMARY_MAX_QUESTIONS)
+
+    def add_turn(self, message, reply, classification=None, sent=None):
+        """Contabiliza um turno; `classification` vem de parse_classification
+
+        `sent` é o conteúdo de fato enviado à thread quando difere da pergunta
+        (ex.: com os trechos da base anexados); é ele que conta nos tokens.
+        """
+        self.tokens += estimate_tokens(sent or message) + estimate_tokens(reply)
+        self.questions.append(_shorten(message))
+        classification = classification or {}
+        if classification.get("category"):
+            self.category = classification["category"]
+        if classification.get("sla"):
+            self.sla = classification["sla"]
+        suggestion = classification.get("suggestion")
+        if suggestion:
+            suggestion = _shorten(suggestion)
+            if suggestion not in self.steps:
+                self.steps.append(suggestion)
+
+    def fingerprint(self):
+        """Estado do chamado que influencia a resposta (vazio numa conversa nova)
+
+        Só categoria e SLA: o texto das perguntas anteriores não muda a
+        resposta, e uma pergunta repetida depois de um "bom dia" continua
+        sendo a mesma pergunta.
+        """
+        return (self.category, self.sla)
+
+    def needs_compaction(self):
+        return CONTEXT_COMPACTION_ENABLED and self.budget > 0 and self.tokens > self.budget
+
+    def summary(self):
+        """Resumo do chamado usado como primeira mensagem da nova thread"""
+        lines = ["Resumo do atendimento até aqui (a conversa anterior foi encerrada para manter o contexto curto):"]
+        if self.category:
+            lines.append(f"- Categoria: {self.category}")
+        if self.sla:
+            lines.append(f"- SLA: {self.sla}")
+        if self.steps:
+            lines.append("- Já sugerido ao usuário: " + "; ".join(self.steps))
+        if self.questions:
+            lines.append("- Últimas mensagens do usuário: " + "; ".join(f'"{question}"' for question in self.questions))
+        lines.append("Continue o atendimento a partir deste ponto, sem repetir as sugestões já dadas.")
+        return "\n".join(lines)
+
+    def carry_over(self, other):
+        """Herda o chamado de outra janela (thread anterior) e conta só o resumo"""
+        self.category = other.category
+        self.sla = other.sla
+        self.steps = deque(other.steps, maxlen=SUMMARY_MAX_STEPS)
+        self.questions = deque(other.questions, maxlen=SUMMARY_MAX_QUESTIONS)
+        self.tokens = estimate_tokens(self.summary())
@@ -0,0 +1,225 @@
+# evaluate.py
+"""Avaliação do agent com os chamados rotulados da base de conhecimento.
+
+Envia os pares pergunta/categoria de base_support_ti.json (e de arquivos
+JSONL extras com os mesmos campos) ao agent, com N runs simultâneos, e compara
+a categoria e o SLA extraídos da resposta com os esperados. Reporta acurácia,
+matriz de confusão por categoria, concordância de SLA e distribuição de
+latência, para que mudanças de prompt, modelo ou cache sejam julgadas por
+qualidade e velocidade juntas.
+
+Uso:
+    python evaluate.py
+    python evaluate.py --extra chamados_rotulados.jsonl -c 8 -o avaliacao.json
+    python evaluate.py --local-paths --compare avaliacao.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from batch_classify import classify_ticket
+from fast_classifier import normalize_category
+from support_agent import SupportAgent
+from text_utils import normalize_text
+
+UNKNOWN = "?"
+
+
+def read_cases(knowledge_base_path, extra_paths=()):
+    """Casos rotulados: {"text", "category", "sla"} da base e dos JSONL extras"""
+    with open(os.path.join(knowledge_base_path, "base_support_ti.json"), 'r', encoding='utf-8') as file:
+        records = json.load(file)
+    for path in extra_paths:
+        with open(path, 'r', encoding='utf-8') as file:
+            records.extend(json.loads(line) for line in file if line.strip())
+
+    return [
+        {"text": record["pergunta"], "category": record["categoria"], "sla": record.get("sla")}
+        for record in records if record.get("pergunta") and record.get("categoria")
+    ]
+
+
+def sla_matches(expected, predicted):
+    """SLA esperado contido no da resposta ('4 horas' em '4 horas (prioridade média)')"""
+    if not expected or not predicted:
+        return False
+    return normalize_text(expected) in normalize_text(predicted)
+
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = np.asarray(values)
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 1),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p90_ms": round(float(np.percentile(values, 90)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "max_ms": round(float(values.max()), 1),
+    }
+
+
+def build_report(cases, records):
+    """Métricas de qualidade e latência a partir dos resultados por caso"""
+    categories = sorted({case["category"] for case in cases})
+    confusion = {expected: Counter() for expected in categories}
+    correct = sla_checked = sla_agreed = errors = 0
+    sources = Counter()
+    latencies = []
+    mistakes = []
+
+    for case, record in zip(cases, records):
+        predicted = UNKNOWN if record.get("error") else (normalize_category(record.get("category")) or UNKNOWN)
+        confusion[case["category"]][predicted] += 1
+        errors += bool(record.get("error"))
+        sources[record.get("source") or "error"] += 1
+        latencies.append(record["latency_ms"])
+
+        if predicted == case["category"]:
+            correct += 1
+        else:
+            mistakes.append({"text": case["text"], "expected": case["category"], "predicted": predicted,
+                             "reply": record.get("reply") or record.get("error")})
+        if case["sla"]:
+            sla_checked += 1
+            sla_agreed += sla_matches(case["sla"], record.get("sla"))
+
+    per_category = {}
+    for category in categories:
+        predicted_total = sum(row[category] for row in confusion.values())
+        actual_total = sum(confusion[category].values())
+        hits = confusion[category][category]
+        per_category[category] = {
+            "support": actual_total,
+            "precision": round(hits / predicted_total, 3) if predicted_total else None,
+            "recall": round(hits / actual_total, 3) if actual_total else None,
+        }
+
+    return {
+        "cases": len(cases),
+        "accuracy": round(correct / len(cases), 3) if cases else None,
+        "sla_agreement": round(sla_agreed / sla_checked, 3) if sla_checked else None,
+        "errors": errors,
+        "per_category": per_category,
+        "confusion": {expected: dict(row) for expected, row in confusion.items()},
+        "latency": _percentiles(latencies),
+        "sources": dict(sources),
+        "mistakes": mistakes,
+    }
+
+
+async def run_evaluation(cases, concurrency, local_paths=False, client=None):
+    """Classifica os casos com no máximo `concurrency` runs simultâneos"""
+    agent = SupportAgent()
+    await agent.connect(client=client, wait_for_ingestion=True)
+    if not local_paths:
+        # Os casos vêm da própria base: cache, classificador e busca local a reproduziriam
+        agent.response_cache = None
+        agent.classifier = None
+        agent.retriever = None
+
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def worker(index, case):
+        nonlocal done
+        async with semaphore:
+            record = await classify_ticket(agent, index, {"id": index, "text": case["text"]})
+        done += 1
+        if done % 10 == 0 or done == len(cases):
+            print(f"📊 {done}/{len(cases)} casos avaliados", file=sys.stderr)
+        return record
+
+    started = time.perf_counter()
+    try:
+        records = await asyncio.gather(*(worker(index, case) for index, case in enumerate(cases)))
+    finally:
+        await agent.disconnect()
+    return records, time.perf_counter() - started
+
+
+def print_report(report, elapsed):
+    latency = report["latency"]
+    print(f"\n🎯 Acurácia: {report['accuracy']:.1%} ({report['cases']} casos, {report['errors']} erros)")
+    if report["sla_agreement"] is not None:
+        print(f"⏰ SLA correto: {report['sla_agreement']:.1%}")
+    print(f"⏱️  Latência: p50 {latency.get('p50_ms')} ms | p95 {latency.get('p95_ms')} ms"
+          f" | p99 {latency.get('p99_ms')} ms | {report['cases'] / elapsed:.1f} casos/s")
+    print(f"📦 Origem das respostas: {report['sources']}")
+
+    categories = list(report["confusion"])
+    columns = categories + sorted({
+        predicted for row in report["confusion"].values() for predicted in row if predicted not in categories
+    })
+    width = max(len(name) for name in columns + ["esperado"]) + 2
+    print("\n🧮 Matriz de confusão (linhas: esperado, colunas: resposta)")
+    print("esperado".ljust(width) + "".join(name.rjust(width) for name in columns))
+    for expected, row in report["confusion"].items():
+        print(expected.ljust(width) + "".join(str(row.get(name, 0)).rjust(width) for name in columns))
+
+    print()
+    for category, values in report["per_category"].items():
+        print(f"  {category:>10}: precisão {values['precision']} | revocação {values['recall']}"
+              f" | {values['support']} casos")
+
+
+def compare(report, previous):
+    """Mostra a variação das métricas principais em relação a outra avaliação"""
+    print("\n📈 Comparação com a avaliação anterior:")
+    for name, current, old in (
+        ("accuracy", report["accuracy"], previous.get("accuracy")),
+        ("sla_agreement", report["sla_agreement"], previous.get("sla_agreement")),
+        ("latency.p50_ms", report["latency"].get("p50_ms"), previous.get("latency", {}).get("p50_ms")),
+        ("latency.p95_ms", report["latency"].get("p95_ms"), previous.get("latency", {}).get("p95_ms")),
+    ):
+        if current is None or old is None:
+            continue
+        print(f"  {name}: {old} -> {current} ({current - old:+.3f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avaliação de qualidade e latência do agent de suporte TI")
+    parser.add_argument("--knowledge-base", default="./knowledge_base")
+    parser.add_argument("--extra", action="append", default=[],
+                        help="JSONL extra com pergunta/categoria/sla (pode repetir)")
+    parser.add_argument("-c", "--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "4")),
+                        help="Runs simultâneos (padrão: 4)")
+    parser.add_argument("--limit", type=int, help="Avaliar só os primeiros N casos")
+    parser.add_argument("--local-paths", action="store_true",
+                        help="Manter cache e classificador local ativos (avalia o caminho completo)")
+    parser.add_argument("-o", "--output", help="Arquivo JSON com o relatório")
+    parser.add_argument("--compare", help="Relatório JSON de uma avaliação anterior")
+    args = parser.parse_args()
+
+    cases = read_cases(args.knowledge_base, args.extra)[:args.limit]
+    if not cases:
+        parser.error("Nenhum caso rotulado encontrado")
+
+    records, elapsed = asyncio.run(run_evaluation(cases, max(1, args.concurrency), args.local_paths))
+    report = build_report(cases, records)
+    report["elapsed_s"] = round(elapsed, 3)
+    report["args"] = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    print_report(report, elapsed)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            compare(report, json.load(file))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"\n💾 Relatório salvo em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
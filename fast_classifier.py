@@ -0,0 +1,156 @@
+# fast_classifier.py
+"""Classificador local (TF-IDF) treinado com base_support_ti.json.
+
+Classifica perguntas em categoria + SLA em microssegundos, sem chamar o LLM.
+Quando a confiança passa do limiar e todas as palavras da pergunta aparecem
+no exemplo mais próximo, o agent responde direto com a resposta dele. Só a
+similaridade não basta: n-gramas de caracteres aproximam "conectar na VPN"
+de "conectar no wifi", e uma palavra a mais ("todos os dispositivos") pode
+mudar o SLA.
+"""
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+from text_utils import normalize_text, stems, tokenize
+
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_THRESHOLD = float(os.getenv("FAST_PATH_THRESHOLD", "0.8"))
+# Diferença mínima entre a melhor e a segunda melhor categoria
+FAST_PATH_MIN_MARGIN = float(os.getenv("FAST_PATH_MIN_MARGIN", "0.1"))
+# Fração das palavras da pergunta que precisa aparecer no exemplo escolhido
+FAST_PATH_MIN_COVERAGE = float(os.getenv("FAST_PATH_MIN_COVERAGE", "1.0"))
+
+CATEGORY_LABELS = {
+    "network": "rede",
+    "access": "acesso",
+    "hardware": "hardware",
+    "software": "software",
+}
+
+# Categorias em português (como nas respostas) -> rótulos da base
+LABEL_CATEGORIES = {normalize_text(label): category for category, label in CATEGORY_LABELS.items()}
+
+_NGRAM_SIZE = 4
+_MIN_TERM_LENGTH = 3
+
+
+def normalize_category(value):
+    """'Rede', "'rede'" ou 'network' -> 'network'; None se vazio"""
+    if not value:
+        return None
+    value = normalize_text(str(value)).strip("'\"")
+    if value in CATEGORY_LABELS:
+        return value
+    return LABEL_CATEGORIES.get(value, value)
+
+
+def _features(text):
+    """Palavras + n-gramas de caracteres (tolera flexões: conecta/conectar)"""
+    features = []
+    for token in tokenize(text):
+        features.append(token)
+        padded = f"_{token}_"
+        if len(padded) > _NGRAM_SIZE:
+            features.extend(f"#{padded[i:i + _NGRAM_SIZE]}" for i in range(len(padded) - _NGRAM_SIZE + 1))
+    return features
+
+
+def _terms(text):
+    """Radicais das palavras com conteúdo (ignora siglas curtas como 'wi', '3')"""
+    return {stem for stem in stems(text) if len(stem) >= _MIN_TERM_LENGTH}
+
+
+@dataclass
+class Classification:
+    """Resultado da classificação local"""
+    category: str
+    sla: str
+    confidence: float
+    margin: float
+    answer: str
+    matched_question: str
+    coverage: float = 0.0  # fração das palavras da pergunta presentes no exemplo
+
+    @property
+    def label(self):
+        return CATEGORY_LABELS.get(self.category, self.category)
+
+    def is_confident(self, threshold=None, min_margin=None, min_coverage=None):
+        threshold = FAST_PATH_THRESHOLD if threshold is None else threshold
+        min_margin = FAST_PATH_MIN_MARGIN if min_margin is None else min_margin
+        min_coverage = FAST_PATH_MIN_COVERAGE if min_coverage is None else min_coverage
+        return self.confidence >= threshold and self.margin >= min_margin and self.coverage >= min_coverage
+
+
+class FastClassifier:
+    """Vizinho mais próximo por similaridade de cosseno sobre vetores TF-IDF"""
+
+    def __init__(self, examples):
+        if not examples:
+            raise ValueError("Nenhum exemplo rotulado para treinar o classificador")
+        self.examples = examples
+        self.categories = sorted({example["categoria"] for example in examples})
+        self._category_index = np.array(
+            [self.categories.index(example["categoria"]) for example in examples]
+        )
+
+        self._example_terms = [_terms(example["pergunta"]) for example in examples]
+        documents = [_features(example["pergunta"]) for example in examples]
+        vocabulary = sorted({feature for document in documents for feature in document})
+        self.vocabulary = {feature: index for index, feature in enumerate(vocabulary)}
+
+        counts = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+        for row, document in enumerate(documents):
+            for feature in document:
+                counts[row, self.vocabulary[feature]] += 1
+
+        document_frequency = (counts > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.matrix = self._normalize(counts * self.idf)
+
+    @classmethod
+    def from_file(cls, file_path):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            examples = json.load(file)
+        examples = [example for example in examples if example.get("pergunta") and example.get("categoria")]
+        return cls(examples)
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+    def vectorize(self, text):
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for feature in _features(text):
+            index = self.vocabulary.get(feature)
+            if index is not None:
+                vector[index] += 1
+        return self._normalize(vector * self.idf)
+
+    def classify(self, text):
+        """Retorna a Classification do exemplo mais próximo"""
+        similarities = self.matrix @ self.vectorize(text)
+
+        category_scores = np.zeros(len(self.categories), dtype=np.float32)
+        np.maximum.at(category_scores, self._category_index, similarities)
+        ranked = np.sort(category_scores)[::-1]
+        margin = float(ranked[0] - ranked[1]) if len(ranked) > 1 else float(ranked[0])
+
+        best = int(np.argmax(similarities))
+        example = self.examples[best]
+        terms = _terms(text)
+        coverage = len(terms & self._example_terms[best]) / len(terms) if terms else 0.0
+        return Classification(
+            category=example["categoria"],
+            sla=example.get("sla", ""),
+            confidence=float(similarities[best]),
+            margin=margin,
+            answer=example.get("resposta_agent") or example.get("solucao", ""),
+            matched_question=example["pergunta"],
+            coverage=coverage,
+        )
@@ -0,0 +1,374 @@
+# kb_compile.py
+"""Compilação da base de conhecimento em trechos para o Vector Store.
+
+Transforma os arquivos de knowledge_base/ (JSON, MD, TXT e PDF) em trechos
+do tamanho de uma busca, com categoria e fonte, remove campos e trechos
+repetidos e grava os artefatos em `.agent_state/kb_compiled/` (um .md por
+categoria). Só esses artefatos são enviados ao Vector Store, e só são
+regravados quando o conteúdo muda.
+
+A extração de texto dos PDFs roda em um pool de processos; o resultado de
+cada arquivo fica em cache pelo SHA-256, então só fontes alteradas são
+reprocessadas.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from fast_classifier import CATEGORY_LABELS, normalize_category
+from kb_sync import STATE_DIR, scan_knowledge_base
+from text_utils import flatten_json, normalize_text, split_paragraphs, stems
+
+KB_COMPILE_ENABLED = os.getenv("KB_COMPILE_ENABLED", "true").lower() == "true"
+KB_CHUNK_CHARS = int(os.getenv("KB_CHUNK_CHARS", "800"))
+# Fração das palavras de um campo/trecho já presente em outro para ser descartado
+KB_DEDUP_THRESHOLD = float(os.getenv("KB_DEDUP_THRESHOLD", "0.8"))
+KB_COMPILE_WORKERS = int(os.getenv("KB_COMPILE_WORKERS", str(min(4, os.cpu_count() or 1))))
+COMPILED_DIR = os.path.join(STATE_DIR, "kb_compiled")
+CACHE_VERSION = 1
+GENERAL_CATEGORY = "geral"
+# Campos de texto menores que isso nunca são descartados como repetidos
+MIN_DEDUP_FIELD_CHARS = 40
+# Palavras presentes em mais da metade dos valores de um campo são modelo (ex.: "classificado como")
+TEMPLATE_TERM_SHARE = 0.5
+TITLE_FIELDS = ("pergunta", "titulo", "title", "nome")
+# Cópia sem compilação (ex.: PDF sem pypdf instalado)
+RAW_PREFIX = "fonte-"
+
+
+@dataclass
+class Chunk:
+    """Trecho compilado, com a fonte e a categoria (rótulo da base) quando conhecida"""
+    text: str
+    source: str
+    category: str = None
+    title: str = None
+
+
+@dataclass
+class CompileReport:
+    """Resultado de uma compilação"""
+    output_dir: str
+    sources: int = 0
+    extracted: int = 0
+    chunks: int = 0
+    duplicates: int = 0
+    fields_dropped: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    written: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    raw: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def summary(self):
+        raw = f", {len(self.raw)} enviadas sem compilar" if self.raw else ""
+        return (f"{self.chunks} trechos de {self.sources} fontes{raw} ({self.duplicates} repetidos e "
+                f"{self.fields_dropped} campos redundantes removidos), {self.bytes_in / 1024:.1f} KB -> "
+                f"{self.bytes_out / 1024:.1f} KB em {self.elapsed:.2f}s ({self.extracted} reprocessadas)")
+
+
+def _containment(terms, reference):
+    return len(terms & reference) / len(terms) if terms else 1.0
+
+
+def _record_chunks(records, source, max_chars):
+    """Um trecho por registro de uma lista de objetos (ex.: exemplos rotulados)
+
+    Campos longos cujas palavras já estão nos demais campos do registro são
+    descartados; palavras de modelo, repetidas na maioria dos valores do
+    mesmo campo, não contam.
+    """
+    text_fields = Counter()
+    field_terms = Counter()
+    for record in records:
+        for key, value in record.items():
+            if isinstance(value, str) and len(value) >= MIN_DEDUP_FIELD_CHARS:
+                text_fields[key] += 1
+                field_terms.update((key, term) for term in set(stems(value)))
+    template = {
+        pair for pair, count in field_terms.items()
+        if len(records) >= 4 and count > TEMPLATE_TERM_SHARE * text_fields[pair[0]]
+    }
+
+    chunks, dropped = [], 0
+    for record in records:
+        category = normalize_category(record.get("categoria") or record.get("category"))
+        kept = {key: flatten_json(value) for key, value in record.items()}
+        terms = {key: set(stems(text)) for key, text in kept.items()}
+        category_terms = set(stems(f"{category} {CATEGORY_LABELS.get(category, '')}")) if category else set()
+        # Do menor campo longo para o maior: os que só repetem os demais saem e o
+        # mais completo fica; títulos (a pergunta) nunca são descartados
+        candidates = sorted(
+            (key for key, value in record.items()
+             if isinstance(value, str) and len(value) >= MIN_DEDUP_FIELD_CHARS and key not in TITLE_FIELDS),
+            key=lambda key: len(record[key])
+        )
+        for key in candidates:
+            informative = {term for term in terms[key] if (key, term) not in template}
+            reference = set(category_terms)
+            for other in kept:
+                if other != key:
+                    reference |= terms[other]
+            if _containment(informative, reference) >= KB_DEDUP_THRESHOLD:
+                del kept[key]
+                dropped += 1
+
+        # Título e categoria vão no cabeçalho do trecho, não no corpo
+        title_key = next((key for key in TITLE_FIELDS if key in kept), None)
+        title = kept.get(title_key)
+        body = "\n".join(
+            f"{key}: {text}" for key, text in kept.items()
+            if key != title_key and not (category and key in ("categoria", "category"))
+        )
+        for text in split_paragraphs(body, max_chars) if len(body) > max_chars else [body]:
+            chunks.append(Chunk(text=text, source=source, category=category, title=title))
+    return chunks, dropped
+
+
+def _json_chunks(data, source, max_chars, prefix="", category=None):
+    """Trechos de um JSON: registros de listas ou um trecho por objeto "folha"""
+    if isinstance(data, list):
+        if data and all(isinstance(item, dict) for item in data):
+            return _record_chunks(data, source, max_chars)
+        text = f"{prefix}{flatten_json(data)}"
+        return [Chunk(text=part, source=source, category=category) for part in split_paragraphs(text, max_chars)], 0
+    if isinstance(data, dict):
+        category = normalize_category(data.get("categoria") or data.get("category")) or category
+        if not any(isinstance(item, (dict, list)) and not _is_flat_list(item) for item in data.values()):
+            text = f"{prefix}{flatten_json(data)}"
+            title = prefix.rstrip(": ").split(": ")[-1] or None
+            return [Chunk(text=part, source=source, category=category, title=title)
+                    for part in split_paragraphs(text, max_chars)], 0
+        chunks, dropped = [], 0
+        for key, item in data.items():
+            if isinstance(item, (dict, list)):
+                item_chunks, item_dropped = _json_chunks(item, source, max_chars, f"{prefix}{key}: ", category)
+                chunks.extend(item_chunks)
+                dropped += item_dropped
+            else:
+                chunks.append(Chunk(text=f"{prefix}{key}: {item}", source=source, category=category))
+        return chunks, dropped
+    return [Chunk(text=f"{prefix}{data}", source=source, category=category)], 0
+
+
+def _is_flat_list(value):
+    return isinstance(value, list) and not any(isinstance(item, (dict, list)) for item in value)
+
+
+def _pdf_text(file_path):
+    """Texto de um PDF (requer pypdf)"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def extract_chunks(file_path, max_chars=None):
+    """Retorna (trechos, campos descartados) de um arquivo da base
+
+    Roda também nos processos do pool, por isso recebe e devolve só dados simples.
+    """
+    max_chars = max_chars or KB_CHUNK_CHARS
+    source = os.path.basename(file_path)
+    if file_path.endswith(".pdf"):
+        text = _pdf_text(file_path)
+    else:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            text = file.read()
+    if file_path.endswith(".json"):
+        return _json_chunks(json.loads(text), source, max_chars)
+    return [Chunk(text=part, source=source) for part in split_paragraphs(text, max_chars)], 0
+
+
+def _extract_worker(file_path, max_chars):
+    chunks, dropped = extract_chunks(file_path, max_chars)
+    return [asdict(chunk) for chunk in chunks], dropped
+
+
+def deduplicate(chunks, threshold=None):
+    """Remove trechos iguais (texto normalizado) ou quase iguais na mesma categoria"""
+    threshold = KB_DEDUP_THRESHOLD if threshold is None else threshold
+    seen = set()
+    kept_terms = {}  # categoria -> [conjunto de palavras dos trechos mantidos]
+    unique = []
+    for chunk in chunks:
+        content = f"{chunk.title or ''}\n{chunk.text}"
+        key = hashlib.sha256(normalize_text(content).encode('utf-8')).hexdigest()
+        if key in seen:
+            continue
+        terms = set(stems(content))
+        previous = kept_terms.setdefault(chunk.category, [])
+        if any(_containment(terms, other) >= threshold and _containment(other, terms) >= threshold
+               for other in previous):
+            continue
+        seen.add(key)
+        previous.append(terms)
+        unique.append(chunk)
+    return unique
+
+
+def render_artifact(category, chunks):
+    """Markdown de uma categoria: uma seção por trecho com fonte e categoria"""
+    label = CATEGORY_LABELS.get(category, category)
+    lines = [f"# Base de conhecimento: {label}", ""]
+    for chunk in chunks:
+        lines.append(f"## {chunk.title or chunk.source}")
+        lines.append(f"categoria: {label} | fonte: {chunk.source}")
+        lines.append("")
+        lines.append(chunk.text)
+        lines.append("")
+    return "\n".join(lines)
+
+
+class KnowledgeBaseCompiler:
+    """Compila knowledge_base/ em artefatos .md, reprocessando só fontes alteradas"""
+
+    def __init__(self, knowledge_base_path, output_dir=None, workers=None, max_chars=None):
+        self.knowledge_base_path = knowledge_base_path
+        self.output_dir = Path(output_dir or COMPILED_DIR)
+        self.workers = KB_COMPILE_WORKERS if workers is None else workers
+        self.max_chars = max_chars or KB_CHUNK_CHARS
+        # Sem extensão suportada: a sincronização não envia o cache
+        self.cache_path = self.output_dir / ".compile_cache"
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get("version") == CACHE_VERSION and data.get("max_chars") == self.max_chars:
+                return data.get("files", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Cache da compilação ignorado: {e}")
+        return {}
+
+    def _save_cache(self, files):
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({"version": CACHE_VERSION, "max_chars": self.max_chars, "files": files},
+                      file, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def _extract(self, paths):
+        """{caminho: (trechos, descartados)}; PDFs vão para o pool de processos"""
+        results = {}
+        pdfs = [path for path in paths if path.endswith(".pdf")]
+        if pdfs and importlib.util.find_spec("pypdf") is None:
+            print(f"⚠️  pypdf não instalado: {len(pdfs)} PDFs serão enviados sem compilar")
+            paths = [path for path in paths if path not in pdfs]
+            pdfs = []
+        for path in paths:
+            if path not in pdfs:
+                results[path] = _extract_worker(path, self.max_chars)
+
+        if len(pdfs) > 1 and self.workers > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pdfs))) as pool:
+                futures = {path: pool.submit(_extract_worker, path, self.max_chars) for path in pdfs}
+                for path, future in futures.items():
+                    results[path] = future.result()
+        else:
+            for path in pdfs:
+                results[path] = _extract_worker(path, self.max_chars)
+        return results
+
+    def compile(self):
+        started = time.perf_counter()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        report = CompileReport(output_dir=str(self.output_dir))
+        cache = self._load_cache()
+        sources = scan_knowledge_base(self.knowledge_base_path, cache)
+
+        to_extract = [entry["path"] for name, entry in sources.items()
+                      if cache.get(name, {}).get("sha256") != entry["sha256"]]
+        extracted = {}
+        if to_extract:
+            try:
+                extracted = self._extract(to_extract)
+            except Exception:
+                # Falha em um arquivo: refaz um a um para isolar qual foi
+                for path in to_extract:
+                    try:
+                        extracted[path] = _extract_worker(path, self.max_chars)
+                    except Exception as e:
+                        print(f"⚠️  {os.path.basename(path)} não compilado: {e}")
+
+        files = {}
+        chunks = []
+        raw = []  # fontes que não puderam ser compiladas: vão como estão
+        for name, entry in sources.items():
+            report.bytes_in += entry["size"]
+            if entry["path"] in extracted:
+                file_chunks, dropped = extracted[entry["path"]]
+                report.extracted += 1
+            elif name in cache and cache[name].get("sha256") == entry["sha256"]:
+                file_chunks, dropped = cache[name]["chunks"], cache[name]["dropped"]
+            else:
+                raw.append(name)
+                continue
+            files[name] = {key: entry[key] for key in ("size", "mtime", "sha256")}
+            files[name].update(chunks=file_chunks, dropped=dropped)
+            chunks.extend(Chunk(**chunk) for chunk in file_chunks)
+            report.fields_dropped += dropped
+        report.sources = len(files)
+        report.raw = raw
+
+        unique = deduplicate(chunks)
+        report.duplicates = len(chunks) - len(unique)
+        report.chunks = len(unique)
+
+        by_category = {}
+        for chunk in unique:
+            by_category.setdefault(chunk.category or GENERAL_CATEGORY, []).append(chunk)
+        artifacts = {f"{category}.md": render_artifact(category, items) for category, items in sorted(by_category.items())}
+
+        produced = set(artifacts)
+        for name in raw:
+            source, target = sources[name], self.output_dir / f"{RAW_PREFIX}{name}"
+            produced.add(target.name)
+            report.bytes_out += source["size"]
+            try:
+                stat = target.stat()
+                if stat.st_size == source["size"] and stat.st_mtime_ns == source["mtime"]:
+                    continue
+            except FileNotFoundError:
+                pass
+            shutil.copy2(source["path"], target)
+            report.written.append(target.name)
+
+        for name, content in artifacts.items():
+            data = content.encode('utf-8')
+            report.bytes_out += len(data)
+            path = self.output_dir / name
+            try:
+                if path.read_bytes() == data:
+                    continue
+            except FileNotFoundError:
+                pass
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            report.written.append(name)
+
+        for path in self.output_dir.iterdir():
+            if path.is_file() and not path.name.startswith(".") and path.name not in produced:
+                path.unlink()
+                report.removed.append(path.name)
+
+        if report.extracted or set(cache) != set(files):
+            self._save_cache(files)
+        report.elapsed = time.perf_counter() - started
+        return report
+
+
+def compile_knowledge_base(knowledge_base_path, output_dir=None):
+    """Compila a base e retorna o CompileReport"""
+    return KnowledgeBaseCompiler(knowledge_base_path, output_dir).compile()
@@ -0,0 +1,416 @@
+# kb_sync.py
+"""Sincronização incremental da base de conhecimento com o Vector Store.
+
+Mantém um manifesto local (caminho, tamanho, mtime, SHA-256 -> id do arquivo
+remoto e id do Vector Store) para que uma reconexão reutilize o Vector Store
+existente e envie apenas o que mudou.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from telemetry import set_attributes, span
+
+SUPPORTED_EXTENSIONS = ('.json', '.txt', '.md', '.pdf')
+VECTOR_STORE_NAME = "knowledge-base-support-ti"
+STATE_DIR = os.getenv("AGENT_STATE_DIR", "./.agent_state")
+MANIFEST_VERSION = 1
+UPLOAD_CONCURRENCY = int(os.getenv("KB_UPLOAD_CONCURRENCY", "8"))
+# Limite de file_ids por chamada ao endpoint de batch
+ATTACH_BATCH_SIZE = 500
+# Itens por página ao listar os arquivos de um Vector Store
+LIST_PAGE_SIZE = 100
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """Calcula o SHA-256 de um arquivo lendo em blocos"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan_knowledge_base(knowledge_base_path, previous_files=None):
+    """Lista os arquivos suportados com tamanho, mtime e hash.
+
+    O hash só é recalculado quando tamanho ou mtime mudaram em relação
+    ao manifesto anterior.
+    """
+    previous_files = previous_files or {}
+    entries = {}
+    if not os.path.isdir(knowledge_base_path):
+        return entries
+
+    for file_name in sorted(os.listdir(knowledge_base_path)):
+        if not file_name.endswith(SUPPORTED_EXTENSIONS):
+            continue
+        file_path = os.path.join(knowledge_base_path, file_name)
+        if not os.path.isfile(file_path):
+            continue
+
+        stat = os.stat(file_path)
+        previous = previous_files.get(file_name)
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime_ns:
+            sha256 = previous["sha256"]
+        else:
+            sha256 = file_sha256(file_path)
+
+        entries[file_name] = {
+            "path": file_path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "sha256": sha256,
+        }
+    return entries
+
+
+def knowledge_base_version(knowledge_base_path):
+    """Impressão digital barata da base (nome, tamanho e mtime de cada arquivo)"""
+    digest = hashlib.sha256()
+    if os.path.isdir(knowledge_base_path):
+        for file_name in sorted(os.listdir(knowledge_base_path)):
+            if not file_name.endswith(SUPPORTED_EXTENSIONS):
+                continue
+            try:
+                stat = os.stat(os.path.join(knowledge_base_path, file_name))
+            except OSError:
+                continue
+            digest.update(f"{file_name}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class KnowledgeBaseManifest:
+    """Manifesto persistido em disco com o estado do Vector Store remoto"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.vector_store_id = None
+        self.files = {}  # nome do arquivo -> {size, mtime, sha256, file_id}
+        self.updated_at = None
+
+    @classmethod
+    def load(cls, path):
+        manifest = cls(path)
+        try:
+            with open(manifest.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get("version") == MANIFEST_VERSION:
+                manifest.vector_store_id = data.get("vector_store_id")
+                manifest.files = data.get("files", {})
+                manifest.updated_at = data.get("updated_at")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Manifesto da base de conhecimento ignorado: {e}")
+        return manifest
+
+    def save(self):
+        """Grava o manifesto de forma atômica"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.updated_at = time.time()
+        data = {
+            "version": MANIFEST_VERSION,
+            "vector_store_id": self.vector_store_id,
+            "updated_at": self.updated_at,
+            "files": self.files,
+        }
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def reset(self, vector_store_id=None):
+        self.vector_store_id = vector_store_id
+        self.files = {}
+
+
+def plan_sync(manifest_files, current_files):
+    """Compara manifesto e disco: retorna (para_enviar, para_remover, inalterados)"""
+    to_upload = []
+    to_remove = {}
+    unchanged = []
+
+    for name, entry in current_files.items():
+        previous = manifest_files.get(name)
+        if previous and previous.get("sha256") == entry["sha256"] and previous.get("file_id"):
+            unchanged.append(name)
+        else:
+            to_upload.append(name)
+            if previous and previous.get("file_id"):
+                to_remove[name] = previous["file_id"]
+
+    for name, previous in manifest_files.items():
+        if name not in current_files and previous.get("file_id"):
+            to_remove[name] = previous["file_id"]
+
+    return to_upload, to_remove, unchanged
+
+
+@dataclass
+class UploadResult:
+    """Resultado do envio de um arquivo"""
+    file_path: str
+    file_id: str = None
+    error: str = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self):
+        return self.file_id is not None and self.error is None
+
+
+@dataclass
+class UploadReport:
+    """Resultado de um envio em lote: sucesso/falha por arquivo e tempo total"""
+    results: list = field(default_factory=list)
+    elapsed: float = 0.0
+    concurrency: int = 1
+    batch_attach: bool = False
+
+    @property
+    def succeeded(self):
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    def as_mapping(self):
+        """{file_path: file_id} dos arquivos enviados e associados"""
+        return {result.file_path: result.file_id for result in self.succeeded}
+
+    def summary(self):
+        mode = "batch" if self.batch_attach else "individual"
+        return (f"{len(self.succeeded)}/{len(self.results)} arquivos em {self.elapsed:.2f}s "
+                f"(concorrência {self.concurrency}, associação {mode})")
+
+
+async def list_attached_file_ids(client, vector_store_id):
+    """Ids dos arquivos associados a um Vector Store"""
+    with span("kb.list_attached", **{"vector_store.id": vector_store_id}):
+        return {file.id async for file in client.vector_store_files.list(vector_store_id, limit=LIST_PAGE_SIZE)}
+
+
+async def _upload_one(client, file_path, semaphore):
+    result = UploadResult(file_path=file_path)
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            with span("kb.upload_file", **{"file.name": os.path.basename(file_path)}) as upload_span:
+                with open(file_path, 'rb') as file:
+                    set_attributes(upload_span, **{"file.size_bytes": os.fstat(file.fileno()).st_size})
+                    file_object = await client.files.upload(file=file, purpose="assistants")
+                set_attributes(upload_span, **{"file.id": file_object.id})
+            result.file_id = file_object.id
+            print(f"✅ Arquivo enviado: {os.path.basename(file_path)} -> {file_object.id}")
+        except Exception as e:
+            result.error = str(e)
+            print(f"❌ Erro ao enviar {os.path.basename(file_path)}: {e}")
+        result.elapsed = time.perf_counter() - started
+    return result
+
+
+async def _attach_one(client, vector_store_id, result, semaphore):
+    async with semaphore:
+        try:
+            with span("kb.attach_file", **{"file.id": result.file_id}):
+                await client.vector_store_files.create(
+                    vector_store_id=vector_store_id,
+                    file_id=result.file_id
+                )
+        except Exception as e:
+            result.error = f"associação: {e}"
+            print(f"❌ Erro ao associar {os.path.basename(result.file_path)}: {e}")
+
+
+async def _attach_batch(client, vector_store_id, results):
+    """Associa arquivos pelo endpoint de batch; retorna os que faltam associar
+
+    Se um batch falhar no meio, os arquivos já associados ficam de fora:
+    associá-los de novo duplicaria os trechos deles no Vector Store.
+    """
+    batches = getattr(client, 'vector_store_file_batches', None)
+    if batches is None or not hasattr(batches, 'create'):
+        return results
+    try:
+        for start in range(0, len(results), ATTACH_BATCH_SIZE):
+            chunk = results[start:start + ATTACH_BATCH_SIZE]
+            with span("kb.attach_batch", files=len(chunk)):
+                await batches.create(
+                    vector_store_id=vector_store_id,
+                    file_ids=[result.file_id for result in chunk]
+                )
+        return []
+    except Exception as e:
+        print(f"⚠️  Associação em batch falhou, usando associação individual: {e}")
+
+    try:
+        attached = await list_attached_file_ids(client, vector_store_id)
+    except Exception as e:
+        print(f"⚠️  Não foi possível listar os arquivos do Vector Store: {e}")
+        return results
+    return [result for result in results if result.file_id not in attached]
+
+
+async def upload_files_concurrently(client, vector_store_id, file_paths, concurrency=None):
+    """Envia arquivos em paralelo (limitado por `concurrency`) e associa ao Vector Store.
+
+    Falhas são registradas por arquivo no relatório em vez de interromper o lote.
+    Arquivos enviados cuja associação falhou são removidos para não ficarem órfãos.
+    """
+    concurrency = max(1, concurrency or UPLOAD_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    report = UploadReport(concurrency=concurrency)
+    started = time.perf_counter()
+
+    report.results = list(await asyncio.gather(
+        *(_upload_one(client, file_path, semaphore) for file_path in file_paths)
+    ))
+
+    uploaded = report.succeeded
+    if uploaded:
+        pending = await _attach_batch(client, vector_store_id, uploaded)
+        report.batch_attach = not pending
+        await asyncio.gather(
+            *(_attach_one(client, vector_store_id, result, semaphore) for result in pending)
+        )
+
+        orphans = [result for result in uploaded if not result.ok]
+        for result in orphans:
+            try:
+                await client.files.delete(result.file_id)
+            except Exception as e:
+                print(f"⚠️  Não foi possível remover arquivo {result.file_id}: {e}")
+            result.file_id = None
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+class KnowledgeBaseSync:
+    """Reconcilia a pasta knowledge_base com o Vector Store remoto"""
+
+    def __init__(self, client, knowledge_base_path, manifest_path=None, metadata=None):
+        self.client = client
+        self.knowledge_base_path = knowledge_base_path
+        self.metadata = metadata  # metadata do Vector Store criado (identifica a instalação)
+        self.manifest = KnowledgeBaseManifest.load(
+            manifest_path or os.path.join(STATE_DIR, "kb_manifest.json")
+        )
+
+    async def _get_existing_vector_store(self):
+        if not self.manifest.vector_store_id:
+            return None
+        try:
+            with span("vector_store.get", **{"vector_store.id": self.manifest.vector_store_id}):
+                vector_store = await self.client.vector_stores.get(self.manifest.vector_store_id)
+        except Exception as e:
+            print(f"⚠️  Vector Store {self.manifest.vector_store_id} indisponível: {e}")
+            return None
+        return vector_store
+
+    async def _reconcile_manifest(self, vector_store_id):
+        """Ajusta o manifesto aos arquivos de fato associados ao Vector Store
+
+        Entradas cujo arquivo saiu do Vector Store (removido fora do app)
+        voltam a ser enviadas. Arquivos associados que o manifesto não conhece
+        (sincronização interrompida antes de salvá-lo) são desassociados, já
+        que o próximo envio os duplicaria.
+        """
+        try:
+            attached = await list_attached_file_ids(self.client, vector_store_id)
+        except Exception as e:
+            print(f"⚠️  Não foi possível listar os arquivos do Vector Store: {e}")
+            return
+
+        missing = [name for name, entry in self.manifest.files.items() if entry.get("file_id") not in attached]
+        for name in missing:
+            del self.manifest.files[name]
+        known = {entry.get("file_id") for entry in self.manifest.files.values()}
+        unknown = sorted(attached - known)
+        for file_id in unknown:
+            await self._detach(vector_store_id, file_id, file_id)
+        if missing or unknown:
+            print(f"⚠️  Manifesto conferido: {len(missing)} arquivos para reenviar, "
+                  f"{len(unknown)} desconhecidos desassociados")
+
+    async def ensure_vector_store(self):
+        """Reutiliza o Vector Store do manifesto ou cria um novo"""
+        vector_store = await self._get_existing_vector_store()
+        if vector_store:
+            print(f"♻️  Vector Store reutilizado: {vector_store.id}")
+            return vector_store
+
+        with span("vector_store.create"):
+            vector_store = await self.client.vector_stores.create(name=VECTOR_STORE_NAME, metadata=self.metadata)
+        self.manifest.reset(vector_store.id)
+        print(f"✅ Vector Store criado: {vector_store.id}")
+        return vector_store
+
+    async def _detach(self, vector_store_id, name, file_id):
+        try:
+            await self.client.vector_store_files.delete(
+                vector_store_id=vector_store_id,
+                file_id=file_id
+            )
+        except Exception as e:
+            print(f"⚠️  Não foi possível desassociar {name}: {e}")
+        try:
+            await self.client.files.delete(file_id)
+        except Exception as e:
+            print(f"⚠️  Não foi possível remover arquivo {file_id}: {e}")
+
+    async def sync(self, upload_files):
+        """Sincroniza a base de conhecimento.
+
+        `upload_files(vector_store_id, file_paths)` deve retornar um dict
+        {file_path: file_id} apenas com os envios bem-sucedidos.
+        Retorna (vector_store, current_files).
+        """
+        vector_store = await self.ensure_vector_store()
+        return vector_store, await self.sync_files(vector_store, upload_files)
+
+    async def sync_files(self, vector_store, upload_files):
+        """Envia/remove arquivos de um Vector Store já aberto; retorna current_files"""
+        await self._reconcile_manifest(vector_store.id)
+        current_files = scan_knowledge_base(self.knowledge_base_path, self.manifest.files)
+        to_upload, to_remove, unchanged = plan_sync(self.manifest.files, current_files)
+        print(f"📊 Base de conhecimento: {len(to_upload)} novos/alterados, "
+              f"{len(to_remove)} para remover, {len(unchanged)} inalterados")
+
+        uploaded = {}
+        if to_upload:
+            paths = [current_files[name]["path"] for name in to_upload]
+            uploaded = await upload_files(vector_store.id, paths)
+
+        new_files = {name: self.manifest.files[name] for name in unchanged}
+        for name in to_upload:
+            entry = current_files[name]
+            file_id = uploaded.get(entry["path"])
+            if file_id:
+                new_files[name] = {
+                    "path": entry["path"],
+                    "size": entry["size"],
+                    "mtime": entry["mtime"],
+                    "sha256": entry["sha256"],
+                    "file_id": file_id,
+                }
+
+        # Versões antigas só saem depois que a nova foi enviada
+        for name, file_id in to_remove.items():
+            if name in current_files and name not in new_files:
+                # Falhou o envio da nova versão: mantém a antiga
+                new_files[name] = self.manifest.files[name]
+                continue
+            await self._detach(vector_store.id, name, file_id)
+            print(f"🗑️  Removido do Vector Store: {name}")
+
+        self.manifest.vector_store_id = vector_store.id
+        self.manifest.files = new_files
+        self.manifest.save()
+        return current_files
@@ -0,0 +1,216 @@
+# local_retrieval.py
+"""Busca local (BM25) sobre a base de conhecimento, sem rede.
+
+Os arquivos de knowledge_base/ são divididos nos mesmos trechos da
+compilação (kb_compile: um por exemplo ou procedimento nos JSON, blocos de
+parágrafos nos .txt/.md) e indexados em uma matriz NumPy de pesos BM25; a busca top-k é um produto de poucas colunas.
+Os trechos de cada arquivo ficam em `.agent_state/retrieval_index.json`,
+chaveados pelo SHA-256, e só arquivos novos ou alterados são reprocessados.
+
+Quando o melhor trecho cobre boa parte da pergunta com termos específicos
+(não só palavras presentes em quase todo trecho, URLs ou e-mails) e se
+destaca do segundo, o agent envia os trechos junto com a mensagem e dispensa
+o file_search remoto naquele run.
+"""
+import json
+import os
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from kb_compile import extract_chunks
+from kb_sync import STATE_DIR, knowledge_base_version, scan_knowledge_base
+from text_utils import stems
+
+LOCAL_RETRIEVAL_ENABLED = os.getenv("LOCAL_RETRIEVAL_ENABLED", "true").lower() == "true"
+LOCAL_RETRIEVAL_TOP_K = int(os.getenv("LOCAL_RETRIEVAL_TOP_K", "3"))
+# Cobertura mínima da pergunta (0-1) pelo melhor trecho para dispensar o file_search
+LOCAL_RETRIEVAL_MIN_SCORE = float(os.getenv("LOCAL_RETRIEVAL_MIN_SCORE", "0.5"))
+# Termos distintos e específicos da pergunta que o melhor trecho precisa conter
+LOCAL_RETRIEVAL_MIN_TERMS = int(os.getenv("LOCAL_RETRIEVAL_MIN_TERMS", "2"))
+# Vantagem mínima do melhor trecho sobre o segundo
+LOCAL_RETRIEVAL_MIN_MARGIN = float(os.getenv("LOCAL_RETRIEVAL_MIN_MARGIN", "0.1"))
+# Termos presentes em mais que esta fração dos trechos (chaves como "categoria") são genéricos
+GENERIC_TERM_FRACTION = 0.5
+INDEX_VERSION = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_MAX_CHARS = 600
+# Intervalo mínimo entre verificações de mudança na base
+INDEX_CHECK_INTERVAL = 2.0
+
+
+_URL_RE = re.compile(r"https?://\S+|[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+def _index_terms(text):
+    """Termos de um trecho; URLs e e-mails ("suporte.empresa.com") não contam"""
+    return stems(_URL_RE.sub(" ", text))
+
+
+def chunk_file(file_path):
+    """Trechos de um arquivo da base; PDFs não são indexados localmente"""
+    if file_path.endswith(".pdf"):
+        return []
+    chunks, _ = extract_chunks(file_path)
+    # O título (a pergunta, nos exemplos rotulados) faz parte do que é buscado
+    return [f"{chunk.title}\n{chunk.text}" if chunk.title else chunk.text for chunk in chunks]
+
+
+@dataclass
+class Hit:
+    """Trecho encontrado; `score` é a fração da pergunta coberta (0-1)"""
+    source: str
+    text: str
+    score: float
+    matched_terms: int = 0  # termos específicos da pergunta presentes no trecho
+
+
+class LocalRetriever:
+    """Índice BM25 dos trechos da base, reconstruído quando os arquivos mudam"""
+
+    def __init__(self, knowledge_base_path, index_path=None):
+        self.knowledge_base_path = knowledge_base_path
+        self.index_path = Path(index_path or os.path.join(STATE_DIR, "retrieval_index.json"))
+        self.files = {}  # nome -> {size, mtime, sha256, chunks}
+        self.chunks = []  # [(arquivo, texto)]
+        self.vocabulary = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.generic = np.zeros(0, dtype=bool)
+        self.weights = np.zeros((0, 0), dtype=np.float32)
+        self.version = None
+        self._last_check = 0.0
+
+        self._load()
+        self.refresh(force=True)
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get("version") == INDEX_VERSION:
+                self.files = data.get("files", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Índice local da base ignorado: {e}")
+
+    def _save(self):
+        """Grava os trechos por arquivo de forma atômica"""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({"version": INDEX_VERSION, "files": self.files}, file, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self, force=False):
+        """Reindexa se a base mudou; só arquivos alterados são reprocessados"""
+        now = time.monotonic()
+        if not force and now - self._last_check < INDEX_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        version = knowledge_base_version(self.knowledge_base_path)
+        if version == self.version:
+            return
+
+        started = time.perf_counter()
+        current = scan_knowledge_base(self.knowledge_base_path, self.files)
+        changed = 0
+        files = {}
+        for name, entry in current.items():
+            previous = self.files.get(name)
+            if previous and previous.get("sha256") == entry["sha256"]:
+                chunks = previous["chunks"]
+            else:
+                try:
+                    chunks = chunk_file(entry["path"])
+                except (OSError, ValueError) as e:
+                    print(f"⚠️  {name} não indexado localmente: {e}")
+                    chunks = []
+                changed += 1
+            files[name] = {key: entry[key] for key in ("size", "mtime", "sha256")}
+            files[name]["chunks"] = chunks
+
+        removed = len(set(self.files) - set(files))
+        self.files = files
+        self._build()
+        self.version = version
+        if changed or removed:
+            try:
+                self._save()
+            except OSError as e:
+                print(f"⚠️  Não foi possível salvar o índice local: {e}")
+        print(f"🔎 Índice local: {len(self.chunks)} trechos de {len(files)} arquivos "
+              f"({changed} reprocessados) em {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def _build(self):
+        """Monta a matriz de pesos BM25 (trechos x termos)"""
+        self.chunks = [(name, text) for name, entry in self.files.items() for text in entry["chunks"]]
+        documents = [Counter(_index_terms(text)) for _, text in self.chunks]
+        self.vocabulary = {
+            term: index for index, term in enumerate(sorted({term for document in documents for term in document}))
+        }
+        counts = np.zeros((len(documents), len(self.vocabulary)), dtype=np.float32)
+        for row, document in enumerate(documents):
+            for term, count in document.items():
+                counts[row, self.vocabulary[term]] = count
+
+        if not documents:
+            self.idf = np.zeros(0, dtype=np.float32)
+            self.generic = np.zeros(0, dtype=bool)
+            self.weights = counts
+            return
+        document_frequency = (counts > 0).sum(axis=0)
+        self.generic = document_frequency > GENERIC_TERM_FRACTION * len(documents)
+        self.idf = np.log(1 + (len(documents) - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        lengths = counts.sum(axis=1, keepdims=True)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(float(lengths.mean()), 1.0))
+        # Normalizado para que um termo presente uma vez em trecho de tamanho médio valha idf
+        self.weights = (self.idf * counts * (BM25_K1 + 1) / (counts + norm)).astype(np.float32)
+
+    def search(self, query, k=None):
+        """Top-k trechos para a pergunta, com score = cobertura da pergunta"""
+        self.refresh()
+        k = LOCAL_RETRIEVAL_TOP_K if k is None else k
+        terms = set(stems(query))
+        if not terms or not self.chunks:
+            return []
+
+        columns = [self.vocabulary[term] for term in terms if term in self.vocabulary]
+        # Termos fora da base contam com o maior idf possível (nenhum trecho os cobre)
+        unknown = len(terms) - len(columns)
+        total = float(self.idf[columns].sum()) + unknown * float(self.idf.max())
+        if not columns or total <= 0:
+            return []
+
+        weights = self.weights[:, columns]
+        scores = np.minimum(weights.sum(axis=1) / total, 1.0)
+        matched = ((weights > 0) & ~self.generic[columns]).sum(axis=1)
+        top = np.argsort(scores)[::-1][:k]
+        return [
+            Hit(source=self.chunks[index][0], text=self.chunks[index][1], score=round(float(scores[index]), 3),
+                matched_terms=int(matched[index]))
+            for index in top if scores[index] > 0
+        ]
+
+    @staticmethod
+    def is_strong(hits, min_score=None, min_terms=None, min_margin=None):
+        """Melhor trecho cobre a pergunta com termos específicos e se destaca do segundo"""
+        min_score = LOCAL_RETRIEVAL_MIN_SCORE if min_score is None else min_score
+        min_terms = LOCAL_RETRIEVAL_MIN_TERMS if min_terms is None else min_terms
+        min_margin = LOCAL_RETRIEVAL_MIN_MARGIN if min_margin is None else min_margin
+        if not hits or hits[0].score < min_score or hits[0].matched_terms < min_terms:
+            return False
+        return len(hits) < 2 or hits[0].score - hits[1].score >= min_margin
+
+    @staticmethod
+    def format_context(message, hits):
+        """Pergunta do usuário seguida dos trechos da base encontrados localmente"""
+        snippets = "\n".join(
+            f"- [{hit.source}] {hit.text[:SNIPPET_MAX_CHARS]}" for hit in hits
+        )
+        return f"{message}\n\nTrechos relevantes da base de conhecimento:\n{snippets}"
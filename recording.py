@@ -0,0 +1,357 @@
+# recording.py
+"""Gravação e reprodução do tráfego HTTP com o Azure AI Foundry (cassetes).
+
+No modo `record` cada requisição/resposta real é gravada em um arquivo de
+cassete, com o tempo até a resposta e, em respostas em streaming, o instante
+de cada trecho recebido. No modo `replay` as respostas são servidas do
+cassete, sem rede e sem credenciais, com as latências originais multiplicadas
+por AGENT_REPLAY_LATENCY_SCALE (0 = sem espera).
+
+As respostas são casadas por método + caminho da URL, na ordem em que foram
+gravadas; ids de threads e runs se repetem porque vêm das próprias respostas
+gravadas. O conteúdo das requisições e o cabeçalho Authorization não são
+gravados.
+
+Uso:
+    AGENT_RECORD_MODE=record AGENT_CASSETTE=trafego.json python batch_classify.py chamados.jsonl
+    AGENT_RECORD_MODE=replay AGENT_CASSETTE=trafego.json python batch_classify.py chamados.jsonl
+"""
+import asyncio
+import base64
+import json
+import os
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from azure.core.credentials import AccessToken
+from azure.core.pipeline.transport import AsyncHttpTransport
+from azure.core.rest import AsyncHttpResponse
+from azure.core.utils import CaseInsensitiveDict
+
+from kb_sync import STATE_DIR
+
+RECORD_MODE = os.getenv("AGENT_RECORD_MODE", "").lower()  # "", "record" ou "replay"
+CASSETTE_PATH = os.getenv("AGENT_CASSETTE", os.path.join(STATE_DIR, "cassette.json"))
+REPLAY_LATENCY_SCALE = float(os.getenv("AGENT_REPLAY_LATENCY_SCALE", "1.0"))
+CASSETTE_VERSION = 1
+# Cabeçalhos de resposta que não são gravados
+SKIPPED_HEADERS = ("set-cookie",)
+
+
+class CassetteMissError(RuntimeError):
+    """Requisição sem resposta correspondente no cassete"""
+
+
+def _request_key(method, url):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    return f"{method.upper()} {path}"
+
+
+def _encode_body(data):
+    try:
+        return data.decode('utf-8'), None
+    except UnicodeDecodeError:
+        return base64.b64encode(data).decode('ascii'), "base64"
+
+
+def _decode_body(text, encoding):
+    if encoding == "base64":
+        return base64.b64decode(text)
+    return text.encode('utf-8')
+
+
+class Cassette:
+    """Lista de interações gravadas, persistida em JSON"""
+
+    def __init__(self, path, interactions=None):
+        self.path = Path(path)
+        self.interactions = interactions or []
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Versão de cassete não suportada: {data.get('version')}")
+        return cls(path, data.get("interactions", []))
+
+    def save(self):
+        """Grava o cassete de forma atômica"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": CASSETTE_VERSION,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "interactions": self.interactions,
+        }
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class RecordingTransport(AsyncHttpTransport):
+    """Repassa as requisições ao transporte real e grava as respostas"""
+
+    def __init__(self, cassette, inner=None):
+        if inner is None:
+            from azure.core.pipeline.transport import AioHttpTransport
+            inner = AioHttpTransport()
+        self.cassette = cassette
+        self.inner = inner
+
+    async def __aenter__(self):
+        await self.inner.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        await self.inner.open()
+
+    async def close(self):
+        self.cassette.save()
+        await self.inner.close()
+
+    async def send(self, request, **kwargs):
+        started = time.perf_counter()
+        response = await self.inner.send(request, **kwargs)
+        interaction = {
+            "request": _request_key(request.method, request.url),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {
+                name: value for name, value in response.headers.items()
+                if name.lower() not in SKIPPED_HEADERS
+            },
+            "elapsed": round(time.perf_counter() - started, 4),
+            "body": "",
+            "body_encoding": None,
+        }
+        self.cassette.interactions.append(interaction)
+
+        if kwargs.get("stream"):
+            self._record_stream(response, interaction, started)
+        else:
+            interaction["body"], interaction["body_encoding"] = _encode_body(response.content)
+        return response
+
+    @staticmethod
+    def _record_stream(response, interaction, started):
+        """Grava os trechos da resposta em streaming conforme são consumidos"""
+        iter_bytes = response.iter_bytes
+        read = response.read
+        interaction["chunks"] = []
+
+        async def recording_iter_bytes(**kwargs):
+            async for chunk in iter_bytes(**kwargs):
+                text, encoding = _encode_body(chunk)
+                record = [round(time.perf_counter() - started, 4), text]
+                if encoding:
+                    record.append(encoding)
+                interaction["chunks"].append(record)
+                yield chunk
+
+        async def recording_read():
+            data = await read()
+            interaction["body"], interaction["body_encoding"] = _encode_body(data)
+            return data
+
+        response.iter_bytes = recording_iter_bytes
+        response.read = recording_read
+
+
+class ReplayResponse(AsyncHttpResponse):
+    """Resposta servida a partir de uma interação gravada"""
+
+    def __init__(self, request, interaction, latency_scale):
+        self._request = request
+        self._interaction = interaction
+        self._latency_scale = latency_scale
+        self._headers = CaseInsensitiveDict(interaction.get("headers", {}))
+        self._encoding = None
+        self._closed = False
+        self._stream_consumed = False
+        chunks = interaction.get("chunks")
+        if chunks:
+            self._content = b"".join(self._chunk_bytes(chunk) for chunk in chunks)
+        else:
+            self._content = _decode_body(interaction.get("body", ""), interaction.get("body_encoding"))
+
+    @staticmethod
+    def _chunk_bytes(chunk):
+        return _decode_body(chunk[1], chunk[2] if len(chunk) > 2 else None)
+
+    @property
+    def request(self):
+        return self._request
+
+    @property
+    def status_code(self):
+        return self._interaction["status"]
+
+    @property
+    def headers(self):
+        return self._headers
+
+    @property
+    def reason(self):
+        return self._interaction.get("reason") or ""
+
+    @property
+    def content_type(self):
+        return self._headers.get("Content-Type")
+
+    @property
+    def is_closed(self):
+        return self._closed
+
+    @property
+    def is_stream_consumed(self):
+        return self._stream_consumed
+
+    @property
+    def encoding(self):
+        return self._encoding
+
+    @encoding.setter
+    def encoding(self, value):
+        self._encoding = value
+
+    @property
+    def url(self):
+        return self._request.url
+
+    @property
+    def content(self):
+        return self._content
+
+    def text(self, encoding=None):
+        return self._content.decode(encoding or self._encoding or 'utf-8')
+
+    def json(self):
+        return json.loads(self.text()) if self._content else None
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            from azure.core.exceptions import HttpResponseError
+            raise HttpResponseError(response=self)
+
+    async def read(self):
+        self._stream_consumed = True
+        return self._content
+
+    async def iter_raw(self, **kwargs):
+        async for chunk in self.iter_bytes(**kwargs):
+            yield chunk
+
+    async def iter_bytes(self, **kwargs):
+        """Reproduz os trechos com o mesmo intervalo (escalado) da gravação"""
+        chunks = self._interaction.get("chunks")
+        if not chunks:
+            yield self._content
+        else:
+            previous = self._interaction["elapsed"]
+            for chunk in chunks:
+                offset = chunk[0]
+                delay = (offset - previous) * self._latency_scale
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                previous = offset
+                yield self._chunk_bytes(chunk)
+        self._stream_consumed = True
+        await self.close()
+
+    async def close(self):
+        self._closed = True
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class ReplayTransport(AsyncHttpTransport):
+    """Serve as respostas do cassete, sem acessar a rede"""
+
+    def __init__(self, cassette, latency_scale=None):
+        self.cassette = cassette
+        self.latency_scale = REPLAY_LATENCY_SCALE if latency_scale is None else latency_scale
+        self._queues = defaultdict(deque)
+        self._last = {}
+        for interaction in cassette.interactions:
+            self._queues[interaction["request"]].append(interaction)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def _next_interaction(self, key):
+        queue = self._queues.get(key)
+        if queue:
+            self._last[key] = queue.popleft()
+        elif key not in self._last:
+            raise CassetteMissError(f"Requisição não gravada no cassete: {key}")
+        # Fila esgotada: repete a última resposta (ex.: polling mais longo)
+        return self._last[key]
+
+    async def send(self, request, **kwargs):
+        interaction = self._next_interaction(_request_key(request.method, request.url))
+        delay = interaction.get("elapsed", 0.0) * self.latency_scale
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return ReplayResponse(request, interaction, self.latency_scale)
+
+
+class ReplayCredential:
+    """Credencial fixa para o modo replay (nenhum token real é obtido)"""
+
+    async def get_token(self, *scopes, **kwargs):
+        return AccessToken("replay", int(time.time()) + 3600)
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def create_client(endpoint, mode=None, cassette_path=None, **client_kwargs):
+    """Cria (AgentsClient, credencial) gravando ou reproduzindo o tráfego
+
+    Um `transport` em `client_kwargs` é usado como transporte real no modo
+    record.
+    """
+    from azure.ai.agents.aio import AgentsClient
+
+    mode = mode or RECORD_MODE
+    cassette_path = cassette_path or CASSETTE_PATH
+
+    if mode == "record":
+        from azure.identity.aio import DefaultAzureCredential
+
+        credential = DefaultAzureCredential()
+        transport = RecordingTransport(Cassette(cassette_path), client_kwargs.pop("transport", None))
+        print(f"🎙️  Gravando tráfego em {cassette_path}")
+    elif mode == "replay":
+        credential = ReplayCredential()
+        client_kwargs.pop("transport", None)
+        transport = ReplayTransport(Cassette.load(cassette_path))
+        print(f"📼 Reproduzindo tráfego de {cassette_path} (latência x{transport.latency_scale})")
+    else:
+        raise ValueError(f"AGENT_RECORD_MODE inválido: {mode}")
+
+    client = AgentsClient(endpoint=endpoint, credential=credential, transport=transport, **client_kwargs)
+    return client, credential
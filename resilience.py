@@ -0,0 +1,342 @@
+# resilience.py
+"""Rate limiting, retry e circuit breaker para as chamadas ao Azure AI Agents.
+
+`ResilientClient` envolve o AgentsClient (ou o client simulado) e aplica, por
+família de endpoint (files, vector_stores, threads, messages, runs, agents):
+
+- token bucket compartilhado por todas as sessões, para não disparar
+  rajadas acima do limite do serviço; um 429 com Retry-After pausa a família
+  inteira, não só a chamada que o recebeu;
+- retry com backoff exponencial e jitter, respeitando Retry-After; erros 5xx
+  e de conexão só são repetidos em operações idempotentes (get/list/delete),
+  para não criar runs ou mensagens duplicados;
+- circuit breaker: depois de CIRCUIT_FAILURE_THRESHOLD falhas transitórias
+  seguidas a família passa a falhar na hora (CircuitOpenError) por
+  CIRCUIT_RESET_TIMEOUT segundos, e o agent responde pela base local.
+
+O retry interno do SDK é desligado (`retry_total=0`) quando esta camada está
+ativa, para não multiplicar tentativas.
+"""
+import asyncio
+import datetime
+import email.utils
+import inspect
+import os
+import random
+import time
+from collections import Counter
+
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+
+from telemetry import span
+
+RESILIENCE_ENABLED = os.getenv("AZURE_RESILIENCE_ENABLED", "true").lower() == "true"
+# Requisições por segundo por família; "runs=20,files=8" sobrescreve famílias específicas
+RATE_LIMIT_RPS = float(os.getenv("AZURE_RATE_LIMIT_RPS", "20"))
+RATE_LIMITS = os.getenv("AZURE_RATE_LIMITS", "runs=40")
+RETRY_MAX_ATTEMPTS = int(os.getenv("AZURE_RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("AZURE_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("AZURE_RETRY_MAX_DELAY", "20"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
+IDEMPOTENT_PREFIXES = ("get", "list", "delete")
+# Grupo de operações do client -> família de endpoint (métodos do próprio client: "agents")
+FAMILIES = {
+    "files": "files",
+    "vector_stores": "vector_stores",
+    "vector_store_files": "vector_stores",
+    "vector_store_file_batches": "vector_stores",
+    "threads": "threads",
+    "messages": "messages",
+    "runs": "runs",
+}
+PASSTHROUGH = ("close", "__aenter__", "__aexit__")
+
+
+class CircuitOpenError(RuntimeError):
+    """Família de endpoint com o circuito aberto: a chamada nem foi feita"""
+
+    def __init__(self, family, retry_in):
+        super().__init__(f"Serviço instável ({family}), nova tentativa em {retry_in:.0f} s")
+        self.family = family
+        self.retry_in = retry_in
+
+
+def status_code(error):
+    return getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def is_transient(error):
+    """Throttling, 5xx, falha de conexão ou circuito aberto"""
+    if isinstance(error, (CircuitOpenError, ServiceRequestError, ServiceResponseError)):
+        return True
+    return status_code(error) in RETRYABLE_STATUS
+
+
+def retry_after(error):
+    """Espera (s) pedida pelo serviço nos headers da resposta, se houver"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name) or headers.get(name.title())
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            pass
+        try:
+            parsed = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            # Header malformado: usa o backoff padrão em vez de abortar o retry
+            return None
+        if parsed is not None:
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+            return max(0.0, parsed.timestamp() - time.time())
+    return None
+
+
+def parse_rate_limits(spec, default):
+    """'runs=20,files=8' -> {"runs": 20.0, "files": 8.0} (demais famílias: default)"""
+    limits = {family: default for family in set(FAMILIES.values()) | {"agents"}}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        family, _, value = item.partition("=")
+        limits[family.strip()] = float(value)
+    return limits
+
+
+class TokenBucket:
+    """Limite de `rate` chamadas/s com rajadas de até `burst`; rate <= 0 desliga"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = max(1.0, burst if burst is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """Suspende a família (ex.: Retry-After de um 429)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """Aguarda um token; retorna o tempo esperado (s)"""
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                if self.rate <= 0:
+                    break
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        return time.monotonic() - started
+
+
+class CircuitBreaker:
+    """Fechado -> aberto após N falhas seguidas -> meio aberto (uma chamada de teste)"""
+
+    def __init__(self, family, failure_threshold=None, reset_timeout=None):
+        self.family = family
+        self.failure_threshold = CIRCUIT_FAILURE_THRESHOLD if failure_threshold is None else failure_threshold
+        self.reset_timeout = CIRCUIT_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def before_call(self):
+        """Lança CircuitOpenError se a família está em pausa; True se esta é a chamada de teste"""
+        if self.state == "closed" or self.failure_threshold <= 0:
+            return False
+        elapsed = time.monotonic() - self.opened_at
+        if self.state == "open" and elapsed >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        raise CircuitOpenError(self.family, max(0.0, self.reset_timeout - elapsed))
+
+    def release_probe(self):
+        """Chamada de teste encerrada sem resultado (cancelada, listagem abandonada)
+
+        Sem isso o circuito ficaria meio aberto para sempre, recusando tudo.
+        """
+        self._probing = False
+
+    def record_success(self):
+        if self.state != "closed":
+            print(f"✅ Circuito de {self.family} fechado: serviço respondendo")
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold > 0):
+            if self.state == "closed":
+                print(f"🔌 Circuito de {self.family} aberto após {self.failures} falhas seguidas")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class Resilience:
+    """Limitadores, breakers e contadores compartilhados por um client"""
+
+    def __init__(self, rate_limits=None, max_attempts=None, base_delay=None, max_delay=None, rng=None):
+        rate_limits = rate_limits or parse_rate_limits(RATE_LIMITS, RATE_LIMIT_RPS)
+        self.buckets = {family: TokenBucket(rate) for family, rate in rate_limits.items()}
+        self.breakers = {family: CircuitBreaker(family) for family in rate_limits}
+        self.max_attempts = max(1, RETRY_MAX_ATTEMPTS if max_attempts is None else max_attempts)
+        self.base_delay = RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.rng = rng or random.Random()
+        self.stats = Counter()
+
+    def _backoff(self, attempt, error):
+        """Retry-After do serviço, senão exponencial com jitter completo"""
+        requested = retry_after(error)
+        if requested is not None:
+            return min(requested, self.max_delay)
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _should_retry(self, operation, error, attempt):
+        if attempt + 1 >= self.max_attempts or isinstance(error, CircuitOpenError):
+            return False
+        if status_code(error) == 429:
+            return True
+        return is_transient(error) and operation.rsplit(".", 1)[-1].startswith(IDEMPOTENT_PREFIXES)
+
+    async def call(self, family, operation, function, *args, **kwargs):
+        """Executa `await function(...)` com limite de taxa, retry e breaker"""
+        bucket, breaker = self.buckets[family], self.breakers[family]
+        attempt = 0
+        while True:
+            try:
+                probe = breaker.before_call()
+            except CircuitOpenError:
+                self.stats["short_circuited"] += 1
+                raise
+            try:
+                waited = await bucket.acquire()
+                if waited > 0.001:
+                    self.stats["rate_limited"] += 1
+                try:
+                    result = await function(*args, **kwargs)
+                except Exception as e:
+                    transient = is_transient(e)
+                    if status_code(e) == 429:
+                        self.stats["throttled"] += 1
+                        requested = retry_after(e)
+                        if requested:
+                            bucket.pause(min(requested, self.max_delay))
+                    if not self._should_retry(operation, e, attempt):
+                        if transient:
+                            breaker.record_failure()
+                            self.stats["failed"] += 1
+                        else:
+                            # 4xx de negócio (ex.: 404) não indicam serviço degradado
+                            breaker.record_success()
+                        raise
+                    delay = self._backoff(attempt, e)
+                    self.stats["retries"] += 1
+                    with span("azure.retry", operation=operation, attempt=attempt + 1,
+                              status=status_code(e), delay_s=round(delay, 3)):
+                        await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                breaker.record_success()
+                return result
+            finally:
+                # Cancelamento (CancelledError não é Exception) ou nova tentativa
+                if probe:
+                    breaker.release_probe()
+
+    async def iterate(self, family, operation, function, *args, **kwargs):
+        """Listagem paginada: repete do início se falhar antes do primeiro item"""
+        breaker = self.breakers[family]
+        attempt = 0
+        while True:
+            probe = breaker.before_call()
+            yielded = False
+            try:
+                await self.buckets[family].acquire()
+                async for item in function(*args, **kwargs):
+                    if not yielded:
+                        # O serviço respondeu: quem sai da listagem no primeiro item
+                        # (ex.: só a última mensagem) não deixa o circuito pendente
+                        yielded = True
+                        breaker.record_success()
+                    yield item
+                breaker.record_success()
+                return
+            except Exception as e:
+                if yielded or not self._should_retry(operation, e, attempt):
+                    if is_transient(e):
+                        breaker.record_failure()
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt, e))
+                attempt += 1
+            finally:
+                # GeneratorExit (listagem abandonada) ou CancelledError: teste sem conclusão
+                if probe:
+                    breaker.release_probe()
+
+
+class _ResilientOperations:
+    """Grupo de operações (ex.: client.runs) com as chamadas protegidas"""
+
+    def __init__(self, target, resilience, family, prefix):
+        self._target = target
+        self._resilience = resilience
+        self._family = family
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        operation = f"{self._prefix}{name}"
+        if name in PASSTHROUGH or name.startswith("_") or not callable(attribute):
+            return attribute
+        resilience, family = self._resilience, self._family
+        if inspect.iscoroutinefunction(attribute):
+            async def call(*args, **kwargs):
+                return await resilience.call(family, operation, attribute, *args, **kwargs)
+            return call
+        if name.startswith("list"):
+            # Listagens síncronas retornam um paginador assíncrono (AsyncItemPaged)
+            def iterate(*args, **kwargs):
+                return resilience.iterate(family, operation, attribute, *args, **kwargs)
+            return iterate
+        return attribute
+
+
+class ResilientClient(_ResilientOperations):
+    """AgentsClient com rate limiting, retry e circuit breaker por família"""
+
+    def __init__(self, client, resilience=None):
+        super().__init__(client, resilience or Resilience(), "agents", "")
+        self._groups = {}
+
+    @property
+    def stats(self):
+        return self._resilience.stats
+
+    def __getattr__(self, name):
+        family = FAMILIES.get(name)
+        if family is None:
+            return super().__getattr__(name)
+        if name not in self._groups:
+            self._groups[name] = _ResilientOperations(getattr(self._target, name), self._resilience,
+                                                      family, f"{name}.")
+        return self._groups[name]
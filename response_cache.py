@@ -0,0 +1,174 @@
+# response_cache.py
+"""Cache de respostas por pergunta normalizada (LRU + TTL, persistência opcional).
+
+A chave combina o texto normalizado da pergunta com o estado do chamado na
+conversa (ContextWindow.fingerprint: categoria e SLA do chamado): "e quanto
+tempo isso leva?" depende do chamado em andamento, então só é reaproveitada
+num chamado da mesma categoria e SLA. Uma impressão digital global (hash das instruções + versão da
+base de conhecimento) descarta o cache inteiro quando muda.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from kb_sync import STATE_DIR, knowledge_base_version
+from text_utils import normalize_text
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "500"))
+RESPONSE_CACHE_PERSIST = os.getenv("RESPONSE_CACHE_PERSIST", "true").lower() == "true"
+# Intervalo mínimo entre verificações de mudança nas instruções/base
+CONTEXT_CHECK_INTERVAL = 2.0
+# Intervalo mínimo entre gravações em disco
+SAVE_INTERVAL = 5.0
+# Muda quando o formato da chave muda, descartando caches gravados antes
+KEY_VERSION = 3
+
+
+def instructions_hash(instructions_path):
+    """SHA-256 (curto) do conteúdo do arquivo de instruções"""
+    try:
+        with open(instructions_path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()[:16]
+    except OSError:
+        return "sem-instrucoes"
+
+
+def context_fingerprint(instructions_path, knowledge_base_path):
+    return f"v{KEY_VERSION}:{instructions_hash(instructions_path)}:{knowledge_base_version(knowledge_base_path)}"
+
+
+class ResponseCache:
+    """Cache LRU com TTL por entrada, limite de tamanho e contadores de acerto"""
+
+    def __init__(self, context_provider=None, max_entries=None, ttl=None, path=None):
+        self.context_provider = context_provider
+        self.max_entries = max_entries or RESPONSE_CACHE_MAX_ENTRIES
+        self.ttl = RESPONSE_CACHE_TTL if ttl is None else ttl
+        self.path = Path(path) if path else None
+        self.entries = OrderedDict()  # chave -> {"question", "answer", "expires_at"}
+        self.context = None
+        self.hits = 0
+        self.misses = 0
+        self._last_context_check = 0.0
+        self._last_save = 0.0
+        self._dirty = False
+
+        if self.path:
+            self.load()
+        self._check_context(force=True)
+
+    @classmethod
+    def from_env(cls, instructions_path, knowledge_base_path):
+        path = os.path.join(STATE_DIR, "response_cache.json") if RESPONSE_CACHE_PERSIST else None
+        return cls(
+            context_provider=lambda: context_fingerprint(instructions_path, knowledge_base_path),
+            path=path,
+        )
+
+    @staticmethod
+    def make_key(question, conversation_context=()):
+        """Hash da pergunta normalizada + estado do chamado na conversa"""
+        payload = json.dumps([normalize_text(question), conversation_context], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def _check_context(self, force=False):
+        """Invalida o cache quando instruções ou base de conhecimento mudam"""
+        if not self.context_provider:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_context_check < CONTEXT_CHECK_INTERVAL:
+            return
+        self._last_context_check = now
+
+        context = self.context_provider()
+        if context != self.context:
+            if self.entries:
+                print("♻️  Instruções ou base de conhecimento alteradas, cache de respostas invalidado")
+            self.entries.clear()
+            self.context = context
+            self._dirty = True
+
+    def get(self, question, conversation_context=()):
+        self._check_context()
+        key = self.make_key(question, conversation_context)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry["expires_at"] < time.time():
+            del self.entries[key]
+            self._dirty = True
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry["answer"]
+
+    def put(self, question, answer, conversation_context=()):
+        self._check_context()
+        key = self.make_key(question, conversation_context)
+        self.entries[key] = {
+            "question": normalize_text(question),
+            "answer": answer,
+            "expires_at": time.time() + self.ttl,
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._dirty = True
+        if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+            self.save()
+
+    def clear(self):
+        self.entries.clear()
+        self._dirty = True
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Cache de respostas ignorado: {e}")
+            return
+
+        now = time.time()
+        self.context = data.get("context")
+        for key, entry in data.get("entries", []):
+            if entry.get("expires_at", 0) > now:
+                self.entries[key] = entry
+
+    def save(self):
+        """Grava o cache em disco (somente se houve alteração)"""
+        if not self.path or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"context": self.context, "entries": list(self.entries.items())}
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._last_save = time.monotonic()
+        except OSError as e:
+            print(f"⚠️  Não foi possível gravar o cache de respostas: {e}")
@@ -0,0 +1,144 @@
+# service.py
+"""Serviço HTTP de classificação (aiohttp).
+
+Mantém um único AgentsClient, credencial, agent e Vector Store por processo,
+com pool de conexões HTTP compartilhado, e atende muitas requisições
+simultâneas em um só event loop.
+
+Endpoints:
+    POST /classify  {"text": "..."}                         -> categoria, SLA, sugestão
+    POST /chat      {"session_id": "...", "message": "..."} -> resposta da conversa
+    GET  /health
+
+Uso:
+    python service.py --port 8080
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from aiohttp import ClientSession, TCPConnector, web
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from support_agent import SupportAgent
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8080"))
+# Conexões HTTP simultâneas com o Azure (pool compartilhado)
+SERVICE_POOL_SIZE = int(os.getenv("SERVICE_POOL_SIZE", "100"))
+# Runs em andamento ao mesmo tempo
+SERVICE_MAX_INFLIGHT = int(os.getenv("SERVICE_MAX_INFLIGHT", "32"))
+MAX_TEXT_LENGTH = 4000
+
+AGENT_KEY = web.AppKey("agent", SupportAgent)
+STATE_KEY = web.AppKey("state", dict)
+
+
+async def _read_json(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(reason="JSON inválido")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(reason="Esperado um objeto JSON")
+    return body
+
+
+def _require_text(body, field):
+    text = body.get(field)
+    if not isinstance(text, str) or not text.strip():
+        raise web.HTTPBadRequest(reason=f"Campo '{field}' obrigatório")
+    if len(text) > MAX_TEXT_LENGTH:
+        raise web.HTTPRequestEntityTooLarge(max_size=MAX_TEXT_LENGTH, actual_size=len(text))
+    return text.strip()
+
+
+async def classify(request):
+    agent = request.app[AGENT_KEY]
+    state = request.app[STATE_KEY]
+    text = _require_text(await _read_json(request), "text")
+
+    started = time.perf_counter()
+    async with state["inflight"]:
+        result = await agent.classify(text)
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return web.json_response(result, status=502 if "error" in result else 200)
+
+
+async def chat(request):
+    agent = request.app[AGENT_KEY]
+    state = request.app[STATE_KEY]
+    body = await _read_json(request)
+    message = _require_text(body, "message")
+    session_id = body.get("session_id") or uuid.uuid4().hex
+
+    started = time.perf_counter()
+    async with state["inflight"]:
+        reply, source = await agent.chat(session_id, message)
+
+    response = {
+        "session_id": session_id,
+        "reply": reply,
+        "source": source,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    return web.json_response(response, status=502 if source == "error" else 200)
+
+
+async def health(request):
+    agent = request.app[AGENT_KEY]
+    return web.json_response({
+        "connected": agent.is_connected,
+        "agent_id": agent.agent.id if agent.agent else None,
+        "vector_store_id": agent.vector_store.id if agent.vector_store else None,
+        "sessions": len(agent.threads.sessions) if agent.threads else 0,
+        "metrics": agent.metrics.snapshot(agent.response_cache),
+        "azure_calls": dict(getattr(agent.client, 'stats', None) or {}),
+        "single_flight": agent.in_flight.stats() if agent.in_flight else None,
+    })
+
+
+async def _on_startup(app):
+    from azure.core.pipeline.transport import AioHttpTransport
+
+    # Pool de conexões compartilhado por todas as chamadas ao Azure
+    session = ClientSession(connector=TCPConnector(limit=SERVICE_POOL_SIZE, keepalive_timeout=60))
+    app[STATE_KEY]["http_session"] = session
+    await app[AGENT_KEY].connect(transport=AioHttpTransport(session=session, session_owner=False))
+    print(f"✅ Serviço pronto (pool {SERVICE_POOL_SIZE} conexões, {SERVICE_MAX_INFLIGHT} runs simultâneos)")
+
+
+async def _on_cleanup(app):
+    await app[AGENT_KEY].disconnect()
+    await app[STATE_KEY]["http_session"].close()
+
+
+def create_app(agent=None):
+    app = web.Application()
+    app[AGENT_KEY] = agent or SupportAgent()
+    app[STATE_KEY] = {
+        "inflight": asyncio.Semaphore(SERVICE_MAX_INFLIGHT),
+        "http_session": None,
+    }
+    app.router.add_post("/classify", classify)
+    app.router.add_post("/chat", chat)
+    app.router.add_get("/health", health)
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP de classificação de chamados")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# single_flight.py
+"""Coalescência de perguntas idênticas em andamento (single-flight).
+
+Durante um incidente muitos usuários mandam quase a mesma pergunta ao mesmo
+tempo ("wifi não conecta"). Em vez de um run por pergunta, a primeira
+(líder) executa o run e as idênticas que chegam enquanto ele está em
+andamento esperam e recebem a mesma resposta. A chave é a pergunta
+normalizada mais o contexto do chamado na conversa.
+
+Cada espera mantém o próprio prazo e cancelamento: uma seguidora que desiste
+não afeta o run, e se o líder for cancelado as seguidoras executam o seu.
+Só resultados de execuções bem-sucedidas são compartilhados: se o líder
+falhar, cada seguidora recebe LeaderFailed e decide sozinha o que fazer.
+"""
+import asyncio
+import os
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+
+class LeaderFailed(Exception):
+    """A execução compartilhada falhou; `error` é a exceção do líder"""
+
+    def __init__(self, error):
+        super().__init__(f"Execução compartilhada falhou: {error}")
+        self.error = error
+
+
+class SingleFlight:
+    """Registro chave -> tarefa em andamento"""
+
+    def __init__(self):
+        self.flights = {}
+        self.leaders = 0
+        self.followers = 0
+        self.failures = 0
+
+    async def run(self, key, factory):
+        """Executa `await factory()` ou aguarda a execução idêntica em andamento
+
+        Retorna (resultado, compartilhado). O líder recebe as próprias
+        exceções; as seguidoras recebem LeaderFailed com a exceção do líder.
+        """
+        while True:
+            leader = self.flights.get(key)
+            if leader is None:
+                break
+            # asyncio.wait não cancela o líder se esta espera for cancelada
+            await asyncio.wait({leader})
+            if leader.cancelled():
+                # Líder cancelado (prazo ou usuário dele): esta espera assume
+                continue
+            error = leader.exception()
+            if error is not None:
+                self.failures += 1
+                raise LeaderFailed(error) from error
+            self.followers += 1
+            return leader.result(), True
+
+        task = asyncio.ensure_future(factory())
+        self.flights[key] = task
+        self.leaders += 1
+        try:
+            return await task, False
+        finally:
+            if self.flights.get(key) is task:
+                del self.flights[key]
+
+    def stats(self):
+        return {"in_flight": len(self.flights), "leaders": self.leaders, "followers": self.followers,
+                "failures": self.failures}
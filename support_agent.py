@@ -0,0 +1,1068 @@
+# support_agent.py
+"""Núcleo do Agent de Suporte TI, independente de interface.
+
+Concentra a conexão com o Azure AI Foundry, a sincronização da base de
+conhecimento e a execução de runs. É usado pela interface Tkinter
+(agent.py) e pelos modos sem interface (ex.: batch_classify.py).
+"""
+import asyncio
+import functools
+import os
+import re
+import time
+
+from agent_state import AGENT_WARM_START, AgentState, resource_metadata, text_hash
+from context_window import ContextWindow
+from fast_classifier import FAST_PATH_ENABLED, FastClassifier
+from kb_compile import KB_COMPILE_ENABLED, compile_knowledge_base
+from kb_sync import KnowledgeBaseSync, upload_files_concurrently
+from local_retrieval import LOCAL_RETRIEVAL_ENABLED, LocalRetriever
+from recording import RECORD_MODE, create_client as create_recording_client
+from resilience import RESILIENCE_ENABLED, ResilientClient, is_transient, status_code
+from response_cache import RESPONSE_CACHE_ENABLED, ResponseCache
+from single_flight import SINGLE_FLIGHT_ENABLED, LeaderFailed, SingleFlight
+from telemetry import (TracedCredential, record_usage, sensitive, set_attributes, setup_telemetry, span,
+                       tracing_enabled)
+from text_utils import normalize_text
+from thread_pool import ThreadManager
+from turn_metrics import MetricsRecorder, TurnMetrics
+
+# Execução de runs: streaming de eventos, com polling adaptativo como fallback
+STREAMING_ENABLED = os.getenv("AGENT_STREAMING", "true").lower() == "true"
+# Falhas de streaming seguidas (fora as de serviço degradado) antes de pausar o streaming
+STREAM_FAILURE_LIMIT = 3
+# Pausa (s) do streaming depois de STREAM_FAILURE_LIMIT falhas; depois volta a tentar
+STREAM_RETRY_INTERVAL = 300.0
+# Respostas HTTP que indicam falta de suporte a streaming no serviço
+STREAM_UNSUPPORTED_STATUS = (405, 501)
+POLL_INITIAL_INTERVAL = float(os.getenv("AGENT_POLL_INITIAL_INTERVAL", "0.1"))
+POLL_MAX_INTERVAL = float(os.getenv("AGENT_POLL_MAX_INTERVAL", "1.0"))
+POLL_BACKOFF = 1.5
+RUN_ACTIVE_STATUSES = ('queued', 'in_progress')
+# Prazo (s) do run por turno; ao estourar, o run é cancelado e a resposta vem da base local
+RUN_DEADLINE = float(os.getenv("AGENT_RUN_DEADLINE", "60"))
+RUN_CANCEL_TIMEOUT = 5.0
+# Similaridade mínima do exemplo mais próximo para usar a resposta dele na contingência
+FALLBACK_MIN_CONFIDENCE = float(os.getenv("FALLBACK_MIN_CONFIDENCE", "0.5"))
+# ...e fração das palavras da pergunta presentes nele ("wifi não conecta" não é "VPN não conecta")
+FALLBACK_MIN_COVERAGE = float(os.getenv("FALLBACK_MIN_COVERAGE", "0.8"))
+# Resposta de um run concluído sem mensagem do agent
+NO_REPLY = "Sem resposta"
+# Mensagens buscadas por página ao procurar a resposta do run
+MESSAGE_PAGE_LIMIT = 5
+# Nome dos agents criados pelo app; o metadata (resource_metadata) identifica a instalação
+AGENT_NAME_PREFIX = "suporte-ti-agent-"
+
+_CATEGORY_RE = re.compile(r"classificad[oa] como\s*['\"“‘]?([\wÀ-ÿ-]+)", re.IGNORECASE)
+_SLA_RE = re.compile(r"SLA:\s*([^.\n]+)", re.IGNORECASE)
+_SUGGESTION_RE = re.compile(r"Sugest[ãa]o:\s*(.+?)(?:\n\s*\n|$)", re.IGNORECASE | re.DOTALL)
+# Negrito, itálico e código em markdown (`_` só nas bordas das palavras, não em nomes_compostos)
+_MARKDOWN_RE = re.compile(r"[*`]+|(?<!\w)_+|_+(?!\w)")
+
+
+def parse_classification(text):
+    """Extrai categoria, SLA e sugestão de uma resposta no formato das instruções
+
+    A marcação markdown que o modelo costuma usar ("**SLA:** 4 horas") é
+    removida antes.
+    """
+    text = _MARKDOWN_RE.sub("", text or "")
+    category = _CATEGORY_RE.search(text)
+    sla = _SLA_RE.search(text)
+    suggestion = _SUGGESTION_RE.search(text)
+    return {
+        "category": category.group(1).strip().lower() if category else None,
+        "sla": sla.group(1).strip() if sla else None,
+        "suggestion": " ".join(suggestion.group(1).split()) if suggestion else None,
+    }
+
+
+class RunFailed(Exception):
+    """Run do agent sem resposta utilizável; `reply` é a resposta de erro do turno"""
+
+    def __init__(self, reply):
+        super().__init__(reply)
+        self.reply = reply
+
+
+class Conversation:
+    """Estado local de uma thread remota"""
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.seen_message_ids = set()
+        # Turnos respondidos localmente, enviados junto com o próximo run
+        self.pending_local_turns = []
+        # Origem da última resposta: cache, local, agent, coalesced (run de
+        # pergunta idêntica em andamento), fallback ou error
+        self.last_source = None
+        # Tempos do turno em andamento
+        self.turn = None
+        # Run em andamento, pedido de cancelamento do turno e run cancelado
+        # que ainda pode estar ativo na thread
+        self.active_run_id = None
+        self.cancel_event = None
+        self.cancelled_run_id = None
+        # Conteúdo enviado à thread no turno (pergunta com os trechos da base locais)
+        self.sent_content = None
+        # Tamanho aproximado da thread e resumo do chamado
+        self.context = ContextWindow()
+
+    def record_local_turn(self, message, answer):
+        """Mantém o contexto da conversa para o próximo run do agent"""
+        self.pending_local_turns.append({"role": "user", "content": message})
+        self.pending_local_turns.append({"role": "assistant", "content": answer})
+
+
+class SupportAgent:
+    """Conexão com o Azure AI Foundry e processamento de perguntas"""
+
+    def __init__(self, knowledge_base_path="./knowledge_base",
+                 instructions_path="./instructions/instrucoes.txt"):
+        self.knowledge_base_path = knowledge_base_path
+        self.instructions_path = instructions_path
+        setup_telemetry()
+
+        self.is_connected = False
+        self.client = None
+        self.credential = None
+        self.agent = None
+        self.vector_store = None
+        self.threads = None
+        self.ingestion = None
+        # Todos os arquivos da base estão no Vector Store (respostas podem ir para o cache)
+        self.knowledge_base_synced = False
+        self.connect_timings = {}
+        self.uploaded_files = []
+        self.last_upload_report = None
+        self.streaming_supported = STREAMING_ENABLED
+        self.stream_failures = 0
+        self.streaming_paused_until = 0.0
+        self.metrics = MetricsRecorder()
+        self.classifier = self._load_classifier() if FAST_PATH_ENABLED else None
+        self.retriever = self._load_retriever() if LOCAL_RETRIEVAL_ENABLED else None
+        self.in_flight = SingleFlight() if SINGLE_FLIGHT_ENABLED else None
+        self.response_cache = (
+            ResponseCache.from_env(instructions_path, knowledge_base_path)
+            if RESPONSE_CACHE_ENABLED else None
+        )
+
+    def _load_classifier(self):
+        """Treina o classificador local com os exemplos rotulados da base"""
+        try:
+            classifier = FastClassifier.from_file(
+                os.path.join(self.knowledge_base_path, "base_support_ti.json")
+            )
+            print(f"✅ Classificador local treinado com {len(classifier.examples)} exemplos")
+            return classifier
+        except Exception as e:
+            print(f"⚠️  Classificador local indisponível: {e}")
+            return None
+
+    def _load_retriever(self):
+        """Índice local da base para anexar trechos às perguntas"""
+        try:
+            return LocalRetriever(self.knowledge_base_path)
+        except Exception as e:
+            print(f"⚠️  Busca local indisponível: {e}")
+            return None
+
+    def read_instructions(self):
+        """Lê instruções do arquivo"""
+        try:
+            with open(self.instructions_path, 'r', encoding='utf-8') as file:
+                content = file.read().strip()
+            if not content:
+                raise ValueError("O arquivo está vazio")
+            print("✅ Instruções carregadas do arquivo com sucesso!")
+            return content
+        except Exception as e:
+            print(f"❌ Erro ao ler instruções: {e}")
+            return """
+            VOCÊ É UM AGENTE DE SUPORTE TÉCNICO COM ACESSO A UMA BASE DE CONHECIMENTO
+
+            SUAS FUNÇÕES:
+            1. Usar a base de conhecimento (Vector Store) para buscar informações
+            2. Classificar problemas: Rede, Hardware, Software, Segurança
+            3. Fornecer soluções baseadas em documentação
+            4. Ser preciso e profissional
+
+            IMPORTANTE:
+            - Você tem acesso a documentos de suporte técnico via Vector Store
+            - SEMPRE busque na base de conhecimento antes de responder
+            - Cite procedimentos específicos quando disponíveis
+            - Forneça contatos corretos da documentação
+
+            BASE DE CONHECIMENTO DISPONÍVEL:
+            - Procedimentos de suporte técnico
+            - Contatos e informações de suporte
+            - Políticas da empresa
+
+            Quando o usuário fizer uma pergunta:
+            1. Busque informações relevantes no Vector Store
+            2. Forneça respostas baseadas na documentação
+            3. Seja específico e cite fontes quando possível
+            """
+
+    async def upload_files_to_vector_store(self, vector_store_id, file_paths):
+        """Faz upload concorrente de arquivos para o Vector Store
+
+        Retorna um dict {file_path: file_id} com os arquivos enviados; o
+        relatório completo (falhas por arquivo, tempo total) fica em
+        self.last_upload_report.
+        """
+        for file_path in file_paths:
+            print(f"⬆️  Enviando arquivo: {os.path.basename(file_path)}")
+
+        report = await upload_files_concurrently(self.client, vector_store_id, file_paths)
+        self.last_upload_report = report
+
+        print(f"⏱️  Upload concluído: {report.summary()}")
+        for result in report.failed:
+            print(f"❌ Falha no upload de {os.path.basename(result.file_path)}: {result.error}")
+
+        return report.as_mapping()
+
+    async def _compile_knowledge_base(self, knowledge_base_path):
+        """Compila a base em artefatos por categoria; em caso de falha usa os originais"""
+        try:
+            with span("kb.compile", path=knowledge_base_path) as compile_span:
+                report = await asyncio.to_thread(compile_knowledge_base, knowledge_base_path)
+                set_attributes(compile_span, **{
+                    "kb.chunks": report.chunks,
+                    "kb.duplicates": report.duplicates,
+                    "kb.bytes_in": report.bytes_in,
+                    "kb.bytes_out": report.bytes_out,
+                })
+        except Exception as e:
+            print(f"⚠️  Falha ao compilar a base, enviando os arquivos originais: {e}")
+            return knowledge_base_path
+        print(f"🧱 Base compilada: {report.summary()}")
+        return report.output_dir
+
+    async def _sync_knowledge_base(self, kb_sync, vector_store, knowledge_base_path):
+        """Compila a base e envia o que mudou ao Vector Store
+
+        `vector_store` é a tarefa que abre o Vector Store: a compilação (local)
+        roda enquanto ele é buscado/criado. Retorna current_files.
+        """
+        if not os.path.exists(knowledge_base_path):
+            print("❌ Pasta knowledge_base não encontrada")
+
+        if KB_COMPILE_ENABLED:
+            knowledge_base_path = await self._compile_knowledge_base(knowledge_base_path)
+        kb_sync.knowledge_base_path = knowledge_base_path
+        vector_store = await vector_store
+
+        with span("kb.sync", path=knowledge_base_path) as sync_span:
+            current_files = await kb_sync.sync_files(vector_store, self.upload_files_to_vector_store)
+            set_attributes(sync_span, **{"kb.files": len(current_files)})
+
+        if current_files:
+            self.uploaded_files = [entry["path"] for entry in current_files.values()]
+            print(f"✅ {len(kb_sync.manifest.files)} arquivos sincronizados no Vector Store")
+        else:
+            print("⚠️  Nenhum arquivo encontrado na pasta knowledge_base")
+        self.knowledge_base_synced = set(kb_sync.manifest.files) == set(current_files)
+        return current_files
+
+    async def create_vector_store_with_files(self, knowledge_base_path: str):
+        """Sincroniza a base de conhecimento com o Vector Store
+
+        Reutiliza o Vector Store do manifesto local e envia apenas arquivos
+        novos ou alterados; arquivos apagados são desassociados. Com
+        KB_COMPILE_ENABLED, envia os artefatos compilados em vez dos originais.
+        """
+        try:
+            print("📚 Sincronizando Vector Store da base de conhecimento...")
+            kb_sync = KnowledgeBaseSync(self.client, knowledge_base_path, metadata=resource_metadata())
+            vector_store = asyncio.ensure_future(kb_sync.ensure_vector_store())
+            try:
+                await self._sync_knowledge_base(kb_sync, vector_store, knowledge_base_path)
+            finally:
+                vector_store.cancel()
+            return vector_store.result()
+
+        except Exception as e:
+            print(f"❌ Erro ao sincronizar Vector Store: {e}")
+            return None
+
+    async def _timed(self, step, awaitable):
+        """Aguarda uma etapa da conexão registrando a duração em connect_timings"""
+        started = time.perf_counter()
+        try:
+            with span(f"connect.{step}"):
+                return await awaitable
+        finally:
+            self.connect_timings[step] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def _ingest(self, kb_sync, vector_store):
+        """Ingestão da base em segundo plano; falhas não derrubam a conexão"""
+        try:
+            return await self._timed(
+                "ingestion", self._sync_knowledge_base(kb_sync, vector_store, self.knowledge_base_path)
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Erro ao sincronizar Vector Store: {e}")
+            return None
+
+    async def connect(self, client=None, wait_for_ingestion=False, **client_kwargs):
+        """Conecta ao Azure AI Foundry: client, Vector Store, agent e threads
+
+        As etapas rodam como tarefas concorrentes: as threads são pré-criadas
+        desde o início, o agent só espera o id do Vector Store e a ingestão da
+        base (compilação e upload) continua em segundo plano depois que o
+        agent está pronto (`wait_for_ingestion=True` espera por ela). A
+        duração de cada etapa fica em `connect_timings` (ms).
+
+        `client` substitui o AgentsClient (ex.: o client simulado dos
+        benchmarks); `client_kwargs` são repassados ao AgentsClient (ex.:
+        `transport` com um pool de conexões compartilhado). Com
+        AZURE_RESILIENCE_ENABLED, o client é envolvido pelo ResilientClient
+        (rate limiting, retry e circuit breaker). Lança exceção com mensagem
+        amigável em caso de falha.
+        """
+        endpoint = os.getenv("AZURE_AI_PROJECT_ENDPOINT")
+        model_name = os.getenv("AZURE_AI_MODEL_DEPLOYMENT_NAME")
+
+        if not endpoint or not model_name:
+            raise ValueError("Variáveis de ambiente não configuradas")
+
+        self.connect_timings = {}
+        self.knowledge_base_synced = False
+        started = time.perf_counter()
+        with span("agent.connect", model=model_name, record_mode=RECORD_MODE or None) as connect_span:
+            print("🔗 Conectando ao Azure AI Foundry...")
+
+            # Criar clients assíncronos
+            client_started = time.perf_counter()
+            if client is None and RESILIENCE_ENABLED:
+                # Retry feito pelo ResilientClient; o do SDK multiplicaria as tentativas
+                client_kwargs.setdefault("retry_total", 0)
+            if client is None and RECORD_MODE:
+                # Gravação/reprodução do tráfego HTTP em cassete
+                client, self.credential = create_recording_client(endpoint, **client_kwargs)
+            elif client is None:
+                from azure.ai.agents.aio import AgentsClient
+                from azure.identity.aio import DefaultAzureCredential
+
+                self.credential = DefaultAzureCredential()
+                credential = TracedCredential(self.credential) if tracing_enabled() else self.credential
+                client = AgentsClient(endpoint=endpoint, credential=credential, **client_kwargs)
+                print("✅ Usando AgentsClient")
+            self.client = ResilientClient(client) if RESILIENCE_ENABLED else client
+            self.connect_timings["client"] = round((time.perf_counter() - client_started) * 1000, 1)
+
+            # Threads não dependem de nada: o pool começa a ser aquecido já
+            self.threads = ThreadManager(self.new_conversation, self.close_conversation)
+            self.threads.start()
+            threads_ready = asyncio.create_task(self._timed("threads", self.threads.wait_ready()))
+
+            # Vector Store (buscar/criar) e ingestão da base, que só precisa dele no upload
+            print("📚 Sincronizando Vector Store da base de conhecimento...")
+            kb_sync = KnowledgeBaseSync(self.client, self.knowledge_base_path, metadata=resource_metadata())
+            vector_store = asyncio.create_task(self._timed("vector_store", kb_sync.ensure_vector_store()))
+            self.ingestion = asyncio.create_task(self._ingest(kb_sync, vector_store))
+
+            try:
+                instructions = await self._timed("instructions", asyncio.to_thread(self.read_instructions))
+                try:
+                    self.vector_store = await vector_store
+                except Exception as e:
+                    raise RuntimeError(f"Falha ao criar Vector Store: {e}") from e
+
+                # Reutilizar o agent da execução anterior ou criar um novo (só precisa do id do Vector Store)
+                self.agent = await self._timed("agent", self._ensure_agent(endpoint, model_name, instructions))
+                print(f"✅ Agente pronto: {self.agent.id}")
+                await threads_ready
+            except BaseException:
+                await self._abort_connect(threads_ready, vector_store)
+                raise
+
+            self.connect_timings["ready"] = round((time.perf_counter() - started) * 1000, 1)
+            set_attributes(connect_span, **{"agent.id": self.agent.id, "vector_store.id": self.vector_store.id,
+                                            "connect.ready_ms": self.connect_timings["ready"]})
+            print(f"⚡ Pronto para perguntas em {self.connect_timings['ready']:.0f} ms "
+                  f"(ingestão da base em segundo plano)")
+
+        self.is_connected = True
+        if wait_for_ingestion:
+            await self.wait_for_ingestion()
+
+    async def _abort_connect(self, *tasks):
+        """Cancela as etapas ainda em andamento de uma conexão que falhou"""
+        for task in (*tasks, self.ingestion):
+            task.cancel()
+        await asyncio.gather(*tasks, self.ingestion, return_exceptions=True)
+        self.ingestion = None
+        await self.threads.close()
+        self.threads = None
+
+    async def wait_for_ingestion(self):
+        """Aguarda a ingestão da base; retorna current_files (None se falhou)"""
+        if self.ingestion is None:
+            return None
+        return await asyncio.shield(self.ingestion)
+
+    def _tool_kwargs(self):
+        """Ferramenta file_search apontando para o Vector Store da base"""
+        return {
+            "tools": [{"type": "file_search"}],
+            "tool_resources": {"file_search": {"vector_store_ids": [self.vector_store.id]}},
+        }
+
+    async def _apply_agent(self, name, operation, model_name, instructions, capabilities):
+        """Cria/atualiza o agent com file_search quando o modelo suporta
+
+        O suporte é testado só na primeira vez para cada modelo; o resultado
+        fica em `capabilities`, que é salvo: só uma recusa do serviço (4xx não
+        transitório) marca o modelo sem file_search, e throttling, 5xx ou
+        circuito aberto no teste são repassados sem registrar nada. `name` ("create_agent" ou "update_agent")
+        nomeia os spans: com o ResilientClient, a função de `operation` é o
+        wrapper de resiliência, não a operação.
+        """
+        file_search = capabilities.get("file_search")
+        if file_search is not False:
+            try:
+                with span(f"agent.{name}", file_search=True):
+                    agent = await operation(model=model_name, instructions=instructions, **self._tool_kwargs())
+                capabilities["file_search"] = True
+                print("✅ Agent configurado com file_search tool")
+                return agent
+            except Exception as e:
+                code = status_code(e)
+                if file_search or is_transient(e) or code is None or not 400 <= code < 500:
+                    raise
+                print(f"⚠️  Não foi possível criar agent com file_search: {e}")
+                capabilities["file_search"] = False
+
+        with span(f"agent.{name}", file_search=False):
+            agent = await operation(model=model_name, instructions=instructions)
+        print("✅ Agent configurado sem file_search tool")
+        return agent
+
+    async def _ensure_agent(self, endpoint, model_name, instructions):
+        """Reutiliza o agent salvo se nada mudou, atualiza se mudou ou cria um novo"""
+        state = AgentState.load()
+        if state.endpoint != endpoint:
+            state.forget_agent()
+            state.capabilities = {}
+            state.endpoint = endpoint
+
+        capabilities = state.model_capabilities(model_name)
+        instructions_hash = text_hash(instructions)
+        agent = None
+
+        if AGENT_WARM_START and state.agent_id:
+            try:
+                with span("agent.get_agent", **{"agent.id": state.agent_id}):
+                    agent = await self.client.get_agent(state.agent_id)
+            except Exception as e:
+                print(f"⚠️  Agent salvo {state.agent_id} indisponível: {e}")
+
+        if agent and state.matches(model_name, instructions_hash, self.vector_store.id):
+            print("♻️  Agent reutilizado da execução anterior")
+            return agent
+
+        if agent:
+            try:
+                agent = await self._apply_agent(
+                    "update_agent", functools.partial(self.client.update_agent, agent.id),
+                    model_name, instructions, capabilities
+                )
+                print("🔄 Agent atualizado com a nova configuração")
+            except Exception as e:
+                print(f"⚠️  Não foi possível atualizar o agent: {e}")
+                agent = None
+
+        if not agent:
+            agent = await self._apply_agent(
+                "create_agent", functools.partial(self.client.create_agent, name=f"{AGENT_NAME_PREFIX}{int(time.time())}",
+                                  metadata=resource_metadata()),
+                model_name, instructions, capabilities
+            )
+
+        state.agent_id = agent.id
+        state.model = model_name
+        state.instructions_hash = instructions_hash
+        state.vector_store_id = self.vector_store.id
+        try:
+            state.save()
+        except OSError as e:
+            print(f"⚠️  Não foi possível salvar o estado do agent: {e}")
+        return agent
+
+    async def new_conversation(self):
+        """Cria uma thread remota com estado local próprio"""
+        with span("thread.create") as thread_span:
+            thread = await self.client.threads.create(metadata=resource_metadata())
+            set_attributes(thread_span, **{"thread.id": thread.id})
+        return Conversation(thread)
+
+    async def close_conversation(self, conversation):
+        """Remove a thread remota de uma conversa"""
+        try:
+            await self.client.threads.delete(conversation.thread.id)
+        except Exception as e:
+            print(f"⚠️  Não foi possível remover thread {conversation.thread.id}: {e}")
+
+    async def _delete_agent(self):
+        if AGENT_WARM_START:
+            return "🔧 Agent mantido para a próxima conexão"
+        await self.client.delete_agent(self.agent.id)
+        return "🔧 Agent removido"
+
+    async def _close_threads(self):
+        await self.threads.close()
+        return "📝 Threads removidas"
+
+    async def _stop_ingestion(self):
+        self.ingestion.cancel()
+        await asyncio.gather(self.ingestion, return_exceptions=True)
+        return "⏹️ Sincronização da base interrompida"
+
+    async def disconnect(self):
+        """Remove as threads (e o agent, sem warm start) e fecha os clients
+
+        Recursos independentes são removidos em paralelo; o que sobrar (ex.:
+        janela fechada no meio da limpeza) é recolhido por cleanup.py.
+        Retorna a lista de mensagens de status para exibir ao usuário.
+        """
+        status = []
+        try:
+            steps = []
+            if self.ingestion and not self.ingestion.done():
+                steps.append(self._stop_ingestion())
+            if self.client:
+                if self.agent and hasattr(self.agent, 'id'):
+                    steps.append(self._delete_agent())
+                # O Vector Store é mantido para ser reutilizado na próxima conexão
+                if self.threads:
+                    steps.append(self._close_threads())
+                if self.response_cache:
+                    steps.append(asyncio.to_thread(self.response_cache.save))
+
+            with span("agent.disconnect", steps=len(steps)):
+                results = await asyncio.gather(*steps, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Erro na desconexão assíncrona: {result}")
+                elif result:
+                    status.append(result)
+
+            if self.client:
+                # Fechar clients
+                await self.client.close()
+                if self.credential:
+                    await self.credential.close()
+
+        except Exception as e:
+            print(f"Erro na desconexão assíncrona: {e}")
+        finally:
+            self.is_connected = False
+            self.agent = None
+            self.threads = None
+            self.ingestion = None
+            self.knowledge_base_synced = False
+        return status
+
+    async def classify(self, text):
+        """Classifica um chamado isolado em uma conversa descartável
+
+        Retorna dict com category, sla, suggestion, reply e source (ou error).
+        """
+        result = {}
+        conversation = await self.threads.take()
+        try:
+            reply = await self.ask(text, conversation=conversation)
+            if conversation.last_source == "error":
+                result["error"] = reply
+            else:
+                result.update(parse_classification(reply))
+                result["reply"] = reply
+            result["source"] = conversation.last_source
+        finally:
+            self.threads.discard(conversation)
+        return result
+
+    async def chat(self, session_id, message, on_delta=None, queued_at=None):
+        """Responde dentro da conversa da sessão; retorna (resposta, origem)
+
+        Mensagens da mesma sessão são processadas uma por vez na mesma thread.
+        `queued_at` (time.perf_counter) inclui na espera o tempo em uma fila
+        anterior, como a fila de mensagens da interface.
+        """
+        turn = TurnMetrics() if queued_at is None else TurnMetrics(created=queued_at)
+
+        async def handler(conversation):
+            turn.queue_wait = time.perf_counter() - turn.created
+            if conversation.context.needs_compaction():
+                conversation = await self._compact_conversation(session_id, conversation)
+            reply = await self.ask(message, conversation, on_delta=on_delta, turn=turn)
+            return reply, conversation.last_source
+
+        return await self.threads.run(session_id, handler)
+
+    async def _compact_conversation(self, session_id, conversation):
+        """Troca a thread da sessão por uma nova que começa com o resumo do chamado
+
+        O resumo vai junto com a próxima pergunta no run, sem chamada extra.
+        """
+        previous_tokens = conversation.context.tokens
+        with span("context.compact", **{"thread.id": conversation.thread.id,
+                                        "context.tokens": previous_tokens}) as compact_span:
+            fresh = await self.threads.take()
+            fresh.context.carry_over(conversation.context)
+            fresh.pending_local_turns = [{"role": "user", "content": fresh.context.summary()}]
+            self.threads.replace(session_id, fresh)
+            set_attributes(compact_span, **{"thread.new_id": fresh.thread.id,
+                                            "context.summary_tokens": fresh.context.tokens})
+        print(f"🗜️  Contexto compactado: ~{previous_tokens} -> ~{fresh.context.tokens} tokens")
+        return fresh
+
+    def cancel(self, session_id):
+        """Interrompe o turno em andamento da sessão; retorna False se não houver
+
+        O turno termina com a resposta de contingência da base local. Deve ser
+        chamado no event loop do agent.
+        """
+        session = self.threads.sessions.get(session_id) if self.threads else None
+        conversation = session.conversation if session else None
+        if conversation is None or conversation.cancel_event is None:
+            return False
+        conversation.cancel_event.set()
+        return True
+
+    def _cached_answer(self, conversation, message):
+        """Responde com o cache quando a mesma pergunta já foi respondida"""
+        if not self.response_cache:
+            return None
+
+        answer = self.response_cache.get(message, conversation.context.fingerprint())
+        if answer:
+            print(f"💾 Resposta do cache (taxa de acerto {self.response_cache.hit_rate:.0%})")
+            conversation.record_local_turn(message, answer)
+        return answer
+
+    def _fast_path_answer(self, conversation, message):
+        """Responde localmente quando o classificador tem confiança suficiente"""
+        if not self.classifier:
+            return None
+
+        classification = self.classifier.classify(message)
+        if not classification.is_confident():
+            return None
+
+        print(f"⚡ Resposta local: {classification.label} / {classification.sla} "
+              f"(confiança {classification.confidence:.2f}, cobertura {classification.coverage:.0%})")
+        conversation.record_local_turn(message, classification.answer)
+        return classification.answer
+
+    async def _stream_run(self, conversation, on_delta=None, additional_messages=None, tool_choice=None):
+        """Cria o run em modo streaming e repassa os deltas de texto
+
+        Retorna (run, texto). Se o streaming falhar depois do run ter sido
+        criado, retorna o último estado conhecido para seguir com polling.
+        """
+        run = None
+        parts = []
+        with span("run.stream", **{"thread.id": conversation.thread.id}) as stream_span:
+            conversation.turn.api_calls += 1
+            try:
+                async with await self.client.runs.stream(
+                    thread_id=conversation.thread.id,
+                    agent_id=self.agent.id,
+                    additional_messages=additional_messages,
+                    tool_choice=tool_choice
+                ) as stream:
+                    async for event_type, event_data, _ in stream:
+                        if event_type == "thread.message.delta":
+                            text = getattr(event_data, 'text', '')
+                            if text:
+                                if not parts:
+                                    stream_span.add_event("first_token")
+                                parts.append(text)
+                                if on_delta:
+                                    on_delta(text)
+                        elif event_type == "thread.message.completed":
+                            conversation.seen_message_ids.add(event_data.id)
+                        elif event_type.startswith("thread.run.") and not event_type.startswith("thread.run.step"):
+                            run = event_data
+                            conversation.active_run_id = run.id
+                            conversation.turn.run_status(run.status)
+                            stream_span.add_event(event_type)
+                        elif event_type == "error":
+                            raise RuntimeError(f"Erro no stream: {event_data}")
+            except Exception as e:
+                if run is None:
+                    raise
+                print(f"⚠️  Stream interrompido, acompanhando run por polling: {e}")
+                stream_span.record_exception(e)
+                # Texto parcial: a resposta completa será buscada após o polling
+                parts = []
+            set_attributes(stream_span, **{
+                "run.id": run.id if run else None,
+                "run.status": run.status if run else None,
+                "stream.deltas": len(parts),
+            })
+            if run is not None:
+                record_usage(stream_span, run)
+        return run, "".join(parts)
+
+    def _on_stream_failure(self, error):
+        """Polling neste turno; streaming desligado só com sinal explícito de falta de suporte
+
+        Um 400 de uma mensagem ou um 404 de uma thread removida não dizem nada
+        sobre o streaming das outras sessões: só pausam o streaming depois de
+        STREAM_FAILURE_LIMIT falhas seguidas, e por STREAM_RETRY_INTERVAL s.
+        """
+        if isinstance(error, (AttributeError, NotImplementedError)) or status_code(error) in STREAM_UNSUPPORTED_STATUS:
+            print(f"⚠️  Streaming não suportado, usando polling: {error}")
+            self.streaming_supported = False
+            return
+        self.stream_failures += 1
+        if self.stream_failures >= STREAM_FAILURE_LIMIT:
+            print(f"⚠️  Streaming falhou {self.stream_failures} vezes seguidas, "
+                  f"usando polling por {STREAM_RETRY_INTERVAL:.0f} s: {error}")
+            self.streaming_paused_until = time.monotonic() + STREAM_RETRY_INTERVAL
+            self.stream_failures = 0
+        else:
+            print(f"⚠️  Streaming falhou, usando polling neste turno: {error}")
+
+    async def _wait_for_run(self, conversation, run):
+        """Polling adaptativo: intervalo inicial curto, crescimento exponencial e teto"""
+        interval = POLL_INITIAL_INTERVAL
+        polls = 0
+        with span("run.wait", **{"run.id": run.id}) as wait_span:
+            while run.status in RUN_ACTIVE_STATUSES:
+                await asyncio.sleep(interval)
+                polls += 1
+                with span("run.poll", poll=polls, interval_s=round(interval, 3)) as poll_span:
+                    run = await self.client.runs.get(
+                        thread_id=conversation.thread.id,
+                        run_id=run.id
+                    )
+                    conversation.turn.api_calls += 1
+                    conversation.turn.run_status(run.status)
+                    set_attributes(poll_span, **{"run.status": run.status})
+                interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+            set_attributes(wait_span, **{"run.status": run.status, "run.poll_count": polls})
+            record_usage(wait_span, run)
+        return run
+
+    @staticmethod
+    def _extract_message_text(msg):
+        """Concatena o texto de todos os blocos de conteúdo de uma mensagem"""
+        text = ""
+        for content in msg.content:
+            if hasattr(content, 'text'):
+                if hasattr(content.text, 'value'):
+                    text += content.text.value
+                elif hasattr(content.text, 'text'):
+                    text += content.text.text
+            elif hasattr(content, 'value'):
+                text += content.value
+        return text
+
+    async def _fetch_run_response(self, conversation, run_id):
+        """Busca apenas a resposta mais recente do assistant produzida pelo run
+
+        Lista as mensagens do run em ordem decrescente com página pequena e
+        para na primeira mensagem do assistant ainda não vista, em vez de
+        percorrer a thread inteira.
+        """
+        started = time.perf_counter()
+        conversation.turn.api_calls += 1
+        try:
+            with span("messages.list", **{"run.id": run_id, "page.limit": MESSAGE_PAGE_LIMIT}) as list_span:
+                messages_pager = self.client.messages.list(
+                    thread_id=conversation.thread.id,
+                    run_id=run_id,
+                    order="desc",
+                    limit=MESSAGE_PAGE_LIMIT
+                )
+
+                scanned = 0
+                async for msg in messages_pager:
+                    scanned += 1
+                    if msg.id in conversation.seen_message_ids:
+                        break
+                    conversation.seen_message_ids.add(msg.id)
+                    if msg.role == 'assistant':
+                        agent_response = self._extract_message_text(msg)
+                        if agent_response:
+                            set_attributes(list_span, **{"messages.scanned": scanned})
+                            return agent_response
+                set_attributes(list_span, **{"messages.scanned": scanned})
+            return ""
+        finally:
+            conversation.turn.message_fetch = time.perf_counter() - started
+
+    async def ask(self, message, conversation, on_delta=None, turn=None):
+        """Processa uma pergunta na conversa e retorna a resposta (ou "Erro: ...")
+
+        `on_delta(texto)` recebe os trechos da resposta em streaming; os tempos
+        do turno (`turn`) vão para self.metrics.
+        """
+        conversation.turn = turn or TurnMetrics()
+        conversation.cancel_event = asyncio.Event()
+        conversation.sent_content = None
+        with span("agent.ask", **{
+            "thread.id": conversation.thread.id,
+            "message.length": len(message),
+            "message.text": sensitive(message),
+        }) as ask_span:
+            reply = await self._answer(message, conversation, on_delta)
+            if conversation.last_source != "error":
+                conversation.context.add_turn(message, reply, parse_classification(reply),
+                                              sent=conversation.sent_content)
+            set_attributes(ask_span, **{"answer.source": conversation.last_source, "reply.length": len(reply)})
+
+        conversation.turn.finish(conversation.last_source)
+        self.metrics.record(conversation.turn)
+        conversation.turn = None
+        conversation.cancel_event = None
+        conversation.active_run_id = None
+        return reply
+
+    async def _answer(self, message, conversation, on_delta):
+        try:
+            # Perguntas repetidas saem do cache; casos rotineiros do classificador local
+            cached_answer = self._cached_answer(conversation, message)
+            if cached_answer:
+                conversation.last_source = "cache"
+                return cached_answer
+
+            fast_answer = self._fast_path_answer(conversation, message)
+            if fast_answer:
+                conversation.last_source = "local"
+                return fast_answer
+
+            conversation.last_source = "agent"
+            return await self._run_with_deadline(message, conversation, on_delta)
+
+        except Exception as e:
+            if is_transient(e) and self.classifier:
+                # Throttling persistente ou circuito aberto: responde pela base local
+                print(f"⚠️  Serviço indisponível, usando a base local: {e}")
+                return self._fallback_answer(conversation, message, f"serviço indisponível ({e})")
+            conversation.last_source = "error"
+            return f"Erro: {str(e)}"
+
+    async def _run_with_deadline(self, message, conversation, on_delta):
+        """Executa o run do agent com prazo de RUN_DEADLINE segundos
+
+        Se o prazo estourar ou o usuário cancelar, cancela o run remoto e
+        responde com a classificação local.
+        """
+        run_task = asyncio.ensure_future(self._coalesced_run(message, conversation, on_delta))
+        cancel_task = asyncio.ensure_future(conversation.cancel_event.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {run_task, cancel_task}, timeout=RUN_DEADLINE, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            cancel_task.cancel()
+            if not run_task.done():
+                run_task.cancel()
+        if run_task in done:
+            return run_task.result()
+
+        await asyncio.gather(run_task, return_exceptions=True)
+        reason = "cancelado pelo usuário" if cancel_task in done else f"sem resposta em {RUN_DEADLINE:g} s"
+        print(f"⏱️  Run interrompido ({reason})")
+        await self._cancel_remote_run(conversation)
+        return self._fallback_answer(conversation, message, reason)
+
+    async def _coalesced_run(self, message, conversation, on_delta):
+        """Run do agent, compartilhado com perguntas idênticas em andamento
+
+        Seguidoras recebem a resposta do líder sem criar run; ela entra no
+        histórico da conversa como um turno local (como as do cache). Só
+        respostas de runs bem-sucedidos são compartilhadas: se o run do líder
+        falhar, cada seguidora executa o próprio run, ou responde pela base
+        local quando a falha é do serviço (throttling, circuito aberto).
+        """
+        if not self.in_flight:
+            return await self._run_agent(message, conversation, on_delta)
+
+        async def leader_run():
+            reply = await self._run_agent(message, conversation, on_delta)
+            if conversation.last_source == "error" or reply == NO_REPLY:
+                raise RunFailed(reply)
+            return reply
+
+        key = (normalize_text(message), conversation.context.fingerprint())
+        with span("run.single_flight", in_flight=len(self.in_flight.flights)) as flight_span:
+            try:
+                reply, shared = await self.in_flight.run(key, leader_run)
+            except RunFailed as e:
+                # Run do próprio líder: a resposta de erro fica só com ele
+                return e.reply
+            except LeaderFailed as e:
+                set_attributes(flight_span, **{"single_flight.leader_failed": True})
+                if is_transient(e.error):
+                    raise e.error
+                print(f"⚠️  Run da pergunta idêntica falhou, executando o próprio: {e.error}")
+                return await self._run_agent(message, conversation, on_delta)
+            set_attributes(flight_span, **{"single_flight.shared": shared})
+        if shared:
+            print("🔗 Resposta compartilhada com pergunta idêntica em andamento")
+            conversation.last_source = "coalesced"
+            conversation.record_local_turn(message, reply)
+        return reply
+
+    async def _cancel_remote_run(self, conversation):
+        """Pede o cancelamento do run em andamento sem esperar ele terminar"""
+        run_id = conversation.active_run_id
+        if not run_id:
+            return
+        with span("run.cancel", **{"run.id": run_id}):
+            try:
+                conversation.turn.api_calls += 1
+                await asyncio.wait_for(
+                    self.client.runs.cancel(thread_id=conversation.thread.id, run_id=run_id),
+                    RUN_CANCEL_TIMEOUT
+                )
+            except Exception as e:
+                print(f"⚠️  Não foi possível cancelar o run {run_id}: {e}")
+        # O próximo turno aguarda o run sair da thread antes de enviar mensagens
+        conversation.cancelled_run_id = run_id
+
+    async def _settle_cancelled_run(self, conversation):
+        """Aguarda o run cancelado no turno anterior deixar a thread"""
+        run_id, conversation.cancelled_run_id = conversation.cancelled_run_id, None
+        interval = POLL_INITIAL_INTERVAL
+        while True:
+            run = await self.client.runs.get(thread_id=conversation.thread.id, run_id=run_id)
+            conversation.turn.api_calls += 1
+            if run.status not in RUN_ACTIVE_STATUSES + ('cancelling',):
+                return
+            await asyncio.sleep(interval)
+            interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+
+    def _fallback_answer(self, conversation, message, reason):
+        """Resposta de contingência: categoria e SLA do exemplo mais próximo da base
+
+        A resposta do exemplo só é usada com confiança FALLBACK_MIN_CONFIDENCE
+        e cobertura FALLBACK_MIN_COVERAGE. Sem cobertura, orienta a abrir um
+        chamado com a categoria e o SLA do exemplo; sem confiança, só com os do
+        chamado em andamento na conversa, se houver.
+        """
+        if not self.classifier:
+            conversation.last_source = "error"
+            return f"Erro: Run interrompido ({reason})"
+
+        classification = self.classifier.classify(message)
+        conversation.last_source = "fallback"
+        confident = classification.confidence >= FALLBACK_MIN_CONFIDENCE
+        if confident and classification.coverage >= FALLBACK_MIN_COVERAGE:
+            return (f"{classification.answer}\n\n"
+                    f"(Resposta da base local: o agent foi interrompido, {reason}.)")
+
+        print(f"⚠️  Exemplo mais próximo com confiança {classification.confidence:.2f} e cobertura "
+              f"{classification.coverage:.2f}, sem resposta da base local")
+        if confident:
+            category, sla = classification.label, classification.sla
+        else:
+            category, sla = conversation.context.category, conversation.context.sla
+        known = [f"categoria {category}"] if category else []
+        known += [f"SLA de {sla}"] if sla else []
+        details = f" ({', '.join(known)})" if known else ""
+        return (f"Não foi possível responder agora ({reason}). "
+                f"Abra um chamado com o suporte de TI descrevendo o problema{details}.")
+
+    def _with_local_context(self, message, conversation):
+        """Retorna (conteúdo da mensagem, tool_choice do run)
+
+        Com um trecho local forte, a pergunta segue com os trechos e o run
+        dispensa o file_search remoto (`tool_choice="none"`).
+        """
+        if not self.retriever:
+            return message, None
+
+        started = time.perf_counter()
+        with span("retrieval.search") as search_span:
+            hits = self.retriever.search(message)
+            strong = self.retriever.is_strong(hits)
+            set_attributes(search_span, **{
+                "retrieval.hits": len(hits),
+                "retrieval.top_score": hits[0].score if hits else None,
+                "retrieval.strong": strong,
+            })
+        conversation.turn.retrieval = time.perf_counter() - started
+        if not strong:
+            return message, None
+        print(f"🔎 Base local: {len(hits)} trechos (cobertura {hits[0].score:.2f}), sem file_search")
+        return self.retriever.format_context(message, hits), "none"
+
+    async def _run_agent(self, message, conversation, on_delta):
+        """Envia a pergunta ao agent e aguarda a resposta do run"""
+        # Estado do chamado antes deste turno: chave da resposta no cache
+        context = conversation.context.fingerprint()
+        # Respostas dadas com a base ainda incompleta no Vector Store não vão para o cache
+        cacheable = self.knowledge_base_synced
+        if conversation.cancelled_run_id:
+            await self._settle_cancelled_run(conversation)
+
+        # Trechos da base encontrados localmente vão junto com a pergunta
+        content, tool_choice = self._with_local_context(message, conversation)
+        conversation.sent_content = content
+
+        if conversation.pending_local_turns:
+            # Turnos locais entram no run antes da nova pergunta
+            additional_messages = conversation.pending_local_turns + [{"role": "user", "content": content}]
+            conversation.pending_local_turns = []
+        else:
+            # Adicionar mensagem à thread
+            with span("message.create"):
+                conversation.turn.api_calls += 1
+                await self.client.messages.create(
+                    thread_id=conversation.thread.id,
+                    content=content,
+                    role="user"
+                )
+            additional_messages = None
+
+        # Executar run: streaming quando disponível, senão polling adaptativo
+        run = None
+        streamed_text = ""
+        if self.streaming_supported and time.monotonic() >= self.streaming_paused_until:
+            try:
+                run, streamed_text = await self._stream_run(conversation, on_delta, additional_messages, tool_choice)
+                self.stream_failures = 0
+            except Exception as e:
+                if is_transient(e):
+                    # Serviço degradado, não falta de suporte a streaming
+                    raise
+                self._on_stream_failure(e)
+
+        if run is None:
+            with span("run.create") as create_span:
+                run = await self.client.runs.create(
+                    thread_id=conversation.thread.id,
+                    agent_id=self.agent.id,
+                    additional_messages=additional_messages,
+                    tool_choice=tool_choice
+                )
+                conversation.active_run_id = run.id
+                conversation.turn.api_calls += 1
+                conversation.turn.run_status(run.status)
+                set_attributes(create_span, **{"run.id": run.id, "run.status": run.status})
+
+        # Aguardar conclusão
+        run = await self._wait_for_run(conversation, run)
+
+        if run.status == 'completed':
+            agent_response = streamed_text or await self._fetch_run_response(conversation, run.id)
+
+            if agent_response and self.response_cache and cacheable:
+                self.response_cache.put(message, agent_response, context)
+
+            return agent_response if agent_response else NO_REPLY
+        else:
+            conversation.last_source = "error"
+            return f"Erro no run: {run.status}"
+
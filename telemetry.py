@@ -0,0 +1,172 @@
+# telemetry.py
+"""Spans OpenTelemetry das etapas de conexão e processamento de mensagens.
+
+Ativado com ENABLE_OTEL=true. O exportador é escolhido por OTEL_EXPORTER:
+`file` (JSON por linha em OTEL_FILE_PATH, funciona offline), `console` ou
+`otlp` (coletor em OTLP_ENDPOINT). Sem OpenTelemetry instalado, ou com
+ENABLE_OTEL desligado, `span()` não faz nada.
+"""
+import contextlib
+import os
+import threading
+
+ENABLE_OTEL = os.getenv("ENABLE_OTEL", "false").lower() == "true"
+# Inclui o texto das mensagens nos atributos dos spans
+ENABLE_SENSITIVE_DATA = os.getenv("ENABLE_SENSITIVE_DATA", "false").lower() == "true"
+OTEL_EXPORTER = os.getenv("OTEL_EXPORTER", "file").lower()
+# Padrão: traces.jsonl dentro de AGENT_STATE_DIR
+OTEL_FILE_PATH = os.getenv("OTEL_FILE_PATH")
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://localhost:4317/")
+SERVICE_NAME = "suporte-ti-agent"
+
+_tracer = None
+_setup_lock = threading.Lock()
+_setup_done = False
+
+
+class _NoopSpan:
+    """Span vazio usado quando a telemetria está desligada"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def is_recording(self):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _file_path():
+    from kb_sync import STATE_DIR
+    return OTEL_FILE_PATH or os.path.join(STATE_DIR, "traces.jsonl")
+
+
+def _build_exporter():
+    if OTEL_EXPORTER == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter()
+    if OTEL_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=OTLP_ENDPOINT, insecure=OTLP_ENDPOINT.startswith("http://"))
+
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class FileSpanExporter(SpanExporter):
+        """Grava um span por linha (JSON) em arquivo local"""
+
+        def __init__(self, path):
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.file = open(path, 'a', encoding='utf-8')
+            self.lock = threading.Lock()
+
+        def export(self, spans):
+            with self.lock:
+                for finished_span in spans:
+                    self.file.write(finished_span.to_json(indent=None) + "\n")
+                self.file.flush()
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            with self.lock:
+                self.file.close()
+
+    return FileSpanExporter(_file_path())
+
+
+def setup_telemetry():
+    """Configura o TracerProvider uma única vez; retorna True se ativo"""
+    global _tracer, _setup_done
+    with _setup_lock:
+        if _setup_done:
+            return _tracer is not None
+        _setup_done = True
+        if not ENABLE_OTEL:
+            return False
+        try:
+            from opentelemetry import trace
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+            provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+            provider.add_span_processor(BatchSpanProcessor(_build_exporter()))
+            trace.set_tracer_provider(provider)
+            _tracer = trace.get_tracer(SERVICE_NAME)
+        except Exception as e:
+            print(f"⚠️  Telemetria indisponível: {e}")
+            return False
+
+    destination = _file_path() if OTEL_EXPORTER == "file" else OTLP_ENDPOINT if OTEL_EXPORTER == "otlp" else "console"
+    print(f"📡 Telemetria OpenTelemetry ativa ({OTEL_EXPORTER}: {destination})")
+    return True
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """Abre um span filho do span atual; atributos None são ignorados"""
+    if _tracer is None:
+        yield _NOOP_SPAN
+        return
+    with _tracer.start_as_current_span(name) as current:
+        set_attributes(current, **attributes)
+        yield current
+
+
+def set_attributes(current, **attributes):
+    if current.is_recording():
+        current.set_attributes({key: value for key, value in attributes.items() if value is not None})
+
+
+def record_usage(current, run):
+    """Copia o uso de tokens do run para o span"""
+    usage = getattr(run, 'usage', None)
+    if usage is None:
+        return
+    set_attributes(
+        current,
+        **{
+            "tokens.prompt": getattr(usage, 'prompt_tokens', None),
+            "tokens.completion": getattr(usage, 'completion_tokens', None),
+            "tokens.total": getattr(usage, 'total_tokens', None),
+        }
+    )
+
+
+def sensitive(text):
+    """Texto da mensagem somente com ENABLE_SENSITIVE_DATA ligado"""
+    return text if ENABLE_SENSITIVE_DATA else None
+
+
+class TracedCredential:
+    """Envolve a credencial para medir a obtenção de tokens"""
+
+    def __init__(self, credential):
+        self.credential = credential
+
+    async def get_token(self, *scopes, **kwargs):
+        with span("credential.get_token", scopes=",".join(scopes)):
+            return await self.credential.get_token(*scopes, **kwargs)
+
+    async def close(self):
+        await self.credential.close()
+
+    async def __aenter__(self):
+        await self.credential.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.credential.__aexit__(*exc_info)
+
+
+def tracing_enabled():
+    return _tracer is not None
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Estado local isolado; os módulos do agent leem AGENT_STATE_DIR na importação
+os.environ["AGENT_STATE_DIR"] = tempfile.mkdtemp(prefix="agent-test-state-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
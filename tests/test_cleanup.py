@@ -0,0 +1,109 @@
+import asyncio
+import os
+import socket
+import time
+
+import pytest
+
+import agent_state
+import cleanup
+from benchmarks.simulated_client import SimulatedAgentsClient, SimulationConfig
+
+# Cutoff no futuro: todo recurso conta como antigo
+ANY_AGE = -1
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(agent_state, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(cleanup, "STATE_DIR", str(tmp_path))
+    agent_state.install_id.cache_clear()
+    yield SimulatedAgentsClient(SimulationConfig(latency_scale=0))
+    agent_state.install_id.cache_clear()
+
+
+def own(**overrides):
+    return {**agent_state.resource_metadata(), "host": "outra-maquina", **overrides}
+
+
+def other_install():
+    return own(install_id="outra-instalacao")
+
+
+class UploadedFile:
+    def __init__(self, name):
+        self.name = name
+
+
+def find(client, knowledge_base="knowledge_base"):
+    return asyncio.run(cleanup.find_orphans(client, ANY_AGE, knowledge_base))
+
+
+def test_only_own_resources_are_orphans(client):
+    async def setup():
+        mine = await client.create_agent(model="gpt", name="suporte-ti-agent-1", metadata=own())
+        await client.create_agent(model="gpt", name="suporte-ti-agent-2", metadata=other_install())
+        await client.create_agent(model="gpt", name="suporte-ti-agent-3")
+        thread = await client.threads.create(metadata=own())
+        await client.threads.create(metadata=other_install())
+        await client.threads.create()
+        return mine.id, thread.id
+
+    agent_id, thread_id = asyncio.run(setup())
+    orphans = {(orphan.kind, orphan.id) for orphan in find(client)}
+    assert orphans == {("agent", agent_id), ("thread", thread_id)}
+
+
+def test_resources_of_live_local_process_are_kept(client):
+    alive = own(host=socket.gethostname(), pid=str(os.getpid()))
+
+    async def setup():
+        await client.threads.create(metadata=alive)
+        await client.create_agent(model="gpt", name="suporte-ti-agent-1", metadata=alive)
+
+    asyncio.run(setup())
+    assert find(client) == []
+
+
+def test_files_attached_to_remaining_vector_stores_are_kept(client):
+    async def setup():
+        ours = await client.vector_stores.create(name=cleanup.VECTOR_STORE_NAME, metadata=own())
+        theirs = await client.vector_stores.create(name=cleanup.VECTOR_STORE_NAME, metadata=other_install())
+        files = [await client.files.upload(file=UploadedFile("/kb/base_support_ti.json"), purpose="assistants")
+                 for _ in range(3)]
+        await client.vector_store_files.create(ours.id, files[0].id)
+        await client.vector_store_files.create(theirs.id, files[1].id)
+        return ours.id, theirs.id, [file.id for file in files]
+
+    ours, theirs, (in_ours, in_theirs, loose) = asyncio.run(setup())
+    orphans = {(orphan.kind, orphan.id) for orphan in find(client)}
+    assert orphans == {("vector_store", ours), ("file", in_ours), ("file", loose)}
+
+
+def test_recently_used_vector_store_is_kept(client, monkeypatch):
+    vector_store_id = asyncio.run(
+        client.vector_stores.create(name=cleanup.VECTOR_STORE_NAME, metadata=own())
+    ).id
+    created = client._vector_store_object
+
+    def used_now(vector_store_id):
+        vector_store = created(vector_store_id)
+        vector_store.created_at, vector_store.last_active_at = 0, time.time()
+        return vector_store
+
+    monkeypatch.setattr(client, "_vector_store_object", used_now)
+    orphans, remaining = asyncio.run(cleanup._find_vector_stores(client, time.time() - 3600, set()))
+    assert orphans == [] and remaining == [vector_store_id]
+
+
+def test_sweep_lists_without_deleting_by_default(client):
+    async def setup():
+        await client.threads.create(metadata=own())
+
+    asyncio.run(setup())
+    orphans, failed = asyncio.run(cleanup.sweep(client, ANY_AGE))
+    assert len(orphans) == 1 and not failed
+    assert len(client.threads_info) == 1
+
+    asyncio.run(cleanup.sweep(client, ANY_AGE, delete=True))
+    assert client.threads_info == {}
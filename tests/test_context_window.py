@@ -0,0 +1,55 @@
+from context_window import ContextWindow, estimate_tokens
+
+TICKET = {"category": "rede", "sla": "4 horas", "suggestion": "Reinicie o roteador."}
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens("abcde") == 2
+
+
+def test_turns_accumulate_tokens_and_ticket_state():
+    window = ContextWindow(budget=10)
+    window.add_turn("wifi caiu", "x" * 20, TICKET)
+    window.add_turn("ainda sem wifi", "x" * 20, {"suggestion": "Reinicie o roteador."})
+    assert window.category == "rede" and window.sla == "4 horas"
+    assert list(window.steps) == ["Reinicie o roteador."]
+    assert window.tokens == estimate_tokens("wifi caiu") + estimate_tokens("ainda sem wifi") + 10
+    assert window.needs_compaction()
+
+
+def test_zero_budget_never_compacts():
+    window = ContextWindow(budget=0)
+    window.add_turn("x" * 1000, "y" * 1000)
+    assert not window.needs_compaction()
+
+
+def test_fingerprint_changes_with_ticket_state():
+    window = ContextWindow()
+    empty = window.fingerprint()
+    assert empty == ContextWindow().fingerprint()
+    window.add_turn("wifi caiu", "resposta", TICKET)
+    assert window.fingerprint() != empty
+
+
+def test_carry_over_keeps_ticket_and_counts_only_summary():
+    window = ContextWindow(budget=10)
+    for index in range(10):
+        window.add_turn(f"pergunta {index} " + "x" * 300, "y" * 400, TICKET)
+
+    fresh = ContextWindow(budget=10_000)
+    fresh.carry_over(window)
+    summary = fresh.summary()
+    assert "- Categoria: rede" in summary and "- SLA: 4 horas" in summary
+    assert "pergunta 9" in summary and "pergunta 0" not in summary
+    assert fresh.tokens == estimate_tokens(summary) < window.tokens
+    assert fresh.fingerprint() == window.fingerprint()
+
+
+def test_tokens_count_the_content_actually_sent():
+    window = ContextWindow()
+    sent = "wifi caiu\n\nTrechos relevantes da base de conhecimento:\n" + "x" * 1800
+    window.add_turn("wifi caiu", "resposta", sent=sent)
+    assert window.tokens == estimate_tokens(sent) + estimate_tokens("resposta")
+    assert list(window.questions) == ["wifi caiu"]
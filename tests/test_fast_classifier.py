@@ -0,0 +1,43 @@
+import pytest
+
+from fast_classifier import FastClassifier
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return FastClassifier.from_file("knowledge_base/base_support_ti.json")
+
+
+@pytest.mark.parametrize("question, category", [
+    ("Não consigo conectar no wifi do escritório", "network"),
+    ("preciso resetar a senha do windows", "access"),
+    ("VPN não conecta em casa", "network"),
+    ("Internet não funciona em nenhum dispositivo do setor", "network"),
+])
+def test_routine_questions_take_the_fast_path(classifier, question, category):
+    classification = classifier.classify(question)
+    assert classification.is_confident()
+    assert classification.category == category
+
+
+@pytest.mark.parametrize("question", [
+    # n-gramas aproximam do exemplo de wifi ("reinicie o roteador")
+    "Não consigo conectar na VPN",
+    # Múltiplos usuários: CRÍTICO (1 hora), não o SLA de 4 horas do exemplo
+    "não consigo conectar no wifi, todos os dispositivos afetados",
+    "Internet não funciona no escritório inteiro",
+    "Qual procedimento para reset de senha?",
+    "Quais são os contatos de suporte?",
+])
+def test_near_misses_go_to_the_agent(classifier, question):
+    assert not classifier.classify(question).is_confident()
+
+
+def test_critical_example_keeps_its_sla(classifier):
+    classification = classifier.classify("Internet não funciona em nenhum dispositivo do setor")
+    assert classification.sla.startswith("1 hora")
+
+
+def test_coverage_ignores_short_tokens(classifier):
+    classification = classifier.classify("não consigo conectar no wifi 3")
+    assert classification.coverage == 1.0
@@ -0,0 +1,63 @@
+import json
+
+from fast_classifier import normalize_category
+from kb_compile import Chunk, compile_knowledge_base, deduplicate, extract_chunks
+from local_retrieval import chunk_file
+from text_utils import flatten_json, split_paragraphs, stems
+
+
+def test_stems_fold_accents_and_inflections():
+    assert stems("Conexão caiu ao conectar") == ["conex", "caiu", "conec"]
+    assert stems("resetar") == stems("reset")
+
+
+def test_flatten_json():
+    assert flatten_json({"passos": ["a", "b"], "contato": "x"}) == "passos: a; b; contato: x"
+
+
+def test_split_paragraphs_respects_max_chars():
+    text = "\n\n".join(["palavra " * 30] * 4)
+    chunks = split_paragraphs(text, 300)
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_normalize_category():
+    assert normalize_category("Rede") == "network"
+    assert normalize_category("'acesso'") == "access"
+    assert normalize_category("network") == "network"
+    assert normalize_category("") is None
+
+
+def test_redundant_record_fields_are_dropped(tmp_path):
+    solutions = ["Verifique papel e toner", "Reinicie o roteador do andar", "Troque a bateria do mouse",
+                 "Limpe o cache do navegador", "Use o portal de autoatendimento"]
+    records = [
+        {"pergunta": f"Chamado {index}", "categoria": "hardware",
+         "solucao": f"{solution}; se persistir, abra um chamado com o suporte técnico",
+         "resposta_agent": f"Seu problema foi classificado como 'hardware'. SLA: 4 horas. Sugestão: {solution}; "
+                           f"se persistir, abra um chamado com o suporte técnico"}
+        for index, solution in enumerate(solutions)
+    ]
+    path = tmp_path / "base.json"
+    path.write_text(json.dumps(records), encoding="utf-8")
+    chunks, dropped = extract_chunks(str(path))
+    assert dropped == 5
+    assert [chunk.category for chunk in chunks] == ["hardware"] * 5
+    assert all("solucao" not in chunk.text and "Sugestão" in chunk.text for chunk in chunks)
+
+
+def test_deduplicate_within_category():
+    chunks = [
+        Chunk("Reinicie o roteador e teste outro dispositivo", "a.md", "network"),
+        Chunk("reinicie o roteador e teste outro dispositivo.", "b.md", "network"),
+        Chunk("Reinicie o roteador e teste outro dispositivo agora", "c.md", "hardware"),
+    ]
+    assert [chunk.source for chunk in deduplicate(chunks)] == ["a.md", "c.md"]
+
+
+def test_compile_and_retrieval_share_chunks(tmp_path):
+    report = compile_knowledge_base("knowledge_base", tmp_path / "compiled")
+    assert report.chunks == len(chunk_file("knowledge_base/base_support_ti.json")) + \
+        len(chunk_file("knowledge_base/support_procedures.json"))
+    assert report.written
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+import kb_sync
+from benchmarks.simulated_client import SimulatedAgentsClient, SimulatedServiceError, SimulationConfig
+from kb_sync import KnowledgeBaseSync, plan_sync, upload_files_concurrently
+
+
+@pytest.fixture
+def client():
+    return SimulatedAgentsClient(SimulationConfig(latency_scale=0))
+
+
+@pytest.fixture
+def knowledge_base(tmp_path):
+    path = tmp_path / "knowledge_base"
+    path.mkdir()
+    for index in range(3):
+        (path / f"guia_{index}.md").write_text(f"Procedimento {index}", encoding="utf-8")
+    return path
+
+
+def count_attachments(client, monkeypatch):
+    attached = []
+    create = client.vector_store_files.create
+
+    async def counting_create(vector_store_id, file_id, **kwargs):
+        attached.append(file_id)
+        await create(vector_store_id, file_id, **kwargs)
+
+    monkeypatch.setattr(client.vector_store_files, "create", counting_create)
+    return attached
+
+
+def entry(sha256, file_id):
+    return {"size": 1, "mtime": 1, "sha256": sha256, "file_id": file_id}
+
+
+def test_plan_sync_diffs_manifest_and_disk():
+    manifest = {"a.md": entry("1", "f-a"), "b.md": entry("2", "f-b"), "c.md": entry("3", "f-c")}
+    current = {"a.md": entry("1", None), "b.md": entry("9", None), "d.md": entry("4", None)}
+    to_upload, to_remove, unchanged = plan_sync(manifest, current)
+    assert sorted(to_upload) == ["b.md", "d.md"]
+    assert to_remove == {"b.md": "f-b", "c.md": "f-c"}
+    assert unchanged == ["a.md"]
+
+
+def test_failed_batch_attaches_only_missing_files(client, knowledge_base, monkeypatch):
+    monkeypatch.setattr(kb_sync, "ATTACH_BATCH_SIZE", 2)
+    attached = count_attachments(client, monkeypatch)
+    batch_create = client.vector_store_file_batches.create
+    batches = []
+
+    async def fail_second_batch(vector_store_id, file_ids, **kwargs):
+        batches.append(file_ids)
+        if len(batches) > 1:
+            raise SimulatedServiceError("vector_store_file_batches.create", 500)
+        return await batch_create(vector_store_id, file_ids, **kwargs)
+
+    monkeypatch.setattr(client.vector_store_file_batches, "create", fail_second_batch)
+
+    async def scenario():
+        vector_store = await client.vector_stores.create(name=kb_sync.VECTOR_STORE_NAME)
+        paths = sorted(str(path) for path in knowledge_base.iterdir())
+        return vector_store.id, await upload_files_concurrently(client, vector_store.id, paths)
+
+    vector_store_id, report = asyncio.run(scenario())
+    assert len(report.succeeded) == 3 and not report.batch_attach
+    assert attached == batches[1]
+    assert client.vector_stores_files[vector_store_id] == {result.file_id for result in report.results}
+
+
+def sync(client, knowledge_base, manifest_path):
+    async def upload(vector_store_id, paths):
+        report = await upload_files_concurrently(client, vector_store_id, paths)
+        return report.as_mapping()
+
+    kb = KnowledgeBaseSync(client, str(knowledge_base), manifest_path=manifest_path)
+    vector_store, _ = asyncio.run(kb.sync(upload))
+    return kb, vector_store
+
+
+def test_reconnect_reattaches_only_files_removed_from_store(client, knowledge_base, tmp_path, monkeypatch):
+    manifest_path = tmp_path / "kb_manifest.json"
+    kb, vector_store = sync(client, knowledge_base, manifest_path)
+    files = kb.manifest.files
+    store_files = client.vector_stores_files[vector_store.id]
+    # Um arquivo removido fora do app e outro associado sem passar pelo manifesto
+    store_files.discard(files["guia_0.md"]["file_id"])
+    store_files.add("file-desconhecido")
+
+    uploads = []
+    upload = client.files.upload
+
+    async def counting_upload(file, **kwargs):
+        uploads.append(file.name)
+        return await upload(file=file, **kwargs)
+
+    monkeypatch.setattr(client.files, "upload", counting_upload)
+    attached = count_attachments(client, monkeypatch)
+    monkeypatch.setattr(client, "vector_store_file_batches", None)
+
+    kb, same_store = sync(client, knowledge_base, manifest_path)
+    assert same_store.id == vector_store.id
+    assert [name.rsplit("/", 1)[-1] for name in uploads] == ["guia_0.md"]
+    assert attached == [kb.manifest.files["guia_0.md"]["file_id"]]
+    assert client.vector_stores_files[vector_store.id] == {entry["file_id"] for entry in kb.manifest.files.values()}
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from local_retrieval import Hit, LocalRetriever
+
+
+@pytest.fixture(scope="module")
+def retriever(tmp_path_factory):
+    return LocalRetriever("knowledge_base", index_path=tmp_path_factory.mktemp("index") / "index.json")
+
+
+@pytest.mark.parametrize("question, source", [
+    ("Qual procedimento para reset de senha?", "support_procedures.json"),
+    ("Excel travando com planilhas grandes", "base_support_ti.json"),
+    ("impressora não imprime", "base_support_ti.json"),
+])
+def test_specific_questions_are_strong(retriever, question, source):
+    hits = retriever.search(question)
+    assert retriever.is_strong(hits)
+    assert hits[0].source == source
+
+
+def test_generic_terms_and_urls_do_not_make_a_strong_hit(retriever):
+    # "suporte" só aparece em URL/e-mail e "contato" numa chave do procedimento de senha
+    hits = retriever.search("Quais são os contatos de suporte?")
+    assert not retriever.is_strong(hits)
+
+
+def test_is_strong_requires_terms_and_margin():
+    strong = Hit("a", "", 0.9, matched_terms=3)
+    assert LocalRetriever.is_strong([strong, Hit("b", "", 0.5, matched_terms=2)])
+    assert not LocalRetriever.is_strong([strong, Hit("b", "", 0.85, matched_terms=2)])
+    assert not LocalRetriever.is_strong([Hit("a", "", 0.9, matched_terms=1)])
+    assert not LocalRetriever.is_strong([Hit("a", "", 0.4, matched_terms=3)])
+    assert not LocalRetriever.is_strong([])
+
+
+def test_only_changed_files_are_reprocessed(tmp_path, monkeypatch):
+    knowledge_base = tmp_path / "kb"
+    knowledge_base.mkdir()
+    (knowledge_base / "a.json").write_text(json.dumps([{"pergunta": "impressora sem toner"}]), encoding="utf-8")
+    (knowledge_base / "b.md").write_text("Roteador reinicia sozinho", encoding="utf-8")
+    index_path = tmp_path / "index.json"
+    LocalRetriever(str(knowledge_base), index_path=index_path)
+
+    import local_retrieval
+    chunked = []
+    original = local_retrieval.chunk_file
+    monkeypatch.setattr(local_retrieval, "chunk_file", lambda path: chunked.append(path) or original(path))
+    (knowledge_base / "b.md").write_text("Roteador reinicia sozinho\n\nSem sinal de wifi", encoding="utf-8")
+    retriever = LocalRetriever(str(knowledge_base), index_path=index_path)
+
+    assert [path.rsplit("/", 1)[-1] for path in chunked] == ["b.md"]
+    assert len(retriever.chunks) == 2
+    assert retriever.search("wifi sem sinal")[0].source == "b.md"
@@ -0,0 +1,203 @@
+import asyncio
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, Resilience, TokenBucket, retry_after
+
+
+class ServiceError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def make_resilience(**kwargs):
+    kwargs.setdefault("rate_limits", {"runs": 0, "messages": 0})
+    kwargs.setdefault("base_delay", 0)
+    return Resilience(**kwargs)
+
+
+def open_breaker(resilience, family):
+    breaker = resilience.breakers[family]
+    breaker.reset_timeout = 0
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == "open"
+    return breaker
+
+
+async def failing(status):
+    raise ServiceError(status)
+
+
+async def succeeding():
+    return "ok"
+
+
+def test_breaker_opens_after_threshold_and_closes_after_probe():
+    breaker = CircuitBreaker("runs", failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    assert breaker.before_call() is True
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker("runs", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    breaker.opened_at -= 60
+    assert breaker.before_call() is True
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_cancelled_probe_releases_half_open_breaker():
+    resilience = make_resilience()
+    breaker = open_breaker(resilience, "runs")
+
+    async def scenario():
+        async def hang():
+            await asyncio.sleep(10)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(resilience.call("runs", "runs.create", hang), 0.01)
+        assert breaker.state == "half_open"
+        # Outra chamada pode assumir o teste e fechar o circuito
+        assert await resilience.call("runs", "runs.create", succeeding) == "ok"
+
+    asyncio.run(scenario())
+    assert breaker.state == "closed"
+
+
+def test_abandoned_listing_probe_releases_breaker():
+    resilience = make_resilience()
+    breaker = open_breaker(resilience, "messages")
+
+    async def listing():
+        for item in ("m3", "m2", "m1"):
+            yield item
+
+    async def first_item():
+        async for item in resilience.iterate("messages", "messages.list", listing):
+            return item
+
+    async def scenario():
+        assert await first_item() == "m3"
+        assert await first_item() == "m3"
+
+    asyncio.run(scenario())
+    assert breaker.state == "closed"
+
+
+def test_listing_closed_before_first_item_releases_probe():
+    resilience = make_resilience()
+    breaker = open_breaker(resilience, "messages")
+
+    async def never_yields():
+        await asyncio.sleep(10)
+        yield "late"
+
+    async def scenario():
+        iterator = resilience.iterate("messages", "messages.list", never_yields)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(iterator.__anext__(), 0.01)
+        await iterator.aclose()
+        assert breaker.before_call() is True
+
+    asyncio.run(scenario())
+
+
+def test_non_idempotent_call_is_not_retried_on_5xx():
+    resilience = make_resilience(max_attempts=3)
+    calls = []
+
+    async def create():
+        calls.append(1)
+        raise ServiceError(500)
+
+    with pytest.raises(ServiceError):
+        asyncio.run(resilience.call("runs", "runs.create", create))
+    assert len(calls) == 1
+    assert resilience.stats["failed"] == 1
+
+
+def test_throttled_call_is_retried_until_success():
+    resilience = make_resilience(max_attempts=3)
+    responses = [ServiceError(429), ServiceError(429)]
+
+    async def create():
+        if responses:
+            raise responses.pop()
+        return "ok"
+
+    assert asyncio.run(resilience.call("runs", "runs.create", create)) == "ok"
+    assert resilience.stats["retries"] == 2
+    assert resilience.breakers["runs"].state == "closed"
+
+
+def test_business_error_does_not_count_as_failure():
+    resilience = make_resilience()
+    breaker = resilience.breakers["runs"]
+    for _ in range(breaker.failure_threshold + 1):
+        with pytest.raises(ServiceError):
+            asyncio.run(resilience.call("runs", "runs.get", failing, 404))
+    assert breaker.state == "closed"
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, burst=1)
+
+    async def scenario():
+        waits = [await bucket.acquire() for _ in range(3)]
+        return waits
+
+    waits = asyncio.run(scenario())
+    assert waits[0] < 0.005
+    assert 0.01 < waits[1] < 0.1
+
+
+class Response:
+    def __init__(self, headers):
+        self.headers = headers
+        self.status_code = 429
+
+
+class ThrottledError(Exception):
+    def __init__(self, headers):
+        super().__init__("HTTP 429")
+        self.response = Response(headers)
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "250"}, 0.25),
+    ({"Retry-After": "2"}, 2.0),
+    ({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, 0.0),
+    ({"retry-after": "garbage"}, None),
+    ({"retry-after": ""}, None),
+    ({}, None),
+])
+def test_retry_after_headers(headers, expected):
+    assert retry_after(ThrottledError(headers)) == expected
+
+
+def test_malformed_retry_after_is_still_retried():
+    resilience = make_resilience(max_attempts=2)
+    responses = [ThrottledError({"retry-after": "soon"})]
+
+    async def create():
+        if responses:
+            raise responses.pop()
+        return "ok"
+
+    assert asyncio.run(resilience.call("runs", "runs.create", create)) == "ok"
+    assert resilience.stats["retries"] == 1
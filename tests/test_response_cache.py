@@ -0,0 +1,64 @@
+import time
+
+from context_window import ContextWindow
+from response_cache import ResponseCache
+
+FRESH = ContextWindow().fingerprint()
+
+
+def follow_up_context(category="rede"):
+    context = ContextWindow()
+    context.add_turn("wifi não conecta", "…", {"category": category, "sla": "4 horas"})
+    return context.fingerprint()
+
+
+def test_normalized_question_hits_for_fresh_conversations():
+    cache = ResponseCache()
+    cache.put("Como configurar a VPN?", "resposta", FRESH)
+    assert cache.get("  como CONFIGURAR a vpn? ", FRESH) == "resposta"
+    assert cache.stats()["hits"] == 1
+
+
+def test_follow_up_is_not_served_to_other_conversations():
+    cache = ResponseCache()
+    cache.put("e quanto tempo isso leva?", "SLA: 4 horas", follow_up_context("rede"))
+    assert cache.get("e quanto tempo isso leva?", FRESH) is None
+    assert cache.get("e quanto tempo isso leva?", follow_up_context("acesso")) is None
+    assert cache.get("e quanto tempo isso leva?", follow_up_context("rede")) == "SLA: 4 horas"
+
+
+def test_lru_eviction_and_ttl():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    for question in ("a", "b", "c"):
+        cache.put(question, question.upper())
+    assert cache.get("a") is None
+    assert cache.get("c") == "C"
+
+    cache.entries[cache.make_key("c")]["expires_at"] = time.time() - 1
+    assert cache.get("c") is None
+
+
+def test_context_change_invalidates_everything():
+    version = ["1"]
+    cache = ResponseCache(context_provider=lambda: version[0])
+    cache.put("a", "A")
+    version[0] = "2"
+    cache._last_context_check = 0
+    assert cache.get("a") is None
+
+
+def test_persisted_cache_round_trip(tmp_path):
+    path = tmp_path / "response_cache.json"
+    cache = ResponseCache(context_provider=lambda: "ctx", path=path)
+    cache.put("a", "A", FRESH)
+    cache.save()
+    assert ResponseCache(context_provider=lambda: "ctx", path=path).get("a", FRESH) == "A"
+    assert ResponseCache(context_provider=lambda: "outro", path=path).get("a", FRESH) is None
+
+
+def test_repeated_question_hits_after_unrelated_turn():
+    cache = ResponseCache()
+    cache.put("Como configurar a VPN?", "resposta", FRESH)
+    context = ContextWindow()
+    context.add_turn("bom dia", "Olá! Em que posso ajudar?", {"category": None, "sla": None, "suggestion": None})
+    assert cache.get("como configurar a vpn?", context.fingerprint()) == "resposta"
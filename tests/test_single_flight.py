@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from single_flight import LeaderFailed, SingleFlight
+
+
+def test_followers_share_successful_result():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "resposta"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run("wifi", work) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert sorted(results) == [("resposta", False), ("resposta", True), ("resposta", True)]
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "followers": 2, "failures": 0}
+
+
+def test_leader_failure_reaches_followers_as_leader_failed():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("run failed")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run("wifi", work) for _ in range(3)), return_exceptions=True)
+
+    leader, *followers = asyncio.run(scenario())
+    assert isinstance(leader, ValueError)
+    assert all(isinstance(error, LeaderFailed) and isinstance(error.error, ValueError) for error in followers)
+    assert flight.stats()["failures"] == 2 and flight.stats()["followers"] == 0
+    assert flight.flights == {}
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return f"run {len(calls)}"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.run("wifi", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.run("wifi", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == ("run 2", False)
+    assert len(calls) == 2
+
+
+def test_cancelled_follower_does_not_affect_leader():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.03)
+        return "resposta"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.run("wifi", work))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(flight.run("wifi", work), 0.01)
+        return await leader
+
+    assert asyncio.run(scenario()) == ("resposta", False)
@@ -0,0 +1,316 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import support_agent
+from benchmarks.simulated_client import SimulatedAgentsClient, SimulationConfig
+from context_window import estimate_tokens
+from resilience import CircuitOpenError
+from response_cache import ResponseCache
+from support_agent import SupportAgent
+
+KNOWLEDGE_BASE = str(Path(__file__).resolve().parent.parent / "knowledge_base")
+QUESTION = "Preciso de ajuda com a impressora do terceiro andar"
+
+
+class ServiceError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def make_agent(monkeypatch):
+    monkeypatch.setenv("AZURE_AI_PROJECT_ENDPOINT", "https://simulado")
+    monkeypatch.setenv("AZURE_AI_MODEL_DEPLOYMENT_NAME", "gpt-simulado")
+
+    async def make(**config):
+        agent = SupportAgent(knowledge_base_path=KNOWLEDGE_BASE)
+        client = SimulatedAgentsClient(SimulationConfig(latency_scale=0, **config))
+        await agent.connect(client=client, wait_for_ingestion=True)
+        # Só o run remoto responde
+        agent.response_cache = None
+        agent.classifier = None
+        agent.retriever = None
+        return agent
+
+    return make
+
+
+def failing_stream(error, calls):
+    async def stream_run(*args, **kwargs):
+        calls.append(1)
+        raise error
+    return stream_run
+
+
+def test_request_error_falls_back_to_polling_for_that_turn_only(make_agent):
+    async def scenario():
+        agent = await make_agent()
+        calls = []
+        agent._stream_run = failing_stream(ServiceError(400), calls)
+        reply, source = await agent.chat("s1", QUESTION)
+        assert source == "agent" and not reply.startswith("Erro")
+        await agent.chat("s1", QUESTION + " de novo")
+        assert agent.streaming_supported
+        assert len(calls) == 2
+        await agent.disconnect()
+
+    asyncio.run(scenario())
+
+
+def test_repeated_stream_failures_pause_streaming_then_retry(make_agent, monkeypatch):
+    monkeypatch.setattr(support_agent, "STREAM_FAILURE_LIMIT", 2)
+
+    async def scenario():
+        agent = await make_agent()
+        calls = []
+        agent._stream_run = failing_stream(ServiceError(404), calls)
+        for index in range(3):
+            await agent.chat("s1", f"{QUESTION} {index}")
+        assert len(calls) == 2 and agent.streaming_supported
+
+        agent.streaming_paused_until = 0.0
+        await agent.chat("s1", QUESTION)
+        assert len(calls) == 3
+        await agent.disconnect()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("error", [ServiceError(501), NotImplementedError("stream")])
+def test_unsupported_streaming_falls_back_permanently(make_agent, error):
+    async def scenario():
+        agent = await make_agent()
+        calls = []
+        agent._stream_run = failing_stream(error, calls)
+        await agent.chat("s1", QUESTION)
+        await agent.chat("s1", QUESTION + " de novo")
+        assert not agent.streaming_supported
+        assert len(calls) == 1
+        await agent.disconnect()
+
+    asyncio.run(scenario())
+
+
+def test_failed_leader_run_is_not_shared(make_agent):
+    async def scenario():
+        agent = await make_agent()
+        run_agent = agent._run_agent
+        calls = []
+
+        async def first_run_fails(message, conversation, on_delta):
+            calls.append(conversation)
+            if len(calls) == 1:
+                await asyncio.sleep(0.05)
+                conversation.last_source = "error"
+                return "Erro no run: failed"
+            return await run_agent(message, conversation, on_delta)
+
+        agent._run_agent = first_run_fails
+        leader = asyncio.ensure_future(agent.chat("s1", QUESTION))
+        await asyncio.sleep(0.01)
+        follower = await agent.chat("s2", QUESTION)
+        assert await leader == ("Erro no run: failed", "error")
+        reply, source = follower
+        assert source == "agent" and not reply.startswith("Erro")
+        assert len(calls) == 2
+        follower_conversation = agent.threads.sessions["s2"].conversation
+        assert follower_conversation.pending_local_turns == []
+        await agent.disconnect()
+
+    asyncio.run(scenario())
+
+
+def fallback_agent(make_agent):
+    async def make():
+        agent = await make_agent()
+        agent.classifier = agent._load_classifier()
+        return agent
+    return make()
+
+
+def test_fallback_uses_nearest_example_only_when_confident(make_agent):
+    async def scenario():
+        agent = await fallback_agent(make_agent)
+        conversation = await agent.new_conversation()
+        confident = agent._fallback_answer(conversation, "O Excel trava ao abrir planilha grande", "prazo")
+        assert confident.startswith("Seu problema foi classificado como")
+
+        generic = agent._fallback_answer(conversation, "Minha cadeira quebrou", "prazo")
+        assert conversation.last_source == "fallback"
+        assert "Abra um chamado" in generic and "classificado" not in generic and "SLA" not in generic
+        await agent.disconnect()
+
+    asyncio.run(scenario())
+
+
+def test_low_confidence_fallback_keeps_known_ticket_details(make_agent):
+    async def scenario():
+        agent = await fallback_agent(make_agent)
+        conversation = await agent.new_conversation()
+        conversation.context.add_turn("wifi caiu", "", {"category": "rede", "sla": "4 horas"})
+        reply = agent._fallback_answer(conversation, "Minha cadeira quebrou", "prazo")
+        assert "(categoria rede, SLA de 4 horas)" in reply
+        assert support_agent.parse_classification(reply)["sla"] is None
+        await agent.disconnect()
+
+    asyncio.run(scenario())
+
+
+def test_agent_spans_are_named_after_the_operation(make_agent, monkeypatch):
+    names = []
+    real_span = support_agent.span
+
+    def recording_span(name, **attributes):
+        names.append(name)
+        return real_span(name, **attributes)
+
+    monkeypatch.setattr(support_agent, "span", recording_span)
+    monkeypatch.setattr(support_agent, "AGENT_WARM_START", False)
+
+    async def scenario():
+        agent = await make_agent()
+        assert isinstance(agent.client, support_agent.ResilientClient)
+        await agent.disconnect()
+
+    asyncio.run(scenario())
+    assert "agent.create_agent" in names and "agent.call" not in names
+
+
+def test_long_conversation_moves_to_fresh_thread_with_summary(make_agent):
+    async def scenario():
+        agent = await make_agent()
+        await agent.chat("s1", QUESTION)
+        session = agent.threads.sessions["s1"]
+        previous = session.conversation
+        previous.context.budget = 1
+
+        sent = []
+        create = agent.client.runs.create
+
+        async def recording_create(**kwargs):
+            sent.append(kwargs.get("additional_messages"))
+            return await create(**kwargs)
+
+        agent.client.runs.create = recording_create
+        agent.streaming_supported = False
+        reply, source = await agent.chat("s1", "Continua sem imprimir")
+        assert source == "agent" and not reply.startswith("Erro")
+        assert session.conversation is not previous
+        assert session.conversation.thread.id != previous.thread.id
+        summary, question = sent[0]
+        assert summary["content"].startswith("Resumo do atendimento") and QUESTION in summary["content"]
+        assert question == {"role": "user", "content": "Continua sem imprimir"}
+        await agent.disconnect()
+
+    asyncio.run(scenario())
+
+
+def test_answers_are_cached_only_after_ingestion(make_agent):
+    async def scenario():
+        agent = await make_agent()
+        assert agent.knowledge_base_synced
+        agent.response_cache = ResponseCache()
+        agent.knowledge_base_synced = False
+        await agent.chat("s1", QUESTION)
+        assert len(agent.response_cache.entries) == 0
+
+        agent.knowledge_base_synced = True
+        await agent.chat("s2", QUESTION)
+        reply, source = await agent.chat("s3", QUESTION)
+        assert source == "cache"
+        await agent.disconnect()
+
+    asyncio.run(scenario())
+
+
+def apply_agent(error):
+    """_apply_agent com um create_agent que recusa o file_search com `error`"""
+    agent = SupportAgent(knowledge_base_path=KNOWLEDGE_BASE)
+    agent.vector_store = SimpleNamespace(id="vs-1")
+    capabilities = {}
+
+    async def create_agent(model, instructions, tools=None, **kwargs):
+        if tools:
+            raise error
+        return SimpleNamespace(id="asst-1", tools=[])
+
+    result = asyncio.run(agent._apply_agent("create_agent", create_agent, "gpt", "instruções", capabilities))
+    return result, capabilities
+
+
+def test_rejected_file_search_is_recorded_for_the_model():
+    result, capabilities = apply_agent(ServiceError(400))
+    assert result.id == "asst-1"
+    assert capabilities == {"file_search": False}
+
+
+@pytest.mark.parametrize("error", [
+    ServiceError(429), ServiceError(503), CircuitOpenError("agents", 30), ConnectionError("reset"),
+])
+def test_transient_file_search_failure_is_not_recorded(error):
+    with pytest.raises(type(error)):
+        apply_agent(error)
+
+
+@pytest.mark.parametrize("question, details", [
+    ("wifi não conecta", "(categoria rede, SLA de 4 horas)"),
+    ("Não consigo conectar na VPN", "(categoria rede, SLA de 4 horas)"),
+])
+def test_near_miss_fallback_gives_only_category_and_sla(make_agent, question, details):
+    async def scenario():
+        agent = await fallback_agent(make_agent)
+        conversation = await agent.new_conversation()
+        reply = agent._fallback_answer(conversation, question, "prazo")
+        assert "Abra um chamado" in reply and details in reply
+        assert "VPN" not in reply and "wifi" not in reply.lower()
+        await agent.disconnect()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("reply", [
+    "Seu problema foi classificado como 'rede'. SLA: 4 horas. Sugestão: reinicie o roteador.",
+    "Seu problema foi classificado como **Rede**.\n**SLA:** 4 horas\n**Sugestão:** reinicie o roteador.",
+    "Classificado como *rede*. _SLA:_ 4 horas. __Sugestão:__ reinicie o roteador.",
+    "Classificado como `rede`. **SLA: 4 horas**. *Sugestão*: reinicie o roteador.",
+])
+def test_parse_classification_ignores_markdown(reply):
+    assert support_agent.parse_classification(reply) == {
+        "category": "rede", "sla": "4 horas", "suggestion": "reinicie o roteador.",
+    }
+
+
+def test_parse_classification_keeps_underscores_inside_words():
+    parsed = support_agent.parse_classification("classificado como software. Sugestão: apague o config_local.ini")
+    assert parsed["suggestion"] == "apague o config_local.ini"
+
+
+def test_context_counts_local_snippets_sent_with_the_question(make_agent):
+    async def scenario():
+        agent = await make_agent()
+        agent.retriever = agent._load_retriever()
+        question = "VPN não conecta quando estou em casa"
+        reply, _ = await agent.chat("s1", question)
+        context = agent.threads.sessions["s1"].conversation.context
+        assert context.tokens > estimate_tokens(question) + estimate_tokens(reply)
+        assert list(context.questions) == [question]
+        await agent.disconnect()
+
+    asyncio.run(scenario())
+
+
+def test_repeated_question_after_greeting_is_served_from_cache(make_agent):
+    async def scenario():
+        agent = await make_agent(reply="Olá! Em que posso ajudar?")
+        agent.response_cache = ResponseCache()
+        await agent.chat("s0", QUESTION)
+        await agent.chat("gui", "bom dia")
+        reply, source = await agent.chat("gui", QUESTION)
+        assert source == "cache" and reply == "Olá! Em que posso ajudar?"
+        await agent.disconnect()
+
+    asyncio.run(scenario())
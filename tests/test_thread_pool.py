@@ -0,0 +1,130 @@
+import asyncio
+import itertools
+
+import pytest
+
+from thread_pool import ThreadManager
+
+
+class FakeThreads:
+    """create/delete de conversas em memória, com atraso opcional"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.ids = itertools.count(1)
+        self.created = []
+        self.deleted = []
+
+    async def create(self):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("threads.create falhou")
+        conversation = f"thread-{next(self.ids)}"
+        self.created.append(conversation)
+        return conversation
+
+    async def delete(self, conversation):
+        self.deleted.append(conversation)
+
+
+def make_manager(threads, **kwargs):
+    return ThreadManager(threads.create, threads.delete, **kwargs)
+
+
+def test_pool_is_prewarmed_and_sessions_take_from_it():
+    threads = FakeThreads()
+
+    async def scenario():
+        manager = make_manager(threads, pool_size=2)
+        manager.start()
+        await manager.wait_ready()
+        assert len(manager.pool) == 2
+        conversation = await manager.run("s1", lambda conversation: asyncio.sleep(0, conversation))
+        assert conversation in threads.created[:2]
+        await manager.close()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_first_messages_share_one_thread():
+    threads = FakeThreads(delay=0.01)
+
+    async def scenario():
+        manager = make_manager(threads, pool_size=0)
+        results = await asyncio.gather(*(
+            manager.run("s1", lambda conversation: asyncio.sleep(0, conversation)) for _ in range(3)
+        ))
+        await manager.close()
+        return results
+
+    assert asyncio.run(scenario()) == ["thread-1"] * 3
+    assert threads.created == ["thread-1"]
+
+
+def test_runs_are_serialized_per_session_and_parallel_across_sessions():
+    threads = FakeThreads()
+    active = {}
+    peak = {"session": 0, "total": 0}
+
+    async def handler(conversation):
+        active[conversation] = active.get(conversation, 0) + 1
+        peak["session"] = max(peak["session"], active[conversation])
+        peak["total"] = max(peak["total"], sum(active.values()))
+        await asyncio.sleep(0.01)
+        active[conversation] -= 1
+
+    async def scenario():
+        manager = make_manager(threads, pool_size=0)
+        await asyncio.gather(*(manager.run(session, handler) for session in ("s1", "s1", "s2", "s2")))
+        await manager.close()
+
+    asyncio.run(scenario())
+    assert peak == {"session": 1, "total": 2}
+
+
+def test_failed_thread_creation_does_not_keep_session():
+    threads = FakeThreads(fail=True)
+
+    async def scenario():
+        manager = make_manager(threads, pool_size=0)
+        with pytest.raises(RuntimeError):
+            await manager.run("s1", lambda conversation: asyncio.sleep(0))
+        assert "s1" not in manager.sessions
+        threads.fail = False
+        assert await manager.run("s1", lambda conversation: asyncio.sleep(0, conversation)) == "thread-1"
+        await manager.close()
+
+    asyncio.run(scenario())
+
+
+def test_idle_sessions_are_reaped_but_busy_ones_kept():
+    threads = FakeThreads()
+
+    async def scenario():
+        manager = make_manager(threads, pool_size=0, idle_timeout=0.01)
+        await manager.run("idle", lambda conversation: asyncio.sleep(0))
+        busy = asyncio.ensure_future(manager.run("busy", lambda conversation: asyncio.sleep(0.05)))
+        await asyncio.sleep(0.02)
+        manager.reap_idle()
+        assert set(manager.sessions) == {"busy"}
+        await busy
+        await manager.close()
+
+    asyncio.run(scenario())
+    assert threads.deleted[0] == "thread-1"
+
+
+def test_close_deletes_pool_and_session_threads():
+    threads = FakeThreads()
+
+    async def scenario():
+        manager = make_manager(threads, pool_size=2)
+        manager.start()
+        await manager.wait_ready()
+        await manager.run("s1", lambda conversation: asyncio.sleep(0))
+        await manager.close()
+
+    asyncio.run(scenario())
+    # O pool é reabastecido depois do take(): tudo que foi criado é removido
+    assert sorted(threads.deleted) == sorted(threads.created)
@@ -0,0 +1,80 @@
+# text_utils.py
+"""Normalização, tokenização e divisão em trechos de texto em português
+
+Compartilhado pelo classificador local, pela busca local e pela compilação
+da base, para que todos enxerguem as mesmas palavras e os mesmos trechos.
+"""
+import re
+import unicodedata
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+_HEADING_RE = re.compile(r"^#{1,6}\s", re.MULTILINE)
+# Prefixo usado como radical: conecta/conectar -> "conec", resetar/reset -> "reset"
+STEM_LENGTH = 5
+
+STOPWORDS = frozenset("""
+a ao aos as com como da das de do dos e em esta estou eu fica ja mais me meu minha
+muito na nas no nos o os ou para pela pelo por que quando se sem ser seu sua tem
+um uma apos toda todo
+""".split())
+
+
+def fold_accents(text):
+    """Remove acentos: 'conexão' -> 'conexao'"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def normalize_text(text):
+    """Minúsculas, sem acentos e com espaços colapsados"""
+    return _WHITESPACE_RE.sub(" ", fold_accents(text or "").lower()).strip()
+
+
+def tokenize(text, drop_stopwords=True):
+    """Divide o texto normalizado em palavras"""
+    tokens = _TOKEN_RE.findall(normalize_text(text))
+    if drop_stopwords:
+        tokens = [token for token in tokens if token not in STOPWORDS]
+    return tokens
+
+
+def stems(text):
+    """Palavras reduzidas a um radical curto (resetar/reset, substituir/substituí-lo)"""
+    return [token[:STEM_LENGTH] for token in tokenize(text)]
+
+
+def flatten_json(value):
+    """Texto de um valor JSON (listas viram itens separados por '; ')"""
+    if isinstance(value, dict):
+        return "; ".join(f"{key}: {flatten_json(item)}" for key, item in value.items())
+    if isinstance(value, list):
+        return "; ".join(flatten_json(item) for item in value)
+    return str(value)
+
+
+def split_paragraphs(text, max_chars):
+    """Agrupa parágrafos (e seções Markdown) em blocos de até max_chars"""
+    paragraphs = []
+    for section in _HEADING_RE.split(text) if _HEADING_RE.search(text) else [text]:
+        paragraphs.extend(part.strip() for part in section.split("\n\n"))
+
+    chunks, current = [], ""
+    for paragraph in paragraphs:
+        if not paragraph:
+            continue
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            cut = cut if cut > max_chars // 2 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,171 @@
+# thread_pool.py
+"""Pool de threads remotas pré-criadas e mapeamento sessão -> thread.
+
+Cada sessão recebe a sua própria thread (conversa) do pool, já criada em
+segundo plano, então a primeira mensagem não espera a criação da thread.
+Runs são serializados por thread e rodam em paralelo entre threads
+diferentes; sessões ociosas têm a thread removida.
+"""
+import asyncio
+import os
+import time
+
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "4"))
+THREAD_IDLE_TIMEOUT = float(os.getenv("THREAD_IDLE_TIMEOUT", "1800"))
+REAPER_INTERVAL = 60.0
+
+
+class Session:
+    """Conversa atribuída a uma sessão, com lock para um run por vez"""
+
+    def __init__(self, session_id, conversation):
+        self.session_id = session_id
+        self.conversation = conversation
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class ThreadManager:
+    """Distribui threads pré-aquecidas para sessões e recicla as ociosas"""
+
+    def __init__(self, create_conversation, delete_conversation,
+                 pool_size=None, idle_timeout=None):
+        self.create_conversation = create_conversation
+        self.delete_conversation = delete_conversation
+        self.pool_size = THREAD_POOL_SIZE if pool_size is None else pool_size
+        self.idle_timeout = THREAD_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+
+        self.pool = []
+        self.sessions = {}  # session_id -> Session
+        self._refill_needed = asyncio.Event()
+        self._ready = asyncio.Event()
+        self._tasks = []
+        self._background = set()
+        self._closed = False
+
+    def start(self):
+        """Inicia o aquecimento do pool e a limpeza de sessões ociosas"""
+        self._tasks = [
+            asyncio.create_task(self._refill_loop()),
+            asyncio.create_task(self._reaper_loop()),
+        ]
+        self._refill_needed.set()
+
+    async def _refill_loop(self):
+        while not self._closed:
+            await self._refill_needed.wait()
+            self._refill_needed.clear()
+            missing = self.pool_size - len(self.pool)
+            if missing <= 0:
+                continue
+            results = await asyncio.gather(
+                *(self.create_conversation() for _ in range(missing)),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"⚠️  Falha ao pré-criar thread: {result}")
+                elif self._closed:
+                    self._spawn(self.delete_conversation(result))
+                else:
+                    self.pool.append(result)
+            # Pronto após a primeira rodada, mesmo com falhas (take() cria na hora)
+            self._ready.set()
+
+    async def wait_ready(self):
+        """Aguarda a primeira rodada de pré-criação do pool"""
+        await self._ready.wait()
+
+    async def _reaper_loop(self):
+        while not self._closed:
+            await asyncio.sleep(min(REAPER_INTERVAL, self.idle_timeout))
+            self.reap_idle()
+
+    def _spawn(self, coro):
+        """Executa uma tarefa em segundo plano mantendo referência até o fim"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def take(self):
+        """Entrega uma conversa nova: do pool se houver, senão cria na hora"""
+        self._refill_needed.set()
+        if self.pool:
+            return self.pool.pop()
+        return await self.create_conversation()
+
+    def discard(self, conversation):
+        """Remove a thread remota em segundo plano"""
+        self._spawn(self.delete_conversation(conversation))
+
+    async def acquire(self, session_id):
+        """Retorna a sessão, atribuindo uma thread do pool na primeira vez"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            # Reserva a sessão antes de aguardar para evitar duas threads por sessão
+            session = Session(session_id, None)
+            self.sessions[session_id] = session
+            async with session.lock:
+                try:
+                    session.conversation = await self.take()
+                except Exception:
+                    del self.sessions[session_id]
+                    raise
+        session.last_used = time.monotonic()
+        return session
+
+    async def run(self, session_id, handler):
+        """Executa `handler(conversation)` com um run por vez na thread da sessão"""
+        session = await self.acquire(session_id)
+        async with session.lock:
+            if session.conversation is None:
+                raise RuntimeError("Thread da sessão indisponível")
+            session.last_used = time.monotonic()
+            try:
+                return await handler(session.conversation)
+            finally:
+                session.last_used = time.monotonic()
+
+    def replace(self, session_id, conversation):
+        """Troca a conversa da sessão (ex.: compactação) e remove a thread antiga"""
+        session = self.sessions[session_id]
+        previous, session.conversation = session.conversation, conversation
+        if previous:
+            self.discard(previous)
+
+    def release(self, session_id):
+        """Encerra a sessão e remove sua thread"""
+        session = self.sessions.pop(session_id, None)
+        if session and session.conversation:
+            self.discard(session.conversation)
+
+    def reap_idle(self):
+        """Remove threads de sessões sem uso há mais de idle_timeout"""
+        now = time.monotonic()
+        idle = [
+            session_id for session_id, session in self.sessions.items()
+            if not session.lock.locked() and now - session.last_used > self.idle_timeout
+        ]
+        for session_id in idle:
+            self.release(session_id)
+        if idle:
+            print(f"♻️  {len(idle)} sessões ociosas encerradas")
+
+    async def close(self):
+        """Para as tarefas e remove todas as threads (pool e sessões)"""
+        self._closed = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        conversations = self.pool + [
+            session.conversation for session in self.sessions.values() if session.conversation
+        ]
+        self.pool = []
+        self.sessions = {}
+        await asyncio.gather(
+            *(self.delete_conversation(conversation) for conversation in conversations),
+            *self._background,
+            return_exceptions=True
+        )
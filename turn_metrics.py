@@ -0,0 +1,90 @@
+# turn_metrics.py
+"""Tempos por turno de conversa e estatísticas acumuladas.
+
+Cada turno é dividido em espera na fila (sessão ocupada), busca local na
+base, tempo do run em fila no serviço, tempo em processamento, busca da resposta e total, com o
+número de chamadas à API feitas no turno. Separa o que é nosso (fila local,
+busca de mensagens) do que é do serviço (run em fila/processamento).
+"""
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import numpy as np
+
+METRICS_WINDOW = 100
+
+
+@dataclass
+class TurnMetrics:
+    """Tempos (segundos) de um turno; preenchidos ao longo do processamento"""
+    created: float = field(default_factory=time.perf_counter)
+    source: str = None
+    queue_wait: float = 0.0
+    retrieval: float = 0.0
+    run_queued: float = 0.0
+    run_in_progress: float = 0.0
+    message_fetch: float = 0.0
+    total: float = 0.0
+    api_calls: int = 0
+    run_created_at: float = None
+    run_started_at: float = None
+
+    def run_status(self, status):
+        """Registra o instante em que o run foi visto em cada status"""
+        now = time.perf_counter()
+        if self.run_created_at is None:
+            self.run_created_at = now
+        if status == "in_progress" and self.run_started_at is None:
+            self.run_started_at = now
+        elif status not in ("queued", "in_progress"):
+            started = self.run_started_at or now
+            self.run_queued = started - self.run_created_at
+            self.run_in_progress = now - started
+
+    def finish(self, source):
+        self.source = source
+        self.total = time.perf_counter() - self.created
+
+    def as_dict(self):
+        return {
+            "source": self.source,
+            "queue_wait_ms": round(self.queue_wait * 1000, 1),
+            "retrieval_ms": round(self.retrieval * 1000, 3),
+            "run_queued_ms": round(self.run_queued * 1000, 1),
+            "run_in_progress_ms": round(self.run_in_progress * 1000, 1),
+            "message_fetch_ms": round(self.message_fetch * 1000, 1),
+            "total_ms": round(self.total * 1000, 1),
+            "api_calls": self.api_calls,
+        }
+
+
+class MetricsRecorder:
+    """Guarda os últimos turnos para p50/p95 e os totais da sessão"""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.recent = deque(maxlen=window)
+        self.last = None
+        self.turns = 0
+        self.api_calls = 0
+        self.by_source = {}
+
+    def record(self, turn):
+        self.last = turn
+        self.recent.append(turn.total)
+        self.turns += 1
+        self.api_calls += turn.api_calls
+        self.by_source[turn.source] = self.by_source.get(turn.source, 0) + 1
+
+    def snapshot(self, response_cache=None):
+        """Resumo serializável para a interface e o /health"""
+        totals = np.asarray(self.recent) * 1000.0
+        return {
+            "last_turn": self.last.as_dict() if self.last else None,
+            "p50_ms": round(float(np.percentile(totals, 50)), 1) if totals.size else None,
+            "p95_ms": round(float(np.percentile(totals, 95)), 1) if totals.size else None,
+            "turns": self.turns,
+            "api_calls": self.api_calls,
+            "by_source": dict(self.by_source),
+            "cache_hit_rate": response_cache.hit_rate if response_cache else None,
+        }